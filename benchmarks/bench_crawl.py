@@ -0,0 +1,218 @@
+"""Benchmark of the crawler end to end: the real run() loop of linkedin_job_analyzer.py against the local
+mock LinkedIn (benchmarks/mock_linkedin.py). The jobs are saved to a temporary SQLite database and the
+Easy Apply is disabled.
+
+It reports the jobs per minute, the time of each stage (count, total and p50, p95, p99 per call) and the CPU and memory (RSS) of the Python process and
+of the browser. The CPU and memory of the browser processes are read from /proc, so they are only measured
+on Linux. The mock runs in threads of the Python process, so its CPU is counted in the Python process.
+
+Run it from the root folder of the repo:
+
+    python -m benchmarks.bench_crawl --countries 3 --pages 2 --jobs-per-page 25 --latency-ms 200
+"""
+import os, json, time, shutil, asyncio, argparse, resource, tempfile, threading
+import linkedin_job_analyzer
+from modules import check_apply
+from modules.instrumentation import timed, get_instrumentation_summary
+from modules.helper_functions import load_user_search_save_apply_options
+from modules.check_apply import create_nlp_model
+from benchmarks.mock_linkedin import MockLinkedin
+
+COUNTRIES = ["Denmark", "Sweden", "Germany", "Spain", "Netherlands", "Ireland", "Poland", "Italy", "France", "Norway"]
+
+def time_stage(module, name, stage):
+    """Function that replaces a function of a module by one that records its duration as a stage of the
+    instrumentation (modules/instrumentation.py), for the functions that are not instrumented in the code
+
+    Parameters
+    ----------
+        module : module
+            Module where the function is looked up when it is called
+        name : str
+            Name of the function
+        stage : str
+            Name of the stage
+    """
+    setattr(module, name, timed(stage)(getattr(module, name)))
+
+def get_descendant_processes(pid):
+    """Function that gets the processes started by a process and their children, from /proc
+
+    Parameters
+    ----------
+        pid : int
+            Id of the parent process
+    Returns
+    -------
+        dict_processes : dict
+            Name of each descendant process by its id
+    """
+    dict_parents, dict_names = {}, {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat_file:
+                stat = stat_file.read()
+        except OSError:
+            continue
+        # The name is between parentheses and can have spaces
+        name = stat[stat.index("(") + 1:stat.rindex(")")]
+        fields = stat[stat.rindex(")") + 2:].split()
+        dict_parents[int(entry)] = int(fields[1])
+        dict_names[int(entry)] = name
+
+    dict_processes = {}
+    pending = [pid]
+    while pending:
+        parent = pending.pop()
+        for child, child_parent in dict_parents.items():
+            if child_parent == parent and child not in dict_processes:
+                dict_processes[child] = dict_names[child]
+                pending.append(child)
+    return dict_processes
+
+def read_process_usage(pid):
+    """Function that reads the CPU seconds and the RSS in MB of a process from /proc
+
+    Returns
+    -------
+        cpu_seconds : float
+            User and system CPU time of the process
+        rss_mb : float
+            Resident memory of the process
+    """
+    with open(f"/proc/{pid}/stat") as stat_file:
+        fields = stat_file.read().rsplit(")", 1)[1].split()
+    with open(f"/proc/{pid}/statm") as statm_file:
+        rss_pages = int(statm_file.read().split()[1])
+    ticks = os.sysconf("SC_CLK_TCK")
+    return (int(fields[11]) + int(fields[12])) / ticks, rss_pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+
+class BrowserUsageSampler():
+    """Thread that samples every interval seconds the CPU and RSS of the processes started by the Python
+    process: the browser (chrome) and the Playwright driver (node)"""
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run_sampler, daemon=True)
+        # Last CPU seconds of each process, so the processes that finished are counted too
+        self.cpu_seconds = {}
+        self.peak_rss_mb = {}
+
+    def start(self):
+        if os.path.isdir("/proc"):
+            self.thread.start()
+
+    def run_sampler(self):
+        while not self.stop_event.wait(self.interval):
+            dict_rss_mb = {}
+            for pid, name in get_descendant_processes(os.getpid()).items():
+                group = "browser" if "chrom" in name.lower() or "headless_shell" in name else name
+                try:
+                    cpu_seconds, rss_mb = read_process_usage(pid)
+                except (OSError, IndexError, ValueError):
+                    continue
+                self.cpu_seconds[(group, pid)] = cpu_seconds
+                dict_rss_mb[group] = dict_rss_mb.get(group, 0.0) + rss_mb
+            for group, rss_mb in dict_rss_mb.items():
+                self.peak_rss_mb[group] = max(self.peak_rss_mb.get(group, 0.0), rss_mb)
+
+    def close(self):
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def get_usage(self):
+        """Function that gets the CPU seconds and peak RSS in MB of each group of processes"""
+        dict_cpu_seconds = {}
+        for (group, _), cpu_seconds in self.cpu_seconds.items():
+            dict_cpu_seconds[group] = dict_cpu_seconds.get(group, 0.0) + cpu_seconds
+        return {group: (dict_cpu_seconds[group], self.peak_rss_mb.get(group, 0.0)) for group in dict_cpu_seconds}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the crawler against the mock LinkedIn")
+    parser.add_argument("--countries", type=int, default=3, help="Number of countries to search")
+    parser.add_argument("--pages", type=int, default=2, help="Result pages of each search")
+    parser.add_argument("--jobs-per-page", type=int, default=25)
+    parser.add_argument("--description-sentences", type=int, default=30, help="Sentences of each description")
+    parser.add_argument("--latency-ms", type=int, default=0, help="Latency of the results and job detail requests")
+    parser.add_argument("--empty-rate", type=float, default=0.0, help="Fraction of countries without results")
+    parser.add_argument("--skip-translation", action="store_true",
+                        help="Do not detect the language of the descriptions (it calls Google Translate)")
+    parser.add_argument("--headed", action="store_true", help="Show the browser")
+    args = parser.parse_args()
+
+    mock = MockLinkedin(args.jobs_per_page, args.pages, args.description_sentences, args.latency_ms, args.empty_rate)
+    mock.start()
+
+    # Options of configfile.ini with the mock, temporary files and Easy Apply disabled
+    tmp_dir = tempfile.mkdtemp()
+    auth_state_path = os.path.join(tmp_dir, "auth.json")
+    with open(auth_state_path, "w") as auth_file:
+        json.dump({"cookies": [], "origins": []}, auth_file)
+
+    dict_user_opts = load_user_search_save_apply_options()
+    dict_user_opts.update({
+        "linkedin_base_url": mock.get_base_url(),
+        "auth_state_path": auth_state_path,
+        "headless": not args.headed,
+        "search_positions": ["data engineer"],
+        "search_countries": COUNTRIES[:args.countries],
+        "easy_apply_filter": False,
+        "date_posted_filter": "False",
+        "experience_level_filter": ["False"],
+        "how_to_work_filter": ["False"],
+        "apply_with_easy_apply": False,
+        "save_to_json_file": False,
+        "save_to_parquet": False,
+        "save_to_postgresql_db": False,
+        "save_to_sqlite_db": True,
+        "sqlite_db_path": os.path.join(tmp_dir, "benchmark.db"),
+        "near_duplicate_db_path": os.path.join(tmp_dir, "near_duplicates.db"),
+        "apply_queue_path": os.path.join(tmp_dir, "apply_queue.db"),
+        "questions_no_answer_path": os.path.join(tmp_dir, "questions_no_answer.db"),
+        "instrumentation": True,
+    })
+
+    if args.skip_translation:
+        check_apply.translate_description = lambda description: (description, "en")
+
+    # Stages of the crawl that are not instrumented in the code. The rest (scrap_job, check_apply_or_not, nlp,
+    # save_sqlite...) are recorded by the instrumentation of the modules
+    time_stage(linkedin_job_analyzer, "search_job_offers", "search")
+    time_stage(linkedin_job_analyzer, "scrap_apply_jobs_page", "results_page_total")
+
+    start = time.perf_counter()
+    nlp = create_nlp_model()
+    nlp_seconds = time.perf_counter() - start
+
+    sampler = BrowserUsageSampler()
+    sampler.start()
+    try:
+        start = time.perf_counter()
+        asyncio.run(linkedin_job_analyzer.main(dict_user_opts, nlp))
+        elapsed = time.perf_counter() - start
+    finally:
+        sampler.close()
+        mock.close()
+        shutil.rmtree(tmp_dir)
+
+    dict_summary = get_instrumentation_summary()
+    num_jobs = dict_summary.get("scrap_job", {"count": 0})["count"]
+    print(f"{num_jobs} jobs in {elapsed:.1f} s ({num_jobs / elapsed * 60:.1f} jobs/min). NLP model loaded in {nlp_seconds:.1f} s")
+    print(f"Mock requests: {mock.requests}, {mock.bytes_sent / 1024 ** 2:.1f} MB sent")
+
+    print("Stages (ms per call):")
+    for stage, stats in sorted(dict_summary.items(), key=lambda item: item[1]["seconds_total"], reverse=True):
+        print(f"{stage:>30}: {stats['count']:>6} calls, {stats['seconds_total']:8.1f} s total, "
+              f"p50 {stats['p50'] * 1000:8.1f}, p95 {stats['p95'] * 1000:8.1f}, p99 {stats['p99'] * 1000:8.1f}")
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss is in KB on Linux
+    print(f"{'python':>10}: {usage.ru_utime + usage.ru_stime:8.1f} s CPU, {usage.ru_maxrss / 1024:8.1f} MB peak RSS")
+    for group, (cpu_seconds, peak_rss_mb) in sorted(sampler.get_usage().items()):
+        print(f"{group:>10}: {cpu_seconds:8.1f} s CPU, {peak_rss_mb:8.1f} MB peak RSS (all its processes)")
+
+if __name__ == "__main__":
+    main()
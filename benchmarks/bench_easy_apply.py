@@ -0,0 +1,133 @@
+"""Benchmark of the Easy Apply flow end to end in headless Chromium against the local Easy Apply simulator
+(benchmarks/easy_apply_simulator.py), without network. It also checks that each job ends as expected:
+applied with the right answers, or not applied when a question has no answer.
+
+Run it from the root folder of the repo:
+
+    python -m benchmarks.bench_easy_apply --num-jobs 50 --missing-rate 0.1
+"""
+import os, time, shutil, asyncio, argparse, tempfile, statistics
+from playwright.async_api import async_playwright
+from modules.item import Job
+from modules.helper_functions import load_user_search_save_apply_options, check_easy_apply_button
+from modules import easy_apply
+from modules.questions_no_answer_store import init_questions_store, close_questions_store
+from benchmarks.easy_apply_simulator import create_scenarios, EasyApplySimulator
+
+async def apply_scenarios(simulator, list_scenarios, dict_user_opts, headless):
+    """Function that applies to the job of each scenario and checks the result in the simulator
+
+    Parameters
+    ----------
+        simulator : EasyApplySimulator
+            Running simulator
+        list_scenarios : list
+            Scenarios of the simulator
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+        headless : bool
+            Run the browser without window
+    Returns
+    -------
+        list_results : list
+            List of dicts with the seconds, outcome and checks of each job
+    """
+    list_results = []
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=headless)
+        page = await browser.new_page()
+        try:
+            for scenario in list_scenarios:
+                job_inst = Job()
+                job_inst.url = simulator.get_job_url(scenario["id"])
+                job_inst.search_country = scenario["country"]
+                job_inst.description_lang = "en"
+
+                await page.goto(job_inst.url)
+                await page.wait_for_selector("div.jobs-s-apply button")
+
+                start = time.perf_counter()
+                try:
+                    if not await check_easy_apply_button(page):
+                        raise RuntimeError("Easy Apply button not found")
+                    job_inst = await easy_apply.easy_apply(page, job_inst, dict_user_opts)
+                    outcome = "applied" if job_inst.applied else \
+                        "missing_answers" if job_inst.could_not_apply_due_to_questions else "aborted"
+                except Exception as e:
+                    outcome = f"error: {type(e).__name__}"
+                seconds = time.perf_counter() - start
+
+                result = await page.evaluate("() => window.easyApplySimulator")
+                expected = "applied" if scenario["answerable"] else "missing_answers"
+                correct = outcome == expected and result["submitted"] == (outcome == "applied") and not result["mismatches"] \
+                    and (outcome != "applied" or "resume" not in [step["kind"] for step in scenario["steps"]]
+                         or result["resumeSelected"] == "English")
+                list_results.append({"seconds": seconds, "outcome": outcome, "expected": expected, "correct": correct,
+                                     "mismatches": result["mismatches"], "validation_errors": result["validationErrors"]})
+        finally:
+            await browser.close()
+
+    return list_results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the Easy Apply flow against the local simulator")
+    parser.add_argument("--num-jobs", type=int, default=50)
+    parser.add_argument("--min-questions", type=int, default=1, help="Min questions per step")
+    parser.add_argument("--max-questions", type=int, default=4, help="Max questions per step")
+    parser.add_argument("--min-steps", type=int, default=1, help="Min steps with questions")
+    parser.add_argument("--max-steps", type=int, default=3, help="Max steps with questions")
+    parser.add_argument("--missing-rate", type=float, default=0.1, help="Probability of a question without answer per step")
+    parser.add_argument("--work-experience-rate", type=float, default=0.2)
+    parser.add_argument("--education-rate", type=float, default=0.2)
+    parser.add_argument("--privacy-policy-rate", type=float, default=0.2)
+    parser.add_argument("--resume-rate", type=float, default=0.5)
+    parser.add_argument("--step-latency-ms", type=int, default=0, help="Time to load the next step of the form")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--headed", action="store_true", help="Show the browser")
+    args = parser.parse_args()
+
+    # The questions without answer of the benchmark are not saved to the real store
+    tmp_dir = tempfile.mkdtemp()
+    dict_user_opts = load_user_search_save_apply_options()
+    dict_user_opts["questions_no_answer_path"] = os.path.join(tmp_dir, "questions_no_answer.db")
+
+    list_scenarios = create_scenarios(args.num_jobs, dict_user_opts, (args.min_questions, args.max_questions),
+                                      (args.min_steps, args.max_steps), args.missing_rate, args.work_experience_rate,
+                                      args.education_rate, args.privacy_policy_rate, args.resume_rate,
+                                      args.step_latency_ms, args.seed)
+    simulator = EasyApplySimulator(list_scenarios)
+    simulator.start()
+    init_questions_store(dict_user_opts)
+
+    try:
+        start = time.perf_counter()
+        list_results = asyncio.run(apply_scenarios(simulator, list_scenarios, dict_user_opts, not args.headed))
+        elapsed = time.perf_counter() - start
+    finally:
+        close_questions_store()
+        simulator.close()
+        shutil.rmtree(tmp_dir)
+
+    list_seconds = sorted(result["seconds"] for result in list_results)
+    print(f"{len(list_results)} jobs in {elapsed:.1f} s ({len(list_results) / elapsed * 60:.1f} jobs/min)")
+    print(f"Seconds per job: median {statistics.median(list_seconds):.2f}, "
+          f"p95 {list_seconds[int(0.95 * (len(list_seconds) - 1))]:.2f}, max {list_seconds[-1]:.2f}")
+
+    dict_outcomes = {}
+    for result in list_results:
+        dict_outcomes[result["outcome"]] = dict_outcomes.get(result["outcome"], 0) + 1
+    print(f"Outcomes: {dict_outcomes}")
+    print(f"Jobs with the expected result: {sum(result['correct'] for result in list_results)}/{len(list_results)}, "
+          f"form validation errors: {sum(result['validation_errors'] for result in list_results)}")
+    for result in list_results:
+        for mismatch in result["mismatches"]:
+            print(f"  Wrong answer: {mismatch}")
+
+    print("Transitions of the Easy Apply flow, the slowest first:")
+    for transition, metrics in sorted(easy_apply.transition_metrics.items(), key=lambda item: item[1]["seconds_total"], reverse=True):
+        print(f"{transition:>28}: {metrics['count']:>5} times, {metrics['seconds_total']:8.1f} s total, "
+              f"{metrics['seconds_total'] / metrics['count']:.2f} s mean, {metrics['seconds_max']:.2f} s max")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Benchmark of the near duplicate index (modules/near_duplicate_index.py) with hundreds of thousands of jobs.
+
+The jobs of the index have random fingerprints (the fingerprints of unrelated descriptions are like random ones).
+The lookups are near duplicates of jobs of the index, with a known number of different bits, and new jobs without
+a near duplicate. It reports the time to load the index, the time of the lookups and the near duplicates found
+at each distance.
+
+Run it from the root folder of the repo:
+
+    python -m benchmarks.bench_near_duplicates --num-jobs 300000 --similarity 0.9
+"""
+import os, time, random, sqlite3, resource, argparse, tempfile, statistics
+from modules.near_duplicate_index import NearDuplicateIndex, FINGERPRINT_BITS, to_sqlite_integer
+
+def flip_bits(rnd, fingerprint, distance):
+    """Function that changes distance random bits of a fingerprint"""
+    for bit in rnd.sample(range(FINGERPRINT_BITS), distance):
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the near duplicate index")
+    parser.add_argument("--num-jobs", type=int, default=300000, help="Jobs in the index")
+    parser.add_argument("--similarity", type=float, default=0.9, help="near_duplicate_similarity of the configfile")
+    parser.add_argument("--num-lookups", type=int, default=2000, help="Lookups of each distance")
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, "near_duplicates.db")
+    list_fingerprints = [rnd.getrandbits(FINGERPRINT_BITS) for _ in range(args.num_jobs)]
+
+    connection = sqlite3.connect(path)
+    connection.execute("""CREATE TABLE near_duplicates (job_id TEXT PRIMARY KEY, fingerprint INTEGER, url TEXT,
+                          decision TEXT, applied INTEGER, first_seen TEXT)""")
+    connection.executemany("INSERT INTO near_duplicates VALUES (?, ?, '', '{}', 0, '')",
+                           ((str(3700000000 + i), to_sqlite_integer(fingerprint))
+                            for i, fingerprint in enumerate(list_fingerprints)))
+    connection.commit()
+    connection.close()
+
+    try:
+        start = time.perf_counter()
+        index = NearDuplicateIndex(path, args.similarity)
+        print(f"Loaded {args.num_jobs} jobs in {time.perf_counter() - start:.2f} s, {len(index.buckets)} tables, "
+              f"max distance {index.max_distance} bits, max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+        # Distance None are new jobs without a near duplicate
+        for distance in list(range(0, index.max_distance + 1)) + [None]:
+            list_times = []
+            num_found = 0
+            for i in range(args.num_lookups):
+                if distance is None:
+                    fingerprint, expected_job_id = rnd.getrandbits(FINGERPRINT_BITS), None
+                else:
+                    position = rnd.randrange(args.num_jobs)
+                    fingerprint = flip_bits(rnd, list_fingerprints[position], distance)
+                    expected_job_id = str(3700000000 + position)
+                start = time.perf_counter()
+                match = index.find(fingerprint, "new job")
+                list_times.append((time.perf_counter() - start) * 1000)
+                num_found += match is not None and match["job_id"] == expected_job_id
+            found = f"found {num_found / args.num_lookups:.1%}" if distance is not None else "no near duplicate"
+            print(f"Distance {'random' if distance is None else distance:>6}: {found}, median {statistics.median(list_times):.3f} ms, "
+                  f"p99 {statistics.quantiles(list_times, n=100)[98]:.3f} ms")
+        index.close()
+    finally:
+        for file_name in os.listdir(tmp_dir):
+            os.remove(os.path.join(tmp_dir, file_name))
+        os.rmdir(tmp_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Benchmark of the PostgreSQL save path with synthetic jobs.
+
+Run it from the root folder of the repo (it needs the .env file with the PostgreSQL variables):
+
+    python -m benchmarks.bench_postgresql_save --num-jobs 10000 --page-size 25
+"""
+import argparse
+from modules.helper_functions import load_user_search_save_apply_options
+from modules.postgresql_pool import init_postgresql_pool, close_postgresql_pool, get_postgresql_connection, \
+    get_pool_metrics
+from modules.save_to_postgresql_db import save_to_postgresql_db
+from modules.postgresql_migrations import run_postgresql_migrations
+from benchmarks.synthetic_jobs import create_synthetic_jobs, save_in_pages
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the PostgreSQL save path")
+    parser.add_argument("--num-jobs", type=int, default=10000)
+    parser.add_argument("--page-size", type=int, default=25, help="Jobs saved per call (25 = one results page)")
+    parser.add_argument("--table", default="linkedin_jobs_benchmark")
+    args = parser.parse_args()
+
+    dict_user_opts = load_user_search_save_apply_options()
+    dict_user_opts["name_postgre_table"] = args.table
+
+    init_postgresql_pool(dict_user_opts)
+    run_postgresql_migrations(dict_user_opts)
+
+    list_jobs_instances = create_synthetic_jobs(args.num_jobs)
+
+    try:
+        # First pass: every job is new. Second pass: every job is already saved and is updated
+        for name in ["insert", "update"]:
+            elapsed, new, updated = save_in_pages(save_to_postgresql_db, list_jobs_instances, args.page_size, dict_user_opts)
+            print(f"{name:>10}: {len(list_jobs_instances)} jobs in {elapsed:.2f} s "
+                  f"({len(list_jobs_instances) / elapsed:.0f} jobs/s) new={new} updated={updated}")
+        print(f"Pool metrics: {get_pool_metrics()}")
+    finally:
+        with get_postgresql_connection() as connection:
+            with connection.cursor() as cur:
+                # The jobs table and the tables of the snapshots and the aggregates
+                for suffix in ["", "_snapshots", "_tag_demand_weekly", "_reason_weekly"]:
+                    cur.execute(f"DROP TABLE IF EXISTS {args.table}{suffix}")
+                cur.execute("DELETE FROM schema_migrations WHERE table_name = %s", (args.table,))
+            connection.commit()
+        close_postgresql_pool()
+
+if __name__ == "__main__":
+    main()
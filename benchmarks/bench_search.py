@@ -0,0 +1,52 @@
+"""Benchmark of the full-text search of the SQLite backend with synthetic jobs.
+
+Run it from the root folder of the repo:
+
+    python -m benchmarks.bench_search --num-jobs 100000
+"""
+import os, time, argparse, tempfile, statistics
+from modules.save_to_sqlite_db import init_sqlite_db, save_to_sqlite_db, close_sqlite_db
+from modules.job_search_index import search_jobs
+from benchmarks.synthetic_jobs import create_synthetic_jobs
+
+QUERIES = [
+    ("dbt AND snowflake", None, None),
+    ("dbt AND snowflake", None, "Denmark"),
+    ("kafka OR spark", ["python"], "Germany"),
+    ('"data pipelines"', None, None),
+    ("airflow NOT azure", None, "Spain"),
+]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the full-text search")
+    parser.add_argument("--num-jobs", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20, help="Times each query is run")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    dict_user_opts = {"sqlite_db_path": os.path.join(tmp_dir, "benchmark.db"), "name_postgre_table": "linkedin_jobs"}
+
+    init_sqlite_db(dict_user_opts)
+    try:
+        list_jobs_instances = create_synthetic_jobs(args.num_jobs)
+        start = time.perf_counter()
+        for i in range(0, len(list_jobs_instances), 1000):
+            save_to_sqlite_db(list_jobs_instances[i:i + 1000], dict_user_opts)
+        print(f"Inserted and indexed {len(list_jobs_instances)} jobs in {time.perf_counter() - start:.2f} s")
+
+        for query, list_tags, country in QUERIES:
+            list_times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                list_results = search_jobs(query, "sqlite", dict_user_opts, list_tags, country, limit=20)
+                list_times.append((time.perf_counter() - start) * 1000)
+            print(f"{query!r:>22} tags={list_tags} country={country}: {len(list_results)} results, "
+                  f"median {statistics.median(list_times):.1f} ms, max {max(list_times):.1f} ms")
+    finally:
+        close_sqlite_db()
+        for file_name in os.listdir(tmp_dir):
+            os.remove(os.path.join(tmp_dir, file_name))
+        os.rmdir(tmp_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Benchmark of the SQLite save path with synthetic jobs. Same measures as bench_postgresql_save.py,
+so the two backends can be compared.
+
+Run it from the root folder of the repo:
+
+    python -m benchmarks.bench_sqlite_save --num-jobs 10000 --page-size 25
+"""
+import os, argparse, tempfile
+from modules.save_to_sqlite_db import init_sqlite_db, save_to_sqlite_db, close_sqlite_db
+from benchmarks.synthetic_jobs import create_synthetic_jobs, save_in_pages
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the SQLite save path")
+    parser.add_argument("--num-jobs", type=int, default=10000)
+    parser.add_argument("--page-size", type=int, default=25, help="Jobs saved per call (25 = one results page)")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    dict_user_opts = {"sqlite_db_path": os.path.join(tmp_dir, "benchmark.db"), "name_postgre_table": "linkedin_jobs"}
+
+    init_sqlite_db(dict_user_opts)
+
+    list_jobs_instances = create_synthetic_jobs(args.num_jobs)
+
+    try:
+        # First pass: every job is new. Second pass: every job is already saved and is updated
+        for name in ["insert", "update"]:
+            elapsed, new, updated = save_in_pages(save_to_sqlite_db, list_jobs_instances, args.page_size, dict_user_opts)
+            print(f"{name:>10}: {len(list_jobs_instances)} jobs in {elapsed:.2f} s "
+                  f"({len(list_jobs_instances) / elapsed:.0f} jobs/s) new={new} updated={updated}")
+    finally:
+        close_sqlite_db()
+        for file_name in os.listdir(tmp_dir):
+            os.remove(os.path.join(tmp_dir, file_name))
+        os.rmdir(tmp_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Local simulator of the LinkedIn Easy Apply modal, to test and benchmark modules/easy_apply.py without network.
+
+The modal is made of static fixtures (benchmarks/fixtures/easy_apply) with the same markup and selectors as
+LinkedIn: input, select, checkbox fieldset and fill-and-select combobox questions, the Work experience and
+Education repeatable groups, the Privacy policy and the resume picker. Each job page loads a scenario (the
+steps of its form) generated by create_scenarios and served by EasyApplySimulator.
+"""
+import os, json, random, threading, functools
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from modules.helper_functions import load_json_to_dict
+from modules.answer_index import get_answers_work_visa
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "easy_apply")
+COUNTRIES = ["Denmark", "Spain", "Germany", "United States", "Canada"]
+RESUMES = ["English", "Espanol", "Italiano"]
+# Questions that are not in the answers file, to follow the path of the questions without answer
+UNKNOWN_QUESTIONS = [
+    "How many years of experience do you have with Fortran 77?",
+    "What is your notice period in days?",
+    "What is your expected salary?",
+    "Have you ever worked for this company before?",
+]
+
+def get_question_types(answer):
+    """Function that gets the types of question that can ask for an answer
+
+    Parameters
+    ----------
+        answer : str
+            Answer of the question
+    Returns
+    -------
+        list_types : list
+            Types of the modal: input, select, checkbox and fill_select
+    """
+    if answer in ["Yes", "No"]:
+        return ["select", "checkbox"]
+    return ["input", "select", "fill_select"]
+
+def create_question(rnd, question, answer):
+    """Function that creates a question of a scenario
+
+    Parameters
+    ----------
+        rnd : random.Random
+            Random generator
+        question : str
+            Text of the question
+        answer : str or None
+            Expected answer, None for the questions without answer
+    Returns
+    -------
+        dict_question : dict
+            Question with its type, options and expected answer
+    """
+    question_type = rnd.choice(get_question_types(answer or ""))
+    options = []
+    if question_type == "select":
+        options = ["Yes", "No"] if answer in ["Yes", "No"] else [answer or "Option 1", "Other"]
+    elif question_type == "checkbox":
+        options = ["Yes", "No"]
+    return {"type": question_type, "question": question, "options": options, "answer": answer}
+
+def create_scenarios(num_jobs, dict_user_opts, questions_per_step=(1, 4), question_steps=(1, 3), missing_rate=0.1,
+                     work_experience_rate=0.2, education_rate=0.2, privacy_policy_rate=0.2, resume_rate=0.5,
+                     step_latency_ms=0, seed=0):
+    """Function that creates the scenarios (steps of the Easy Apply form) of the simulated jobs. The questions
+    are taken from the answers file and the work visa answers of the country of the job
+
+    Parameters
+    ----------
+        num_jobs : int
+            Number of scenarios
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+        questions_per_step : tuple
+            Min and max number of questions of a step
+        question_steps : tuple
+            Min and max number of steps with questions
+        missing_rate : float
+            Probability that a step has a question without answer
+        work_experience_rate, education_rate, privacy_policy_rate, resume_rate : float
+            Probability that the form has a Work experience, Education, Privacy policy or resume step
+        step_latency_ms : int
+            Milliseconds to load the next step after clicking Next or Review
+        seed : int
+            Seed of the random generator, so the same scenarios are created every time
+    Returns
+    -------
+        list_scenarios : list
+            List of dicts with the country, the steps and if all the questions have an answer
+    """
+    rnd = random.Random(seed)
+    dict_answers = load_json_to_dict(dict_user_opts["easy_apply_quest_answ_path"])
+    list_scenarios = []
+
+    for i in range(num_jobs):
+        country = rnd.choice(COUNTRIES)
+        pool = list({**dict_answers, **get_answers_work_visa(dict_user_opts, country)}.items())
+        steps = []
+        answerable = True
+
+        for _ in range(rnd.randint(*question_steps)):
+            sample = rnd.sample(pool, k=min(len(pool), rnd.randint(*questions_per_step)))
+            questions = [create_question(rnd, question, answer) for question, answer in sample]
+            if rnd.random() < missing_rate:
+                questions.append(create_question(rnd, rnd.choice(UNKNOWN_QUESTIONS), None))
+                answerable = False
+            steps.append({"kind": "questions", "questions": questions})
+
+        if rnd.random() < work_experience_rate:
+            steps.append({"kind": "work_experience", "prefilled": rnd.randint(0, 2)})
+        if rnd.random() < education_rate:
+            steps.append({"kind": "education", "prefilled": rnd.randint(0, 1)})
+        if rnd.random() < resume_rate:
+            steps.insert(0, {"kind": "resume", "resumes": rnd.sample(RESUMES, k=len(RESUMES))})
+        if rnd.random() < privacy_policy_rate:
+            steps.append({"kind": "privacy_policy"})
+        steps.append({"kind": "review"})
+
+        list_scenarios.append({"id": i, "country": country, "steps": steps, "answerable": answerable,
+                               "step_latency_ms": step_latency_ms})
+
+    return list_scenarios
+
+class SimulatorRequestHandler(SimpleHTTPRequestHandler):
+    """Serves the fixtures of the modal and the scenarios of the simulator at /scenarios/<n>.json"""
+    def __init__(self, *args, list_scenarios=None, **kwargs):
+        self.list_scenarios = list_scenarios
+        super().__init__(*args, directory=FIXTURES_DIR, **kwargs)
+
+    def do_GET(self):
+        if self.path.startswith("/scenarios/"):
+            number = self.path[len("/scenarios/"):].removesuffix(".json")
+            if not number.isdigit() or int(number) >= len(self.list_scenarios):
+                self.send_error(404)
+                return
+            body = json.dumps(self.list_scenarios[int(number)]).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+class EasyApplySimulator():
+    """Local HTTP server of the Easy Apply simulator, running in a thread"""
+    def __init__(self, list_scenarios, port=0):
+        handler = functools.partial(SimulatorRequestHandler, list_scenarios=list_scenarios)
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.thread = None
+
+    def start(self):
+        """Start the server in a thread"""
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def get_job_url(self, number):
+        """Function that gets the url of the job page of a scenario
+
+        Parameters
+        ----------
+            number : int
+                Number of the scenario
+        Returns
+        -------
+            url : str
+                Url of the job page
+        """
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/job.html?scenario={number}"
+
+    def close(self):
+        """Stop the server"""
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,411 @@
+// Simulator of the LinkedIn Easy Apply modal. It loads the scenario of the url (?scenario=<n>) from the
+// server and renders its steps with the same markup and selectors that modules/easy_apply.py and
+// modules/easy_apply_form.py use. The result of the application is kept in window.easyApplySimulator
+
+const state = {
+    scenario: null,
+    step: 0,
+    answers: {},
+    mismatches: [],
+    validationErrors: 0,
+    workExperience: [],
+    education: [],
+    privacyPolicyAccepted: false,
+    resumeSelected: null,
+    submitted: false,
+    discarded: false,
+};
+window.easyApplySimulator = state;
+
+let modal = null;
+let nextId = 0;
+
+function el(tag, attributes = {}, children = []) {
+    const element = document.createElement(tag);
+    for (const [name, value] of Object.entries(attributes)) {
+        if (name === "text") element.textContent = value;
+        else element.setAttribute(name, value);
+    }
+    for (const child of children) element.appendChild(child);
+    return element;
+}
+
+function uniqueId(prefix) {
+    nextId += 1;
+    return `${prefix}-${nextId}`;
+}
+
+// Typeahead of the comboboxes: typing shows the suggestions, ArrowDown moves to the next one and Enter selects it
+function makeTypeahead(input) {
+    const listbox = el("ul", {role: "listbox", class: "basic-typeahead__triggered-content"});
+    listbox.hidden = true;
+    let active = -1;
+
+    input.addEventListener("input", () => {
+        input.dataset.selected = "";
+        listbox.innerHTML = "";
+        active = -1;
+        const typed = input.value.trim();
+        if (!typed) {
+            listbox.hidden = true;
+            return;
+        }
+        for (const suggestion of [`${typed}, Capital Region`, `Greater ${typed} Area`]) {
+            listbox.appendChild(el("li", {role: "option", class: "basic-typeahead__selectable", text: suggestion}));
+        }
+        listbox.hidden = false;
+    });
+
+    input.addEventListener("keydown", (event) => {
+        const options = listbox.querySelectorAll("li");
+        if (event.key === "ArrowDown" && options.length) {
+            active = Math.min(active + 1, options.length - 1);
+            options.forEach((option, index) => option.classList.toggle("basic-typeahead__selectable--active", index === active));
+            event.preventDefault();
+        } else if (event.key === "Enter" && active >= 0) {
+            input.value = options[active].textContent;
+            input.dataset.selected = input.value;
+            listbox.hidden = true;
+            event.preventDefault();
+        }
+    });
+
+    return listbox;
+}
+
+// Confirmation dialog over the modal. While it is open the modal is hidden for the accessibility tree,
+// as in LinkedIn, so get_by_role only finds the buttons of the dialog
+function showConfirmDialog(text, confirmName, onConfirm) {
+    modal.setAttribute("aria-hidden", "true");
+    const dialog = el("div", {role: "alertdialog", class: "artdeco-modal--confirm"}, [el("p", {text: text})]);
+    const close = () => {
+        dialog.remove();
+        modal.removeAttribute("aria-hidden");
+    };
+    const confirm = el("button", {text: confirmName});
+    confirm.addEventListener("click", () => { close(); onConfirm(); });
+    const cancel = el("button", {text: "Cancel"});
+    cancel.addEventListener("click", close);
+    dialog.appendChild(confirm);
+    dialog.appendChild(cancel);
+    document.body.appendChild(dialog);
+}
+
+// Questions
+
+function renderQuestion(question) {
+    const grouping = el("div", {class: "jobs-easy-apply-form-section__grouping"});
+    const id = uniqueId("question");
+
+    if (question.type === "input") {
+        grouping.appendChild(el("div", {}, [
+            el("label", {class: "artdeco-text-input--label", for: id, text: question.question}),
+            el("input", {id: id, type: "text"}),
+        ]));
+    } else if (question.type === "select") {
+        const select = el("select", {id: id}, [el("option", {value: "", text: "Select an option"})]);
+        for (const option of question.options) select.appendChild(el("option", {value: option, text: option}));
+        grouping.appendChild(el("div", {}, [el("label", {for: id}, [el("span", {text: question.question})]), select]));
+    } else if (question.type === "checkbox") {
+        const fieldset = el("fieldset", {}, [el("legend", {}, [
+            el("span", {"aria-hidden": "true", text: question.question}),
+            el("span", {class: "visually-hidden", text: question.question}),
+        ])]);
+        for (const option of question.options) {
+            const optionId = uniqueId("option");
+            fieldset.appendChild(el("div", {}, [
+                el("input", {id: optionId, type: "radio", name: id, value: option, class: "fb-form-element__checkbox"}),
+                el("label", {for: optionId, "data-test-text-selectable-option__label": option, text: option}),
+            ]));
+        }
+        grouping.appendChild(fieldset);
+    } else if (question.type === "fill_select") {
+        const input = el("input", {id: id, type: "text", role: "combobox", "aria-autocomplete": "list"});
+        grouping.appendChild(el("label", {class: "fb-dash-form-element__label", for: id}, [
+            el("span", {"aria-hidden": "true", text: question.question}),
+            el("span", {class: "visually-hidden", text: question.question}),
+        ]));
+        grouping.appendChild(input);
+        grouping.appendChild(makeTypeahead(input));
+    }
+
+    grouping.appendChild(el("div", {class: "artdeco-inline-feedback--error", text: ""}));
+    return grouping;
+}
+
+function getQuestionValue(question, grouping) {
+    if (question.type === "input") return grouping.querySelector("input").value.trim();
+    if (question.type === "select") return grouping.querySelector("select").value;
+    if (question.type === "checkbox") {
+        const checked = grouping.querySelector("input:checked");
+        return checked ? checked.value : "";
+    }
+    if (question.type === "fill_select") return grouping.querySelector("input").dataset.selected || "";
+    return "";
+}
+
+function validateQuestions(step, container) {
+    let valid = true;
+    const groupings = container.querySelectorAll("div.jobs-easy-apply-form-section__grouping");
+    step.questions.forEach((question, index) => {
+        const grouping = groupings[index];
+        const value = getQuestionValue(question, grouping);
+        const error = grouping.querySelector(".artdeco-inline-feedback--error");
+        if (!value) {
+            error.textContent = "Please enter a valid answer";
+            valid = false;
+            return;
+        }
+        error.textContent = "";
+        state.answers[question.question] = value;
+        const matches = question.type === "fill_select" ? value.startsWith(question.answer) : value === question.answer;
+        if (question.answer !== null && !matches) {
+            state.mismatches.push({question: question.question, expected: question.answer, value: value});
+        }
+    });
+    return valid;
+}
+
+// Work experience and Education repeatable groups
+
+function renderRepeatableGroup(step, container) {
+    const isWork = step.kind === "work_experience";
+    const entries = isWork ? state.workExperience : state.education;
+    const removeLabel = isWork ? "Remove the following work experience" : "Remove the following education";
+    const card = el("div", {class: "artdeco-card"});
+    const list = el("div", {class: "jobs-easy-apply-repeatable-groupings__list"});
+
+    const renderEntries = () => {
+        list.innerHTML = "";
+        entries.forEach((entry, index) => {
+            const remove = el("button", {"aria-label": removeLabel, text: "Remove"});
+            remove.addEventListener("click", () => showConfirmDialog(
+                isWork ? "Remove this experience?" : "Remove this education?", "Remove",
+                () => { entries.splice(index, 1); renderEntries(); }));
+            list.appendChild(el("div", {class: "jobs-easy-apply-repeatable-groupings__entry"}, [
+                el("p", {text: isWork ? `${entry.title} at ${entry.company}` : `${entry.degree}, ${entry.school}`}),
+                remove,
+            ]));
+        });
+    };
+
+    for (let i = 0; i < step.prefilled; i++) {
+        entries.push(isWork ? {title: `Prefilled title ${i}`, company: `Prefilled company ${i}`}
+                            : {school: `Prefilled school ${i}`, degree: `Prefilled degree ${i}`});
+    }
+    renderEntries();
+
+    const add = el("button", {class: "jobs-easy-apply-repeatable-groupings__add-button", text: "Add more"});
+    add.addEventListener("click", () => {
+        if (card.querySelector("div.pb4")) return;
+        const form = isWork ? workExperienceForm() : educationForm();
+        const save = el("button", {text: "Save"});
+        save.addEventListener("click", () => {
+            const entry = {};
+            for (const input of form.querySelectorAll("[data-field]")) {
+                entry[input.dataset.field] = input.getAttribute("role") === "combobox" ? input.dataset.selected || "" : input.value;
+            }
+            const required = isWork ? ["title", "company"] : ["school", "degree"];
+            if (required.some((field) => !entry[field])) {
+                state.validationErrors += 1;
+                return;
+            }
+            entries.push(entry);
+            form.remove();
+            renderEntries();
+        });
+        form.appendChild(save);
+        card.appendChild(form);
+    });
+
+    card.appendChild(list);
+    container.appendChild(el("h3", {text: isWork ? "Work experience" : "Education"}));
+    container.appendChild(card);
+    container.appendChild(add);
+}
+
+function labeledControl(labelText, control) {
+    const id = uniqueId("field");
+    control.setAttribute("id", id);
+    return el("div", {}, [el("label", {for: id, text: labelText}), control]);
+}
+
+function monthYearSelects(name) {
+    const months = ["January", "February", "March", "April", "May", "June", "July", "August", "September",
+                    "October", "November", "December"];
+    const month = el("select", {"aria-label": `Month of ${name}`, "data-field": `${name.toLowerCase()}_month`},
+                     months.map((value) => el("option", {value: value, text: value})));
+    const year = el("select", {"aria-label": `Year of ${name}`, "data-field": `${name.toLowerCase()}_year`});
+    for (let value = 2025; value >= 1990; value--) year.appendChild(el("option", {value: String(value), text: String(value)}));
+    return el("div", {}, [month, year]);
+}
+
+function cityCombobox() {
+    const input = el("input", {type: "text", role: "combobox", "aria-label": "City", "data-field": "city"});
+    return el("div", {}, [input, makeTypeahead(input)]);
+}
+
+function workExperienceForm() {
+    const currentId = uniqueId("current");
+    return el("div", {class: "pb4"}, [
+        labeledControl("Your title", el("input", {type: "text", "data-field": "title"})),
+        labeledControl("Company", el("input", {type: "text", "data-field": "company"})),
+        el("div", {}, [
+            el("input", {id: currentId, type: "checkbox", "data-field": "current_work"}),
+            el("label", {for: currentId, "data-test-text-selectable-option__label": "I currently work here",
+                         text: "I currently work here"}),
+        ]),
+        monthYearSelects("From"),
+        monthYearSelects("To"),
+        cityCombobox(),
+        labeledControl("Description", el("textarea", {"data-field": "description"})),
+    ]);
+}
+
+function educationForm() {
+    return el("div", {class: "pb4"}, [
+        labeledControl("School", el("input", {type: "text", "data-field": "school"})),
+        cityCombobox(),
+        labeledControl("Degree", el("input", {type: "text", "data-field": "degree"})),
+        labeledControl("Major / Field of study", el("input", {type: "text", "data-field": "field_study"})),
+        monthYearSelects("From"),
+        monthYearSelects("To"),
+    ]);
+}
+
+// Privacy policy and resume
+
+function renderPrivacyPolicy(container) {
+    const id = uniqueId("privacy");
+    const checkbox = el("input", {id: id, type: "checkbox"});
+    checkbox.addEventListener("change", () => { state.privacyPolicyAccepted = checkbox.checked; });
+    container.appendChild(el("h3", {text: "Privacy policy"}));
+    container.appendChild(el("div", {}, [
+        checkbox,
+        el("label", {for: id, "data-test-text-selectable-option__label": "I Agree Terms & Conditions",
+                     text: "I Agree Terms & Conditions"}),
+    ]));
+}
+
+function renderResume(step, container) {
+    const list = el("div", {class: "jobs-document-upload-redesign-card__list"});
+    const renderCard = (language) => {
+        const card = el("div", {class: "jobs-document-upload-redesign-card__container"}, [el("h3", {text: `CV_${language}.pdf`})]);
+        if (state.resumeSelected === language) card.setAttribute("aria-label", "Selected");
+        card.addEventListener("click", () => {
+            state.resumeSelected = language;
+            for (const other of list.querySelectorAll("div.jobs-document-upload-redesign-card__container")) {
+                other.removeAttribute("aria-label");
+            }
+            card.setAttribute("aria-label", "Selected");
+        });
+        list.appendChild(card);
+    };
+
+    // The first resume is selected and only the first two are shown until "Show more resumes" is clicked
+    state.resumeSelected = step.resumes[0];
+    step.resumes.slice(0, 2).forEach(renderCard);
+    container.appendChild(el("span", {class: "t-14", text: "Resume"}));
+    container.appendChild(list);
+    if (step.resumes.length > 2) {
+        const more = el("button", {"aria-label": "Show more resumes", text: "Show more resumes"});
+        more.addEventListener("click", () => {
+            step.resumes.slice(2).forEach(renderCard);
+            more.remove();
+        });
+        container.appendChild(more);
+    }
+    container.appendChild(el("input", {id: "jobs-document-upload-file-input-upload-resume-1", type: "file", hidden: ""}));
+}
+
+// Steps
+
+function validateStep(step, container) {
+    if (step.kind === "questions") return validateQuestions(step, container);
+    if (step.kind === "work_experience") return state.workExperience.length > 0 && !container.querySelector("div.pb4");
+    if (step.kind === "education") return state.education.length > 0 && !container.querySelector("div.pb4");
+    if (step.kind === "privacy_policy") return state.privacyPolicyAccepted;
+    return true;
+}
+
+function renderStep() {
+    const step = state.scenario.steps[state.step];
+    const content = modal.querySelector(".jobs-easy-apply-content");
+    content.innerHTML = "";
+
+    const container = el("div", {class: "jobs-easy-apply-form-section"});
+    if (step.kind === "questions") step.questions.forEach((question) => container.appendChild(renderQuestion(question)));
+    else if (step.kind === "work_experience" || step.kind === "education") renderRepeatableGroup(step, container);
+    else if (step.kind === "privacy_policy") renderPrivacyPolicy(container);
+    else if (step.kind === "resume") renderResume(step, container);
+    else if (step.kind === "review") container.appendChild(el("h3", {text: "Review your application"}));
+    content.appendChild(container);
+
+    const isLast = state.step === state.scenario.steps.length - 1;
+    const isBeforeLast = state.step === state.scenario.steps.length - 2;
+    const label = isLast ? "Submit application" : isBeforeLast ? "Review your application" : "Continue to next step";
+    const button = el("button", {"aria-label": label, text: isLast ? "Submit application" : isBeforeLast ? "Review" : "Next"});
+    button.addEventListener("click", () => {
+        if (!validateStep(step, container)) {
+            state.validationErrors += 1;
+            return;
+        }
+        if (isLast) {
+            submit();
+            return;
+        }
+        // The next step is loaded after the latency of the scenario, like the requests of LinkedIn
+        state.step += 1;
+        content.innerHTML = "";
+        setTimeout(renderStep, state.scenario.step_latency_ms);
+    });
+    content.appendChild(el("footer", {}, [button]));
+}
+
+function submit() {
+    state.submitted = true;
+    const content = modal.querySelector(".jobs-easy-apply-content");
+    content.innerHTML = "";
+    const done = el("button", {text: "Done"});
+    done.addEventListener("click", closeModal);
+    content.appendChild(el("h3", {text: "Your application was sent"}));
+    content.appendChild(done);
+}
+
+function closeModal() {
+    modal.remove();
+    modal = null;
+}
+
+function openModal() {
+    if (modal) return;
+    state.step = 0;
+    modal = el("div", {class: "jobs-easy-apply-modal", role: "dialog"});
+    const dismiss = el("button", {"aria-label": "Dismiss", text: "×"});
+    dismiss.addEventListener("click", () => {
+        if (state.submitted) {
+            closeModal();
+            return;
+        }
+        showConfirmDialog("Discard application?", "Discard", () => {
+            state.discarded = true;
+            closeModal();
+        });
+    });
+    modal.appendChild(dismiss);
+    modal.appendChild(el("div", {class: "jobs-easy-apply-content"}));
+    document.body.appendChild(modal);
+    renderStep();
+}
+
+async function loadScenario() {
+    const number = new URLSearchParams(window.location.search).get("scenario") || "0";
+    const response = await fetch(`/scenarios/${number}.json`);
+    state.scenario = await response.json();
+
+    const button = el("button", {class: "jobs-apply-button"}, [el("span", {text: "Easy Apply"})]);
+    button.addEventListener("click", openModal);
+    document.querySelector("div.jobs-s-apply > div").appendChild(button);
+}
+
+loadScenario();
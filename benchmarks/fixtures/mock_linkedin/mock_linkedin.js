@@ -0,0 +1,80 @@
+// Search page of the mock LinkedIn (see benchmarks/mock_linkedin.py). Enter searches the jobs of the two
+// comboboxes, the results are paginated and clicking a result loads its detail in the right pane, with the
+// same selectors that linkedin_job_analyzer.py and modules/helper_functions.py use
+
+let searchNumber = 0;
+
+function el(tag, attributes = {}, children = []) {
+    const element = document.createElement(tag);
+    for (const [name, value] of Object.entries(attributes)) {
+        if (name === "text") element.textContent = value;
+        else element.setAttribute(name, value);
+    }
+    for (const child of children) element.appendChild(child);
+    return element;
+}
+
+async function loadResults(page) {
+    searchNumber += 1;
+    const number = searchNumber;
+    const params = new URLSearchParams({
+        keywords: document.getElementById("search-keywords").value,
+        location: document.getElementById("search-location").value,
+        page: String(page),
+    });
+    const response = await fetch(`/api/search?${params}`);
+    const results = await response.json();
+
+    // A newer search started while this one was loading
+    if (number !== searchNumber) return;
+    renderResults(results);
+}
+
+function renderResults(results) {
+    const resultsList = document.querySelector("div.jobs-search-results-list");
+    const details = document.querySelector("div.jobs-search__job-details");
+    resultsList.innerHTML = "";
+    details.innerHTML = "";
+
+    if (!results.jobs.length) {
+        resultsList.appendChild(el("h1", {text: "No matching jobs found."}));
+        return;
+    }
+
+    const list = el("ul", {class: "scaffold-layout__list-container"});
+    for (const job of results.jobs) {
+        const item = el("li", {class: "ember-view", "data-job-id": job.id}, [
+            el("strong", {text: job.title}),
+            el("div", {text: job.company}),
+        ]);
+        item.addEventListener("click", () => loadJob(job.id));
+        list.appendChild(item);
+    }
+    resultsList.appendChild(list);
+
+    if (results.pages > 1) {
+        const pages = el("ul", {class: "artdeco-pagination__pages"});
+        for (let page = 1; page <= results.pages; page++) {
+            const button = el("button", {"aria-label": `Page ${page}`, text: String(page)});
+            button.addEventListener("click", () => loadResults(page));
+            pages.appendChild(el("li", {}, [button]));
+        }
+        resultsList.appendChild(el("div", {class: "jobs-search-results-list__pagination"}, [
+            pages,
+            el("div", {class: "artdeco-pagination__page-state", text: `Page ${results.page} of ${results.pages}`}),
+        ]));
+    }
+}
+
+async function loadJob(jobId) {
+    const response = await fetch(`/api/jobs/${jobId}`);
+    document.querySelector("div.jobs-search__job-details").innerHTML = await response.text();
+}
+
+// LinkedIn searches when Enter is pressed in the search box
+document.addEventListener("keydown", (event) => {
+    if (event.key === "Enter") {
+        event.preventDefault();
+        loadResults(1);
+    }
+});
@@ -0,0 +1,248 @@
+"""Local mock of the LinkedIn jobs site, to run the crawler end to end without hitting LinkedIn.
+
+It serves the search page (benchmarks/fixtures/mock_linkedin), the paginated results of
+ul.scaffold-layout__list-container, the detail pane with the markup that scrap_job reads and the
+"No matching jobs found." state. The jobs are generated from the search, so the same search returns the same
+jobs every time. The latency of the requests and the size of the pages and descriptions are configurable.
+"""
+import os, json, time, random, hashlib, threading, functools
+from html import escape
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "mock_linkedin")
+TITLES = ["Data Engineer", "Junior Data Engineer", "Senior Data Engineer", "Analytics Engineer", "Lead Data Engineer"]
+TECHNOLOGIES = ["Python", "SQL", "Airflow", "Spark", "dbt", "Snowflake", "AWS", "Azure", "Kafka", "Docker",
+                "Java", "Scala", "Kubernetes", "Terraform", "Power BI"]
+LANGUAGES = ["English", "German", "French", "Dutch", "Spanish"]
+# Sentences repeated in many descriptions, like the company intros, benefits and equal opportunity statements
+BOILERPLATE = [
+    "We are a fast growing company with offices in several countries.",
+    "Our mission is to make data useful for everyone.",
+    "We offer a competitive salary, flexible hours and a yearly training budget.",
+    "You will join a friendly team that values ownership and collaboration.",
+    "We are an equal opportunity employer and value diversity at our company.",
+    "We do not discriminate on the basis of race, religion, color, national origin or gender.",
+    "Hybrid work is possible from our main office.",
+]
+POSTED = ["2 hours ago", "5 hours ago", "1 day ago", "3 days ago", "1 week ago", "2 weeks ago", "1 month ago"]
+
+def get_stable_number(text):
+    """Function that gets a number from a text that is the same in every run (hash() changes between runs)"""
+    return int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:8], 16)
+
+def create_description(rnd, description_sentences):
+    """Function that creates the description of a job with requirement and boilerplate sentences
+
+    Parameters
+    ----------
+        rnd : random.Random
+            Random generator
+        description_sentences : int
+            Number of sentences of the description
+    Returns
+    -------
+        list_lines : list
+            Lines of the description
+    """
+    list_lines = []
+    for _ in range(description_sentences):
+        kind = rnd.random()
+        if kind < 0.5:
+            list_lines.append(rnd.choice(BOILERPLATE))
+        elif kind < 0.8:
+            list_lines.append(f"You have {rnd.randint(1, 6)}+ years of experience with {rnd.choice(TECHNOLOGIES)}.")
+        elif kind < 0.9:
+            list_lines.append(f"Experience with {', '.join(rnd.sample(TECHNOLOGIES, k=3))} is a plus.")
+        else:
+            list_lines.append(f"Fluent {rnd.choice(LANGUAGES)} is a must.")
+    return list_lines
+
+class MockLinkedin():
+    """Local HTTP server of the mock LinkedIn, running in a thread
+
+    Parameters
+    ----------
+        jobs_per_page : int
+            Number of results of each page
+        pages : int
+            Number of pages of each search
+        description_sentences : int
+            Number of sentences of each description
+        latency_ms : int
+            Milliseconds added to each request of results or job detail
+        empty_rate : float
+            Fraction of the locations without results ("No matching jobs found.")
+        seed : int
+            Seed of the generated jobs
+    """
+    def __init__(self, jobs_per_page=25, pages=3, description_sentences=30, latency_ms=0, empty_rate=0.0, seed=0, port=0):
+        self.jobs_per_page = jobs_per_page
+        self.pages = pages
+        self.description_sentences = description_sentences
+        self.latency_ms = latency_ms
+        self.empty_rate = empty_rate
+        self.seed = seed
+        self.dict_jobs = {}
+        self.lock = threading.Lock()
+
+        # Metrics
+        self.requests = {"search": 0, "job": 0}
+        self.bytes_sent = 0
+
+        handler = functools.partial(MockLinkedinRequestHandler, mock=self)
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.thread = None
+
+    def start(self):
+        """Start the server in a thread"""
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def get_base_url(self):
+        """Function that gets the url to use as linkedin_base_url"""
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def close(self):
+        """Stop the server"""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def search(self, keywords, location, page):
+        """Function that gets a page of results of a search
+
+        Parameters
+        ----------
+            keywords : str
+                Text of the search box
+            location : str
+                Location of the search
+            page : int
+                Number of the page
+        Returns
+        -------
+            results : dict
+                Dict with the page, the number of pages and the list of jobs (id, title and company)
+        """
+        if location and get_stable_number(f"{self.seed}-{location}") % 1000 < self.empty_rate * 1000:
+            return {"page": page, "pages": 0, "jobs": []}
+
+        list_jobs = []
+        for index in range(self.jobs_per_page):
+            key = f"{self.seed}-{keywords}-{location}-{page}-{index}"
+            job_id = str(3000000000 + get_stable_number(key) % 1000000000)
+            with self.lock:
+                if job_id not in self.dict_jobs:
+                    self.dict_jobs[job_id] = self.create_job(job_id, key, location)
+            job = self.dict_jobs[job_id]
+            list_jobs.append({"id": job_id, "title": job["title"], "company": job["company"]})
+
+        return {"page": page, "pages": self.pages, "jobs": list_jobs}
+
+    def create_job(self, job_id, key, location):
+        """Function that creates the information of a job of a search"""
+        rnd = random.Random(key)
+        return {
+            "id": job_id,
+            "title": rnd.choice(TITLES),
+            "company": f"Company {rnd.randint(1, 500)}",
+            "location": f"City {rnd.randint(1, 50)}, Region, {location or 'Denmark'}",
+            "posted": ("Reposted " if rnd.random() < 0.2 else "") + rnd.choice(POSTED),
+            "applicants": rnd.randint(0, 300),
+            "contract_type": rnd.choice(["On-site", "Hybrid", "Remote"]),
+            "contract_time": rnd.choice(["Full-time", "Part-time", "Contract"]),
+            "experience": rnd.choice(["Entry level", "Associate", "Mid-Senior level"]),
+            "easy_apply": rnd.random() < 0.5,
+            "description": create_description(rnd, self.description_sentences),
+        }
+
+    def get_job_html(self, job_id):
+        """Function that renders the detail pane of a job with the markup that scrap_job reads
+
+        Parameters
+        ----------
+            job_id : str
+                Id of the job
+        Returns
+        -------
+            html : str or None
+                Html of the detail pane, None if the job does not exist
+        """
+        with self.lock:
+            job = self.dict_jobs.get(job_id)
+        if job is None:
+            return None
+
+        top_card = "job-details-jobs-unified-top-card__"
+        apply_button = '<button class="jobs-apply-button"><span>Easy Apply</span></button>' if job["easy_apply"] else \
+            '<button class="jobs-apply-button"><span>Apply</span></button>'
+        # Without spaces between the tags, each paragraph is one line of the text of the article
+        description = "".join(f"<p>{escape(line)}</p>" for line in job["description"])
+        return f"""
+<div class="job-view-layout jobs-details">
+  <a href="/jobs/view/{job_id}/?refId=mock">{escape(job["title"])}</a>
+  <h2 class="{top_card}job-title">{escape(job["title"])}</h2>
+  <div class="{top_card}primary-description-without-tagline">{escape(job["company"])} · {escape(job["location"])} <span class="tvm__text">{escape(job["posted"])}</span> · {job["applicants"]} applicants</div>
+  <ul>
+    <li class="{top_card}job-insight">
+      <span><span aria-hidden="true">{job["contract_type"]}</span></span>
+      <span><span aria-hidden="true">{job["contract_time"]}</span></span>
+      <span class="{top_card}job-insight-view-model-secondary">·</span>
+      <span class="{top_card}job-insight-view-model-secondary">{job["experience"]}</span>
+    </li>
+  </ul>
+  <div class="jobs-s-apply"><div>{apply_button}</div></div>
+  <article><h2>About the job</h2>{description}<button>…show more</button></article>
+</div>
+"""
+
+class MockLinkedinRequestHandler(SimpleHTTPRequestHandler):
+    """Serves the fixtures of the mock LinkedIn (the search page is /jobs/), the results at /api/search and the
+    detail pane of the jobs at /api/jobs/<id>"""
+    def __init__(self, *args, mock=None, **kwargs):
+        self.mock = mock
+        super().__init__(*args, directory=FIXTURES_DIR, **kwargs)
+
+    def send_body(self, body, content_type):
+        """Function that sends a response with a body"""
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        with self.mock.lock:
+            self.mock.bytes_sent += len(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+
+        if url.path in ["/jobs", "/jobs/"]:
+            self.path = "/jobs.html"
+            super().do_GET()
+            return
+
+        if url.path.startswith("/api/"):
+            time.sleep(self.mock.latency_ms / 1000)
+
+        if url.path == "/api/search":
+            params = parse_qs(url.query)
+            results = self.mock.search(params.get("keywords", [""])[0], params.get("location", [""])[0],
+                                       int(params.get("page", ["1"])[0]))
+            with self.mock.lock:
+                self.mock.requests["search"] += 1
+            self.send_body(json.dumps(results), "application/json")
+        elif url.path.startswith("/api/jobs/"):
+            html = self.mock.get_job_html(url.path[len("/api/jobs/"):])
+            if html is None:
+                self.send_error(404)
+                return
+            with self.mock.lock:
+                self.mock.requests["job"] += 1
+            self.send_body(html, "text/html; charset=utf-8")
+        else:
+            super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,90 @@
+import random, string, time
+from datetime import datetime, timedelta
+from modules.item import Job
+
+COUNTRIES = ["Denmark", "Sweden", "Germany", "Spain", "Netherlands", "Ireland", "Poland", "Italy"]
+TAGS = ["python", "sql", "airflow", "spark", "dbt", "snowflake", "aws", "azure", "kafka", "docker"]
+# Words of the descriptions. Random words, so the full-text index has a realistic number of different terms
+VOCABULARY = ["".join(random.Random(i).choices(string.ascii_lowercase, k=random.Random(-i).randint(3, 10)))
+              for i in range(5000)]
+REASONS = ["Experience", "Seniority", "Language Requirement", "Programming Language", "Technology Group"]
+
+def create_synthetic_jobs(num_jobs, seed=0):
+    """Function that creates job instances with random but realistic values, to be used in the benchmarks
+
+    Parameters
+    ----------
+        num_jobs : int
+            Number of job instances to create
+        seed : int
+            Seed of the random generator, so the same jobs are created every time
+    Returns
+    -------
+        list_jobs_instances : list
+            List of job instances
+    """
+    rnd = random.Random(seed)
+    list_jobs_instances = []
+
+    for i in range(num_jobs):
+        job = Job()
+        job.search_position = "data engineer"
+        job.search_country = rnd.choice(COUNTRIES)
+        job.url = f"https://www.linkedin.com/jobs/view/{3700000000 + i}/"
+        job.position_name = rnd.choice(["Data Engineer", "Junior Data Engineer", "Analytics Engineer"])
+        job.company = "Company " + "".join(rnd.choices(string.ascii_uppercase, k=3))
+        job.city = "City"
+        job.country = job.search_country
+        job.contract_type = rnd.choice(["Hybrid", "Remote", "On-site"])
+        job.applicants = rnd.randint(0, 200)
+        job.contract_time = "Full-time"
+        job.experience = rnd.choice(["Entry level", "Associate", "Mid-Senior level"])
+        job.list_tags = rnd.sample(TAGS, k=rnd.randint(1, 5))
+        # Long enough description to be similar to a real one. Only the tags of the job are mentioned
+        job.description = f"job {i}. we build data pipelines. " + " ".join(rnd.choices(VOCABULARY, k=300)) + \
+            " we use " + ", ".join(job.list_tags) + "."
+        job.description_lang = "en"
+        job.posted_date = (datetime.now() - timedelta(days=rnd.randint(0, 60))).strftime("%d-%m-%Y")
+        job.apply = rnd.random() < 0.3
+        job.email = []
+        job.reason_not_apply = [] if job.apply else rnd.sample(REASONS, k=rnd.randint(1, 2))
+        job.list_tech_no_knowledge = []
+        job.easy_apply_questions = []
+        job.applied = False
+        job.could_not_apply_due_to_questions = False
+        job.manual_apply = False
+        list_jobs_instances.append(job)
+
+    return list_jobs_instances
+
+def save_in_pages(save_function, list_jobs_instances, page_size, dict_user_opts):
+    """Function that saves the jobs in pages, like the crawler does after each results page
+
+    Parameters
+    ----------
+        save_function : function
+            Function of the backend that saves a list of jobs and returns the new and updated counts
+        list_jobs_instances : list
+            List of job instances
+        page_size : int
+            Number of jobs saved per call
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    Returns
+    -------
+        elapsed : float
+            Seconds spent saving
+        num_new_jobs : int
+            Number of jobs inserted
+        num_updated_jobs : int
+            Number of jobs that were already in the table and were updated
+    """
+    num_new_jobs, num_updated_jobs = 0, 0
+    start = time.perf_counter()
+    for i in range(0, len(list_jobs_instances), page_size):
+        new, updated = save_function(list_jobs_instances[i:i + page_size], dict_user_opts)
+        num_new_jobs += new
+        num_updated_jobs += updated
+    elapsed = time.perf_counter() - start
+
+    return elapsed, num_new_jobs, num_updated_jobs
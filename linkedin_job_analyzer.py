@@ -1,90 +1,163 @@
 import asyncio, logging
 from playwright.async_api import async_playwright
 from modules.helper_functions import load_user_search_save_apply_options, logger_config, \
-    get_total_number_job_pages, save_jobs_information, log_exceptions
+    get_total_number_job_pages, log_exceptions
 from modules.main_page_functions import create_broswer_page, search_job_offers,\
     scrap_apply_jobs_page, search_job_offers
-from modules.check_apply import create_nlp_model
-
-# Configure logger
-logger_config()
+from modules.check_apply import create_nlp_model, sentence_cache
+from modules.postgresql_pool import close_postgresql_pool
+from modules.background_writer import BackgroundWriter
+from modules.sinks import close_sink_dispatchers
+from modules.save_to_sqlite_db import close_sqlite_db
+from modules.near_duplicate_index import init_near_duplicate_index, close_near_duplicate_index
+from modules.analysis_executor import init_analysis_executor, close_analysis_executor
+from modules.apply_queue import init_apply_queue, close_apply_queue, EasyApplyWorker
+from modules.easy_apply import log_easy_apply_metrics
+from modules.questions_no_answer_store import init_questions_store, close_questions_store
+from modules.instrumentation import init_instrumentation, log_instrumentation_summary
+from modules.metrics_export import init_metrics_export, close_metrics_export
+from modules.log_queue import set_log_context
 
 logger = logging.getLogger('main')
 
-logger.info("-"*60)
-logger.info("Starting main...")
-
-# Load the user options
-dict_user_opts = load_user_search_save_apply_options()
-
-# Create NLP model to analyze descriptions and titles
-nlp = create_nlp_model()
-
-async def run(p):
-    """Main function"""
+async def run(p, dict_user_opts, nlp):
+    """Main function
+
+    Parameters
+    ----------
+        p : playwright object
+            playwright object
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+        nlp : spacy nlp model
+            Spacy nlp model to be used
+    """
     # Create Broswer and apply filters
     page, browser, context = await create_broswer_page(p, dict_user_opts)
 
-    # Get positions and countries
-    positions = dict_user_opts['search_positions']
-    countries = dict_user_opts['search_countries']
-
-    for user_search_position in positions:
-        country_search_count = 0
-        for user_search_country in countries:
-            country_search_count +=1
-
-            logger.info(f"User Search Position: {user_search_position}")
-            logger.info(f"User Search Country: {user_search_country}")
-
-            # Perform the job_search
-            page = await search_job_offers(page, user_search_position, user_search_country, \
-                country_search_count, dict_user_opts)
+    # Start the sinks that save the jobs in the background. They open their connections once for the whole run
+    writer = BackgroundWriter(dict_user_opts)
+    writer.start()
+
+    apply_worker = None
+    try:
+        # Load the fingerprints of the jobs analyzed in previous runs
+        init_near_duplicate_index(dict_user_opts)
+
+        # Start the worker that applies the jobs of the apply queue with its own browser context
+        init_apply_queue(dict_user_opts)
+        apply_worker = EasyApplyWorker(browser, writer, dict_user_opts)
+        if dict_user_opts["apply_with_easy_apply"]:
+            apply_worker.start()
+
+        # Get positions and countries
+        positions = dict_user_opts['search_positions']
+        countries = dict_user_opts['search_countries']
+
+        for user_search_position in positions:
+            country_search_count = 0
+            for user_search_country in countries:
+                country_search_count +=1
+
+                set_log_context(position=user_search_position, country=user_search_country, page=None, job_id=None)
+                logger.info(f"User Search Position: {user_search_position}")
+                logger.info(f"User Search Country: {user_search_country}")
+
+                # Perform the job_search
+                page = await search_job_offers(page, user_search_position, user_search_country, \
+                    country_search_count, dict_user_opts)
             
-            await page.wait_for_timeout(1000)
+                await page.wait_for_timeout(1000)
 
-            # If there arent jobs in the search continue to the next country
-            if await page.locator("h1", has_text="No matching jobs found.").count() == 1:
-                continue
+                # If there arent jobs in the search continue to the next country
+                if await page.locator("h1", has_text="No matching jobs found.").count() == 1:
+                    continue
 
-            # Get the total number of job pages
-            page_number, max_number_pages = await get_total_number_job_pages(page)
+                # Get the total number of job pages
+                page_number, max_number_pages = await get_total_number_job_pages(page)
             
-            await page.wait_for_timeout(1000)
+                await page.wait_for_timeout(1000)
 
-            logger.info(f"Num pages {user_search_country}: {max_number_pages}")
+                logger.info(f"Num pages {user_search_country}: {max_number_pages}")
 
-            while page_number < max_number_pages + 1:
-                try:
-                    logger.info(f"Starting page: {page_number}")
-                    page_number += 1
+                while page_number < max_number_pages + 1:
+                    try:
+                        set_log_context(page=page_number)
+                        logger.info(f"Starting page: {page_number}")
+                        page_number += 1
                     
-                    # Scrap, decide if apply and apply
-                    list_jobs_instances = await scrap_apply_jobs_page(page, user_search_position, user_search_country,\
-                                            dict_user_opts, nlp)
-
-                    save_jobs_information(list_jobs_instances, dict_user_opts)
-
-                    # check again the total number of job pages (thanks to scrolling it can detect it)
-                    _, max_number_pages = await get_total_number_job_pages(page) 
-                    logger.info(f"Num pages {user_search_country}: {max_number_pages}")
-
-                    # Click the next page
-                    if await page.locator(f"button[aria-label='Page {page_number}']").count() != 0:
-                        await page.locator(f"button[aria-label='Page {page_number}']").click()
-
-                    logger.info(f"Finished page: {page_number-1}")
-
-                except Exception as e:
-                    log_exceptions(e, logger)
-                    break
-
-    logger.info(f"Closing broswer...")
-    await context.close()
-    await browser.close()
-
-async def main():
+                        # Scrap, decide if apply and apply
+                        list_jobs_instances = await scrap_apply_jobs_page(page, user_search_position, user_search_country,\
+                                                dict_user_opts, nlp)
+
+                        # Queue the jobs to be saved in the background
+                        await writer.put(list_jobs_instances)
+
+                        # check again the total number of job pages (thanks to scrolling it can detect it)
+                        _, max_number_pages = await get_total_number_job_pages(page) 
+                        logger.info(f"Num pages {user_search_country}: {max_number_pages}")
+
+                        # Click the next page
+                        if await page.locator(f"button[aria-label='Page {page_number}']").count() != 0:
+                            await page.locator(f"button[aria-label='Page {page_number}']").click()
+
+                        logger.info(f"Finished page: {page_number-1}")
+
+                    except Exception as e:
+                        log_exceptions(e, logger)
+                        break
+    except BaseException:
+        # Do not start more applications when the crawl failed, only finish the current one
+        if apply_worker is not None:
+            apply_worker.drain = False
+        raise
+    finally:
+        # Finish the applications and save the jobs that are still in the queues of the sinks, also when the crawl
+        # failed, before main() closes the connections that the sinks use
+        try:
+            if apply_worker is not None:
+                await apply_worker.close()
+        finally:
+            await writer.close()
+
+            logger.info(f"Closing broswer...")
+            await context.close()
+            await browser.close()
+
+async def main(dict_user_opts, nlp):
+    init_instrumentation(dict_user_opts)
+    init_metrics_export(dict_user_opts)
+    init_questions_store(dict_user_opts)
+    init_analysis_executor()
     async with async_playwright() as p:
-        await run(p)
-
-asyncio.run(main())
\ No newline at end of file
+        try:
+            await run(p, dict_user_opts, nlp)
+        finally:
+            # The analysis abandoned by a cancelled job can still use the sentence cache
+            close_analysis_executor()
+            # The sink threads must save their jobs before their connections are closed
+            close_sink_dispatchers()
+            close_postgresql_pool()
+            close_sqlite_db()
+            close_near_duplicate_index()
+            close_apply_queue()
+            close_questions_store()
+            sentence_cache.log_metrics()
+            log_easy_apply_metrics()
+            log_instrumentation_summary()
+            close_metrics_export()
+
+if __name__ == "__main__":
+    # Load the user options
+    dict_user_opts = load_user_search_save_apply_options()
+
+    # Configure logger
+    logger_config(dict_user_opts)
+
+    logger.info("-"*60)
+    logger.info("Starting main...")
+
+    # Create NLP model to analyze descriptions and titles
+    nlp = create_nlp_model()
+
+    asyncio.run(main(dict_user_opts, nlp))
\ No newline at end of file
@@ -0,0 +1,301 @@
+"""Maintenance commands for the data saved by linkedin_job_analyzer.py
+
+Usage:
+
+    python linkedin_job_tools.py <command> [options]
+
+Run python linkedin_job_tools.py --help to see the list of commands.
+"""
+import argparse, logging
+from modules.helper_functions import load_user_search_save_apply_options, logger_config
+
+logger = logging.getLogger('linkedin_job_tools')
+
+def command_migrate(args, dict_user_opts):
+    """Apply the pending migrations to the PostgreSQL jobs table"""
+    from modules.postgresql_pool import init_postgresql_pool, close_postgresql_pool
+    from modules.postgresql_migrations import run_postgresql_migrations
+
+    init_postgresql_pool(dict_user_opts)
+    try:
+        run_postgresql_migrations(dict_user_opts)
+    finally:
+        close_postgresql_pool()
+
+def command_explain_dashboards(args, dict_user_opts):
+    """Print the query plans of the dashboard queries, to check that they use the indexes"""
+    from modules.postgresql_pool import init_postgresql_pool, close_postgresql_pool
+    from modules.postgresql_queries import explain_dashboard_queries
+
+    init_postgresql_pool(dict_user_opts)
+    try:
+        for name, plan in explain_dashboard_queries(dict_user_opts).items():
+            print(f"-- {name}\n{plan}\n")
+    finally:
+        close_postgresql_pool()
+
+def command_migrate_json(args, dict_user_opts):
+    """Convert the old json array file of jobs to a JSON Lines file"""
+    from modules.jsonl_sink import migrate_json_array_to_jsonl
+
+    output_path = args.output or dict_user_opts["json_file_path"]
+    num_jobs = migrate_json_array_to_jsonl(args.input, output_path)
+    print(f"Migrated {num_jobs} jobs to {output_path}")
+
+def command_compact_jsonl(args, dict_user_opts):
+    """Merge the JSON Lines file and its rotated files into one file without repeated jobs"""
+    import os
+    from modules.jsonl_sink import compact_jsonl, get_jsonl_files
+
+    path = dict_user_opts["json_file_path"]
+    output_path = args.output or path + ".compacted"
+    num_jobs, num_removed = compact_jsonl(path, output_path)
+    print(f"Compacted {num_jobs} jobs to {output_path} ({num_removed} repeated jobs removed)")
+
+    # Replace the files by the compacted file
+    if args.replace:
+        for file_path in get_jsonl_files(path):
+            os.remove(file_path)
+        os.replace(output_path, path)
+        print(f"Replaced the files by {path}")
+
+def command_questions(args, dict_user_opts):
+    """List the Easy Apply questions without answer, the most frequent first"""
+    from modules.questions_no_answer_store import get_questions_no_answer, export_questions_no_answer, \
+        import_questions_no_answer_json
+
+    path = dict_user_opts["questions_no_answer_path"]
+
+    if args.import_json:
+        num_questions = import_questions_no_answer_json(args.import_json, path)
+        print(f"Imported {num_questions} questions from {args.import_json}")
+
+    if args.export:
+        num_questions = export_questions_no_answer(path, args.export)
+        print(f"Exported {num_questions} questions to {args.export}")
+        return
+
+    for question in get_questions_no_answer(path, args.limit):
+        print(f"{question['count']:>6}  {question['question']}  (last seen {question['last_seen']})")
+
+def command_export_parquet(args, dict_user_opts):
+    """Export the saved jobs to a Parquet dataset partitioned by search country and posted date"""
+    from modules.parquet_export import export_jobs_to_parquet
+
+    if args.source == "postgresql":
+        from modules.postgresql_pool import init_postgresql_pool, close_postgresql_pool
+        init_postgresql_pool(dict_user_opts)
+
+    output_dir = args.output or dict_user_opts["parquet_dir"]
+    try:
+        num_jobs = export_jobs_to_parquet(args.source, output_dir, dict_user_opts, args.chunk_size)
+    finally:
+        if args.source == "postgresql":
+            close_postgresql_pool()
+    print(f"Exported {num_jobs} jobs to {output_dir}")
+
+def command_search(args, dict_user_opts):
+    """Full-text search of the saved job descriptions"""
+    import time
+    from modules.job_search_index import search_jobs
+
+    open_backend(args.backend, dict_user_opts)
+    try:
+        start = time.perf_counter()
+        list_results = search_jobs(args.query, args.backend, dict_user_opts, args.tag, args.country, args.limit)
+        elapsed = time.perf_counter() - start
+    finally:
+        close_backend(args.backend)
+
+    for result in list_results:
+        print(f"{result['rank']:8.3f}  {result['position_name']} - {result['company']} "
+              f"({result['search_country']}, {result['posted_date']})  {result['url']}")
+    print(f"{len(list_results)} results in {elapsed * 1000:.1f} ms")
+
+def command_report(args, dict_user_opts):
+    """Skill demand report (top tags or reasons not to apply per country and week) read from the aggregates"""
+    from modules.skill_demand_aggregates import get_aggregates_report
+
+    open_backend(args.backend, dict_user_opts)
+    try:
+        list_rows = get_aggregates_report(args.report, args.backend, dict_user_opts, args.country, args.from_week)
+    finally:
+        close_backend(args.backend)
+
+    # Show the top rows of each country and week
+    dict_shown = {}
+    for row in list_rows:
+        key = (row["country"], row["iso_week"])
+        dict_shown[key] = dict_shown.get(key, 0) + 1
+        if dict_shown[key] > args.top:
+            continue
+        if args.report == "tags":
+            print(f"{row['iso_week']}  {row['country']:<15} {row['jobs']:>6}  {row['tag']} ({row['entity_group']})")
+        else:
+            print(f"{row['iso_week']}  {row['country']:<15} {row['jobs']:>6}  {row['reason']}")
+
+def command_rebuild_aggregates(args, dict_user_opts):
+    """Recompute the skill demand aggregates from all the saved jobs"""
+    from modules.skill_demand_aggregates import rebuild_aggregates
+
+    open_backend(args.backend, dict_user_opts)
+    try:
+        num_jobs = rebuild_aggregates(args.backend, dict_user_opts)
+    finally:
+        close_backend(args.backend)
+    print(f"Rebuilt the aggregates from {num_jobs} jobs")
+
+def command_retry_blocked(args, dict_user_opts):
+    """Apply again the jobs blocked by Easy Apply questions without answer, if all their questions have an answer now"""
+    import asyncio
+    from modules.retry_blocked_jobs import get_blocked_jobs, find_unblocked_jobs, apply_unblocked_jobs
+    from modules.apply_queue import close_apply_queue
+
+    open_backend(args.backend, dict_user_opts)
+    try:
+        list_blocked_jobs = get_blocked_jobs(args.backend, dict_user_opts)
+        list_unblocked_jobs, dict_unblocked_by_answer = find_unblocked_jobs(list_blocked_jobs, dict_user_opts)
+
+        print(f"{len(list_unblocked_jobs)} of {len(list_blocked_jobs)} blocked jobs can be applied now")
+        for question, num_jobs in sorted(dict_unblocked_by_answer.items(), key=lambda item: item[1], reverse=True):
+            print(f"{num_jobs:>6}  {question}")
+
+        if args.dry_run or not list_unblocked_jobs:
+            return
+
+        metrics = asyncio.run(apply_unblocked_jobs(list_unblocked_jobs, dict_user_opts, args.workers))
+        print(f"Applied {metrics['applied']} of {metrics['jobs_processed']} jobs "
+              f"({metrics['missing_answers']} still with questions without answer)")
+    finally:
+        close_apply_queue()
+        # The sinks that saved the results of the applications can have opened both databases
+        close_backend("postgresql")
+        close_backend("sqlite")
+
+def command_replay_dead_letter(args, dict_user_opts):
+    """Save again the jobs that a sink could not save during a run (dead letter file of the sinks)"""
+    from modules.sinks import replay_dead_letter
+    from modules.postgresql_pool import close_postgresql_pool
+    from modules.save_to_sqlite_db import close_sqlite_db
+
+    try:
+        dict_saved = replay_dead_letter(dict_user_opts)
+    finally:
+        close_postgresql_pool()
+        close_sqlite_db()
+
+    if not dict_saved:
+        print(f"No jobs in {dict_user_opts['sink_dead_letter_path']}")
+    for sink_name, num_jobs in dict_saved.items():
+        print(f"Sink {sink_name}: {num_jobs} jobs saved")
+
+def open_backend(backend, dict_user_opts):
+    """Function that opens the connection to the database of a backend
+
+    Parameters
+    ----------
+        backend : str
+            "postgresql" or "sqlite"
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    """
+    if backend == "postgresql":
+        from modules.postgresql_pool import init_postgresql_pool
+        init_postgresql_pool(dict_user_opts)
+    else:
+        from modules.save_to_sqlite_db import init_sqlite_db
+        init_sqlite_db(dict_user_opts)
+
+def close_backend(backend):
+    """Function that closes the connection to the database of a backend
+
+    Parameters
+    ----------
+        backend : str
+            "postgresql" or "sqlite"
+    """
+    if backend == "postgresql":
+        from modules.postgresql_pool import close_postgresql_pool
+        close_postgresql_pool()
+    else:
+        from modules.save_to_sqlite_db import close_sqlite_db
+        close_sqlite_db()
+
+def create_parser():
+    """Function that creates the parser of the command line arguments
+    
+    Returns
+    -------
+        parser : argparse.ArgumentParser
+            Parser with one subparser per command
+    """
+    parser = argparse.ArgumentParser(description="Maintenance commands for the LinkedIn jobs data")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparser = subparsers.add_parser("migrate", help=command_migrate.__doc__)
+    subparser.set_defaults(function=command_migrate)
+
+    subparser = subparsers.add_parser("explain-dashboards", help=command_explain_dashboards.__doc__)
+    subparser.set_defaults(function=command_explain_dashboards)
+
+    subparser = subparsers.add_parser("migrate-json", help=command_migrate_json.__doc__)
+    subparser.add_argument("--input", default="./data/linkedin_jobs.json", help="Path to the json array file")
+    subparser.add_argument("--output", help="Path to the JSON Lines file (default: json_file_path of configfile.ini)")
+    subparser.set_defaults(function=command_migrate_json)
+
+    subparser = subparsers.add_parser("compact-jsonl", help=command_compact_jsonl.__doc__)
+    subparser.add_argument("--output", help="Path to the compacted file (default: json_file_path + .compacted)")
+    subparser.add_argument("--replace", action="store_true", help="Replace the original files by the compacted file")
+    subparser.set_defaults(function=command_compact_jsonl)
+
+    subparser = subparsers.add_parser("questions", help=command_questions.__doc__)
+    subparser.add_argument("--limit", type=int, default=50, help="Number of questions to list")
+    subparser.add_argument("--export", help="Export all the questions to this json file instead of listing them")
+    subparser.add_argument("--import-json", help="Import first the old questions_no_answer.json file")
+    subparser.set_defaults(function=command_questions)
+
+    subparser = subparsers.add_parser("export-parquet", help=command_export_parquet.__doc__)
+    subparser.add_argument("--source", choices=["jsonl", "postgresql"], default="jsonl")
+    subparser.add_argument("--output", help="Folder of the Parquet dataset (default: parquet_dir of configfile.ini)")
+    subparser.add_argument("--chunk-size", type=int, default=50000, help="Number of jobs in memory at the same time")
+    subparser.set_defaults(function=command_export_parquet)
+
+    subparser = subparsers.add_parser("search", help=command_search.__doc__)
+    subparser.add_argument("query", help='Text to search. Example: "dbt AND snowflake"')
+    subparser.add_argument("--backend", choices=["postgresql", "sqlite"], default="postgresql")
+    subparser.add_argument("--tag", action="append", help="Only jobs with this tag (can be repeated)")
+    subparser.add_argument("--country", help="Only jobs of this search country")
+    subparser.add_argument("--limit", type=int, default=20)
+    subparser.set_defaults(function=command_search)
+
+    subparser = subparsers.add_parser("report", help=command_report.__doc__)
+    subparser.add_argument("report", choices=["tags", "reasons"])
+    subparser.add_argument("--backend", choices=["postgresql", "sqlite"], default="postgresql")
+    subparser.add_argument("--country", help="Only this search country")
+    subparser.add_argument("--from-week", help="Only from this ISO week. Example: 2024-W05")
+    subparser.add_argument("--top", type=int, default=10, help="Rows shown per country and week")
+    subparser.set_defaults(function=command_report)
+
+    subparser = subparsers.add_parser("rebuild-aggregates", help=command_rebuild_aggregates.__doc__)
+    subparser.add_argument("--backend", choices=["postgresql", "sqlite"], default="postgresql")
+    subparser.set_defaults(function=command_rebuild_aggregates)
+
+    subparser = subparsers.add_parser("retry-blocked", help=command_retry_blocked.__doc__)
+    subparser.add_argument("--backend", choices=["postgresql", "sqlite"], default="postgresql")
+    subparser.add_argument("--workers", type=int, default=2, help="Number of browser contexts applying in parallel")
+    subparser.add_argument("--dry-run", action="store_true", help="Only report the jobs that can be applied now")
+    subparser.set_defaults(function=command_retry_blocked)
+
+    subparser = subparsers.add_parser("replay-dead-letter", help=command_replay_dead_letter.__doc__)
+    subparser.set_defaults(function=command_replay_dead_letter)
+
+    return parser
+
+def main():
+    args = create_parser().parse_args()
+    dict_user_opts = load_user_search_save_apply_options()
+    logger_config(dict_user_opts)
+    args.function(args, dict_user_opts)
+
+if __name__ == "__main__":
+    main()
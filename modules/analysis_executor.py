@@ -0,0 +1,121 @@
+import asyncio, logging, contextvars
+from concurrent.futures import ThreadPoolExecutor
+from modules.metrics_export import register_collector
+
+logger = logging.getLogger('analysis_executor')
+
+# Process-wide executor, started once at startup with init_analysis_executor
+analysis_executor = None
+
+class AnalysisExecutor():
+    """Runs the analysis of the jobs (translation and spaCy, that are synchronous) in one thread, so the event
+    loop keeps running and two analyses never run at the same time with the same spaCy model and sentence cache.
+
+    A job cancelled by its deadline cancels its analysis if it did not start yet. If it already started it
+    can not be stopped: it is abandoned and keeps running until it ends. Before each job the crawl waits for
+    the abandoned analysis (wait_idle) out of the deadline of the job, so at most one analysis is outstanding
+    and the job does not spend its deadline waiting for the analysis of another job.
+    """
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analysis")
+        self.pending_futures = set()
+
+        # Metrics
+        self.num_analyses = 0
+        self.num_abandoned = 0
+
+    async def run(self, function, *args):
+        """Function that runs a function of the analysis in the thread of the executor and waits for its result
+
+        Parameters
+        ----------
+            function : function
+                Synchronous function to run
+            *args
+                Arguments of the function
+        Returns
+        -------
+            result
+                Result of the function
+        """
+        # The log context of the job is copied to the thread
+        future = self.executor.submit(contextvars.copy_context().run, function, *args)
+        self.pending_futures.add(future)
+        future.add_done_callback(self.pending_futures.discard)
+        self.num_analyses += 1
+
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # The analysis is cancelled if it did not start
+            if not future.cancel():
+                self.num_abandoned += 1
+                logger.warning(f"Analysis abandoned by a cancelled job, it keeps running until it ends: {function.__name__}")
+            raise
+
+    async def wait_idle(self, timeout):
+        """Function that waits until the analyses abandoned by cancelled jobs end
+
+        Parameters
+        ----------
+            timeout : float or None
+                Max seconds to wait, None to wait until they end
+        Returns
+        -------
+            idle : bool
+                True if there are no analyses running, False if the timeout expired first
+        """
+        if not self.pending_futures:
+            return True
+
+        logger.info("Waiting for the analysis abandoned by a cancelled job")
+        # The futures are removed from the set by the thread of the executor when they end, so it is copied
+        await asyncio.wait([asyncio.wrap_future(future) for future in list(self.pending_futures)], timeout=timeout)
+        return not self.pending_futures
+
+    def close(self):
+        """Function that waits for the running analysis, stops the thread and logs the metrics of the executor"""
+        logger.info(f"Analysis executor: {self.num_analyses} analyses, {self.num_abandoned} abandoned by cancelled jobs")
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+def init_analysis_executor():
+    """Function that starts the process-wide analysis executor. It must be called once at startup"""
+    global analysis_executor
+
+    if analysis_executor is None:
+        analysis_executor = AnalysisExecutor()
+
+def get_analysis_executor():
+    """Function that returns the process-wide analysis executor
+
+    Returns
+    -------
+        analysis_executor : AnalysisExecutor
+            The executor
+    """
+    return analysis_executor
+
+def get_analysis_metric_samples():
+    """Function that gets the analyses of the process-wide executor for modules/metrics_export.py
+
+    Returns
+    -------
+        list_samples : list
+            Samples (name, labels, value), empty if the executor was not started
+    """
+    if analysis_executor is None:
+        return []
+    return [("analyses_total", {}, analysis_executor.num_analyses),
+            ("analyses_abandoned_total", {}, analysis_executor.num_abandoned)]
+
+register_collector("analysis_executor", get_analysis_metric_samples)
+
+def close_analysis_executor():
+    """Function that closes the process-wide analysis executor"""
+    global analysis_executor
+
+    if analysis_executor is None:
+        return
+
+    analysis_executor.close()
+    analysis_executor = None
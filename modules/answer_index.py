@@ -0,0 +1,244 @@
+import os, re, math, time, logging
+from modules.helper_functions import load_json_to_dict
+
+logger = logging.getLogger('answer_index')
+
+# Min seconds between two checks of the modification time of the answers file
+RELOAD_CHECK_SECONDS = 5
+# Placeholder of the templated questions of the answers file. Example: "Are you legally authorized to work in {country}?"
+PLACEHOLDER_PATTERN = re.compile(r"\{\w+\}")
+# Words that do not change the meaning of a question. Two questions are only similar if all their other words
+# are the same: "...experience with SQL?" must not get the answer of "...experience with Azure SQL?"
+STOP_WORDS = {"a", "an", "the", "of", "in", "on", "at", "to", "for", "with", "from", "by", "as", "about", "and", "or",
+              "do", "does", "did", "you", "your", "yours", "have", "has", "had", "are", "is", "be", "been", "what",
+              "which", "how", "this", "that", "these", "those", "there", "will", "would", "can", "could", "please",
+              "currently", "any", "it", "we", "our", "us", "i", "my", "me", "s"}
+# Answers that are only used for the same question (normalized or templated), never for a similar one.
+# A number or a yes/no answered to the wrong question is a wrong answer that looks valid
+NO_FUZZY_ANSWER_PATTERN = re.compile(r"^\s*(\d+([.,]\d+)?|yes|no)\s*$", re.IGNORECASE)
+
+# Process-wide index, loaded the first time it is used with get_answer_index
+answer_index = None
+
+def tokenize_question(question):
+    """Function that splits a question in lowercase words, without punctuation
+
+    Parameters
+    ----------
+        question : str
+            Text of the question
+    Returns
+    -------
+        tokens : list
+            Words of the question
+    """
+    return re.findall(r"\w+", question.lower())
+
+def normalize_question_key(question):
+    """Function that normalizes a question, so the same question with other spaces, capital letters or
+    punctuation has the same key
+
+    Parameters
+    ----------
+        question : str
+            Text of the question
+    Returns
+    -------
+        key : str
+            Words of the question in lowercase separated by one space
+    """
+    return " ".join(tokenize_question(question))
+
+def compile_template(question):
+    """Function that compiles a templated question into a regex over the normalized question. Each
+    placeholder matches one or more words
+
+    Parameters
+    ----------
+        question : str
+            Templated question. Example: "Are you legally authorized to work in {country}?"
+    Returns
+    -------
+        pattern : regex pattern
+            Compiled regex
+    """
+    parts = [re.escape(normalize_question_key(part)) for part in PLACEHOLDER_PATTERN.split(question)]
+    return re.compile("^" + " ?(.+?) ?".join(parts) + "$")
+
+def get_answers_work_visa(dict_user_opts, country):
+    """Function that gets the answers about the work visa conditions, depending the country of the job position
+
+    Parameters
+    ----------
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+        country : str
+            Country of the job position
+    Returns
+    -------
+        dict_answers : dict
+            Dictionary with the questions and answers about the work visa
+    """
+    need_visa = country not in dict_user_opts["countries_no_visa"]
+    yes_if_visa, no_if_visa = ("Yes", "No") if need_visa else ("No", "Yes")
+
+    return {
+        "Do you need sponsorship for a new position?": yes_if_visa,
+        "Will you now or in the future require sponsorship for employment visa status?": yes_if_visa,
+        "Do you need visa sponsorship to work in this location?": yes_if_visa,
+        "Are you authorized to work in the job's country?": no_if_visa,
+        f"Are you legally authorized to work in {country}?": no_if_visa,
+    }
+
+class AnswerIndex():
+    """Compiled index of the Easy Apply answers file. It is loaded once and reloaded when the file changes.
+
+    A question is answered, in this order, by:
+        1. The answer of the same question after normalization (spaces, capital letters and punctuation).
+           The work visa answers go before the ones of the file
+        2. The answer of a templated question of the file, like "Are you legally authorized to work in {country}?"
+        3. The answer of the most similar question, if its similarity is at least min_confidence. The similarity
+           is the weighted Jaccard of the words of the questions. Rare words (the technology of
+           "How many years of experience do you have with ...?") weigh more than common ones. The questions
+           can only differ in STOP_WORDS and numeric and yes/no answers are never used for similar questions
+    The answers about the work visa depend on the country of the job and are compiled once per country.
+    """
+    def __init__(self, path, dict_user_opts, min_confidence):
+        self.path = path
+        self.dict_user_opts = dict_user_opts
+        self.min_confidence = min_confidence
+        self.mtime = None
+        self.last_check = 0
+        self.load()
+
+    def load(self):
+        """Function that loads the answers file and compiles it"""
+        self.mtime = os.path.getmtime(self.path)
+        self.last_check = time.monotonic()
+        dict_answers = load_json_to_dict(self.path)
+
+        self.exact_answers = {}
+        self.templates = []
+        for question, answer in dict_answers.items():
+            if PLACEHOLDER_PATTERN.search(question):
+                self.templates.append((compile_template(question), question, answer))
+            else:
+                self.exact_answers.setdefault(normalize_question_key(question), (question, answer))
+
+        # Questions whose answer can be used for a similar question
+        self.fuzzy_keys = {key for key, (question, answer) in self.exact_answers.items()
+                           if not NO_FUZZY_ANSWER_PATTERN.match(str(answer))}
+
+        # Word weights for the fuzzy matching: idf of each word in the questions of the file
+        self.question_tokens = {key: set(key.split()) for key in self.exact_answers}
+        document_frequency = {}
+        for tokens in self.question_tokens.values():
+            for token in tokens:
+                document_frequency[token] = document_frequency.get(token, 0) + 1
+        num_questions = len(self.question_tokens)
+        self.token_weights = {token: math.log(1 + num_questions / frequency) for token, frequency in document_frequency.items()}
+        self.unknown_token_weight = math.log(1 + num_questions) if num_questions else 1.0
+
+        # Questions of each word, to compare only with the questions that share a word
+        self.token_questions = {}
+        for key in self.fuzzy_keys:
+            tokens = self.question_tokens[key]
+            for token in tokens:
+                self.token_questions.setdefault(token, []).append(key)
+
+        self.visa_answers = {}
+
+        logger.info(f"Answer index loaded: {len(self.exact_answers)} questions, {len(self.templates)} templates")
+
+    def reload_if_changed(self):
+        """Function that reloads the answers file if it changed. The file is checked every RELOAD_CHECK_SECONDS"""
+        if time.monotonic() - self.last_check < RELOAD_CHECK_SECONDS:
+            return
+        self.last_check = time.monotonic()
+
+        if os.path.getmtime(self.path) != self.mtime:
+            logger.info(f"Reloading answers file {self.path}")
+            self.load()
+
+    def get_visa_answers(self, country):
+        """Function that gets the normalized work visa answers of a country, compiled once per country"""
+        if country not in self.visa_answers:
+            self.visa_answers[country] = {normalize_question_key(question): (question, answer)
+                                          for question, answer in get_answers_work_visa(self.dict_user_opts, country).items()}
+        return self.visa_answers[country]
+
+    def get_similarity(self, tokens, key):
+        """Function that calculates the weighted Jaccard similarity of the words of a question and a question of the file"""
+        tokens_file = self.question_tokens[key]
+        weight = lambda token: self.token_weights.get(token, self.unknown_token_weight)
+        union = sum(weight(token) for token in tokens | tokens_file)
+        return sum(weight(token) for token in tokens & tokens_file) / union if union else 0.0
+
+    def get_answer(self, question, country):
+        """Function that finds the answer of an Easy Apply question
+
+        Parameters
+        ----------
+            question : str
+                Question of the Easy Apply form
+            country : str
+                Country of the job position
+        Returns
+        -------
+            answer : str or None
+                Answer of the question, None if there is not one with enough confidence
+            confidence : float
+                1 for normalized and templated matches, the similarity for fuzzy matches
+            matched_question : str or None
+                Question of the answers file that was used
+        """
+        key = normalize_question_key(question)
+
+        for dict_answers in [self.get_visa_answers(country), self.exact_answers]:
+            if key in dict_answers:
+                matched_question, answer = dict_answers[key]
+                return answer, 1.0, matched_question
+
+        for pattern, matched_question, answer in self.templates:
+            if pattern.match(key):
+                return answer, 1.0, matched_question
+
+        tokens = set(key.split())
+        candidates = {candidate for token in tokens for candidate in self.token_questions.get(token, [])}
+        best_key, best_similarity = None, 0.0
+        for candidate in candidates:
+            # A word that is only in one of the questions (a technology, a language...) changes its meaning
+            if (tokens ^ self.question_tokens[candidate]) - STOP_WORDS:
+                continue
+            similarity = self.get_similarity(tokens, candidate)
+            if similarity > best_similarity:
+                best_key, best_similarity = candidate, similarity
+
+        if best_key is not None and best_similarity >= self.min_confidence:
+            matched_question, answer = self.exact_answers[best_key]
+            return answer, best_similarity, matched_question
+
+        return None, best_similarity, None
+
+def get_answer_index(dict_user_opts):
+    """Function that returns the process-wide answer index, loading it the first time and reloading it
+    if the answers file changed
+
+    Parameters
+    ----------
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    Returns
+    -------
+        answer_index : AnswerIndex
+            Index of the Easy Apply answers
+    """
+    global answer_index
+
+    if answer_index is None:
+        answer_index = AnswerIndex(dict_user_opts["easy_apply_quest_answ_path"], dict_user_opts,
+                                   dict_user_opts["easy_apply_answer_min_confidence"])
+    else:
+        answer_index.reload_if_changed()
+
+    return answer_index
@@ -0,0 +1,387 @@
+import json, time, sqlite3, asyncio, logging
+from datetime import datetime
+from modules.item import Job
+from modules.helper_functions import log_exceptions, check_easy_apply_button
+from modules.easy_apply import easy_apply, exit_easy_apply
+from modules.near_duplicate_index import get_near_duplicate_index
+from modules.save_to_postgresql_db import get_job_id
+from modules.instrumentation import job_spans
+from modules.metrics_export import increment, set_gauge
+from modules.log_queue import set_log_context
+
+logger = logging.getLogger('apply_queue')
+
+# Status of the jobs of the queue. pending and in_progress are the ones still to apply
+STATUS_PENDING = "pending"
+STATUS_IN_PROGRESS = "in_progress"
+STATUS_APPLIED = "applied"
+STATUS_MISSING_ANSWERS = "missing_answers"
+STATUS_NO_BUTTON = "no_easy_apply_button"
+STATUS_FAILED = "failed"
+STATUS_DEADLINE = "deadline_exceeded"
+
+# Process-wide queue, opened once at startup with init_apply_queue
+apply_queue = None
+
+class ApplyQueue():
+    """Persistent queue (SQLite) of the jobs to apply with Easy Apply. The scraper adds the jobs and the
+    EasyApplyWorker applies them. The jobs that were not applied at the end of a run are applied in the next one.
+    Near duplicates of a job (see modules/near_duplicate_index.py) are in the same group and only one job of
+    each group is applied
+    """
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("""
+        CREATE TABLE IF NOT EXISTS apply_queue (
+            job_id TEXT PRIMARY KEY,
+            group_id TEXT,
+            url TEXT,
+            job TEXT,
+            status TEXT,
+            attempts INTEGER,
+            enqueued_at TEXT,
+            updated_at TEXT
+        )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS apply_queue_status_idx ON apply_queue (status, enqueued_at)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS apply_queue_group_id_idx ON apply_queue (group_id)")
+
+        # Jobs that were being applied when the previous run stopped are applied again
+        with self.connection:
+            self.connection.execute("UPDATE apply_queue SET status = ? WHERE status = ?", (STATUS_PENDING, STATUS_IN_PROGRESS))
+
+        num_pending = self.count_pending()
+        set_gauge("apply_queue_pending", num_pending)
+        logger.info(f"Apply queue opened: {num_pending} jobs pending")
+
+    def put(self, job_inst):
+        """Function that adds a job to the queue, if it or a near duplicate is not already pending or applied.
+        It is not committed until commit is called (once per results page), the worker already sees it because
+        it uses the same connection
+
+        Parameters
+        ----------
+            job_inst : instance
+                Instance of a job class with the job information
+        Returns
+        -------
+            added : bool
+                True if the job was added
+        """
+        job_id = get_job_id(job_inst)
+        group_id = job_inst.near_duplicate_of or job_id
+        now = datetime.now().isoformat(timespec="seconds")
+
+        cursor = self.connection.execute("""
+        INSERT INTO apply_queue SELECT ?, ?, ?, ?, ?, 0, ?, ?
+        WHERE NOT EXISTS (SELECT 1 FROM apply_queue WHERE group_id = ? AND status IN (?, ?, ?))
+        ON CONFLICT (job_id) DO NOTHING
+        """, (job_id, group_id, job_inst.url, json.dumps(job_inst.transform_to_dict(), ensure_ascii=False, default=str),
+              STATUS_PENDING, now, now, group_id, STATUS_PENDING, STATUS_IN_PROGRESS, STATUS_APPLIED))
+
+        if cursor.rowcount == 1:
+            set_gauge("apply_queue_pending", self.count_pending())
+        return cursor.rowcount == 1
+
+    def requeue(self, job_inst):
+        """Function that adds a job to the queue again as pending, even if it was already applied without
+        success (for example, when it was blocked by questions without answer). Applied jobs are not changed
+
+        Parameters
+        ----------
+            job_inst : instance
+                Instance of a job class with the job information
+        Returns
+        -------
+            job_id : str
+                Id of the job in the queue
+        """
+        job_id = get_job_id(job_inst)
+        group_id = job_inst.near_duplicate_of or job_id
+        now = datetime.now().isoformat(timespec="seconds")
+
+        with self.connection:
+            self.connection.execute("""
+            INSERT INTO apply_queue VALUES (?, ?, ?, ?, ?, 0, ?, ?)
+            ON CONFLICT (job_id) DO UPDATE SET status = excluded.status, job = excluded.job, updated_at = excluded.updated_at
+            WHERE apply_queue.status != ?
+            """, (job_id, group_id, job_inst.url, json.dumps(job_inst.transform_to_dict(), ensure_ascii=False, default=str),
+                  STATUS_PENDING, now, now, STATUS_APPLIED))
+
+        return job_id
+
+    def get_next(self, list_job_ids=None):
+        """Function that takes the oldest pending job of the queue and marks it as in progress
+
+        Parameters
+        ----------
+            list_job_ids : list
+                Only take jobs with these ids. Any pending job if None
+        Returns
+        -------
+            job_id : str or None
+                Id of the job, None if the queue is empty
+            job_inst : instance or None
+                Instance of a job class with the job information
+        """
+        sql = "SELECT job_id, job FROM apply_queue WHERE status = ?"
+        params = [STATUS_PENDING]
+        if list_job_ids is not None:
+            sql += f" AND job_id IN ({', '.join('?' * len(list_job_ids))})"
+            params += list_job_ids
+        row = self.connection.execute(sql + " ORDER BY enqueued_at LIMIT 1", params).fetchone()
+        if row is None:
+            return None, None
+
+        job_id, job_json = row
+        with self.connection:
+            self.connection.execute("""UPDATE apply_queue SET status = ?, attempts = attempts + 1, updated_at = ?
+                                       WHERE job_id = ?""", (STATUS_IN_PROGRESS, datetime.now().isoformat(timespec="seconds"), job_id))
+
+        job_inst = Job()
+        for attribute, value in json.loads(job_json).items():
+            setattr(job_inst, attribute, value)
+
+        return job_id, job_inst
+
+    def finish(self, job_id, status, job_inst):
+        """Function that records the result of applying a job
+
+        Parameters
+        ----------
+            job_id : str
+                Id of the job
+            status : str
+                One of the STATUS_* values
+            job_inst : instance
+                Instance of a job class with the job information after applying
+        """
+        with self.connection:
+            self.connection.execute("UPDATE apply_queue SET status = ?, job = ?, updated_at = ? WHERE job_id = ?",
+                                    (status, json.dumps(job_inst.transform_to_dict(), ensure_ascii=False, default=str),
+                                     datetime.now().isoformat(timespec="seconds"), job_id))
+        set_gauge("apply_queue_pending", self.count_pending())
+
+    def count_pending(self):
+        """Function that counts the jobs that are still to apply"""
+        return self.connection.execute("SELECT count(*) FROM apply_queue WHERE status IN (?, ?)",
+                                       (STATUS_PENDING, STATUS_IN_PROGRESS)).fetchone()[0]
+
+    def commit(self):
+        """Function that commits the jobs added since the last commit"""
+        self.connection.commit()
+
+    def close(self):
+        """Function that commits the jobs added and closes the SQLite file of the queue"""
+        self.connection.commit()
+        self.connection.close()
+
+def init_apply_queue(dict_user_opts):
+    """Function that opens the process-wide apply queue. It must be called once at startup
+
+    Parameters
+    ----------
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    """
+    global apply_queue
+
+    if apply_queue is None:
+        apply_queue = ApplyQueue(dict_user_opts["apply_queue_path"])
+
+def get_apply_queue():
+    """Function that returns the process-wide apply queue
+
+    Returns
+    -------
+        apply_queue : ApplyQueue or None
+            The queue, None if it was not opened
+    """
+    return apply_queue
+
+def close_apply_queue():
+    """Function that closes the process-wide apply queue"""
+    global apply_queue
+
+    if apply_queue is None:
+        return
+
+    apply_queue.close()
+    apply_queue = None
+
+class ApplyRateLimiter():
+    """Rate limit of the applications: two applications start at least apply_min_interval_seconds apart. The
+    Easy Apply workers that apply at the same time share one, so the limit is for the account, not per worker
+    """
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self.last_start = None
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        """Function that waits until the next application can start"""
+        async with self.lock:
+            if self.last_start is not None:
+                wait_seconds = max(0, self.last_start + self.min_interval - time.monotonic())
+                increment("apply_rate_limit_wait_seconds_total", wait_seconds)
+                await asyncio.sleep(wait_seconds)
+            self.last_start = time.monotonic()
+
+class EasyApplyWorker():
+    """Worker that applies the jobs of the apply queue with its own browser context, so the scraping does not
+    wait for the applications. It opens the url of each job, applies with Easy Apply and saves the job again
+    with the result. Two applications start at least apply_min_interval_seconds apart (with rate_limiter, also
+    the applications of the other workers that share it).
+
+    When it is closed it applies the pending jobs first if apply_queue_drain is True, otherwise it finishes the
+    current application and leaves the rest for the next run. With list_job_ids it only applies those jobs
+    (see modules/retry_blocked_jobs.py).
+    """
+    def __init__(self, browser, writer, dict_user_opts, list_job_ids=None, drain=None, rate_limiter=None):
+        self.browser = browser
+        self.writer = writer
+        self.dict_user_opts = dict_user_opts
+        self.rate_limiter = rate_limiter or ApplyRateLimiter(dict_user_opts["apply_min_interval_seconds"])
+        self.task = None
+        self.stopping = False
+        self.drain = dict_user_opts["apply_queue_drain"] if drain is None else drain
+        self.list_job_ids = list_job_ids
+
+        # Metrics
+        self.metrics = {"jobs_processed": 0, STATUS_APPLIED: 0, STATUS_MISSING_ANSWERS: 0, STATUS_NO_BUTTON: 0,
+                        STATUS_FAILED: 0, STATUS_DEADLINE: 0, "apply_seconds_total": 0.0}
+
+    def start(self):
+        """Start the worker in the event loop"""
+        self.task = asyncio.create_task(self.run_worker())
+
+    async def run_worker(self):
+        """Loop of the worker: take a job of the queue, apply and save the result"""
+        context = await self.browser.new_context(storage_state=self.dict_user_opts["auth_state_path"])
+        increment("browser_launches_total", kind="apply_context")
+        page = await context.new_page()
+        page.on("crash", lambda _: increment("browser_page_crashes_total", kind="apply_context"))
+
+        try:
+            while True:
+                if self.stopping and not self.drain:
+                    break
+
+                job_id, job_inst = apply_queue.get_next(self.list_job_ids)
+                if job_id is None:
+                    if self.stopping:
+                        break
+                    await asyncio.sleep(1)
+                    continue
+
+                await self.rate_limiter.wait()
+
+                await self.apply_job(page, job_id, job_inst)
+        finally:
+            await context.close()
+
+    async def apply_job(self, page, job_id, job_inst):
+        """Apply a job of the queue, record the result and save the job again
+
+        Parameters
+        ----------
+            page : playwright object
+                Page of the worker
+            job_id : str
+                Id of the job
+            job_inst : instance
+                Instance of a job class with the job information
+        """
+        set_log_context(job_id=job_id)
+        logger.info(f"Apply: {job_inst.position_name}, {job_inst.company}, {job_inst.url}")
+        start = time.perf_counter()
+
+        try:
+            with job_spans("apply_job_total") as spans:
+                spans.label = job_inst.url
+                # A job that takes more than apply_job_deadline_seconds is cancelled, so a hang can not stop the worker
+                status, job_inst = await asyncio.wait_for(self.apply_job_page(page, job_inst),
+                                                          self.dict_user_opts["apply_job_deadline_seconds"] or None)
+        except asyncio.TimeoutError:
+            logger.warning(f"Apply deadline of {self.dict_user_opts['apply_job_deadline_seconds']} s exceeded: {job_inst.url}")
+            increment("deadlines_exceeded_total", deadline="apply_job")
+            status = STATUS_DEADLINE
+            await self.reset_page(page)
+        except Exception as e:
+            log_exceptions(e, logger)
+            status = STATUS_FAILED
+
+        self.metrics["apply_seconds_total"] += time.perf_counter() - start
+        self.metrics["jobs_processed"] += 1
+        self.metrics[status] += 1
+        increment("jobs_applied_total", status=status)
+        logger.info(f"Applied: {job_inst.applied} ({status})")
+
+        apply_queue.finish(job_id, status, job_inst)
+
+        # Do not apply again to its near duplicates
+        near_duplicate_index = get_near_duplicate_index()
+        if near_duplicate_index and job_inst.applied:
+            near_duplicate_index.mark_applied(job_inst.near_duplicate_of or job_id)
+
+        # Save the result of the application. The job was already saved when it was scraped, so only the sinks that
+        # update the saved jobs save it again
+        await self.writer.put([job_inst], updates_only=True)
+
+    async def apply_job_page(self, page, job_inst):
+        """Function that opens the url of a job and applies with Easy Apply
+
+        Parameters
+        ----------
+            page : playwright object
+                Page of the worker
+            job_inst : instance
+                Instance of a job class with the job information
+        Returns
+        -------
+            status : str
+                One of the STATUS_* values
+            job_inst : instance
+                Instance of a job class with the job information after applying
+        """
+        await page.goto(job_inst.url)
+        await page.wait_for_timeout(2000)
+
+        if not await check_easy_apply_button(page):
+            job_inst.manual_apply = True
+            return STATUS_NO_BUTTON, job_inst
+
+        job_inst = await easy_apply(page, job_inst, self.dict_user_opts)
+        if job_inst.applied:
+            return STATUS_APPLIED, job_inst
+        if job_inst.could_not_apply_due_to_questions:
+            return STATUS_MISSING_ANSWERS, job_inst
+        return STATUS_FAILED, job_inst
+
+    async def reset_page(self, page):
+        """Close the Easy Apply modal left open by a cancelled job, so the next job starts from a clean page.
+        It never takes more than a few seconds
+
+        Parameters
+        ----------
+            page : playwright object
+                Page of the worker
+        """
+        try:
+            await asyncio.wait_for(exit_easy_apply(page), 10)
+        except Exception:
+            # There was no modal open or the page is stuck. The next job opens its url anyway
+            logger.info("Could not close the Easy Apply modal after the apply deadline")
+
+    async def close(self):
+        """Stop the worker, after applying the pending jobs if apply_queue_drain is True"""
+        if self.task is None:
+            return
+
+        self.stopping = True
+        if self.drain:
+            logger.info(f"Applying the {apply_queue.count_pending()} pending jobs of the apply queue")
+        await self.task
+        self.task = None
+
+        logger.info(f"Easy Apply worker metrics: {self.metrics}")
@@ -0,0 +1,71 @@
+import asyncio, logging, time
+from modules.sinks import SinkDispatcher
+from modules.metrics_export import register_collector
+
+logger = logging.getLogger('background_writer')
+
+class BackgroundWriter():
+    """Writer that saves the jobs in the background, so the crawl loop does not wait for the database
+    or the file I/O.
+
+    The jobs are handed to a SinkDispatcher (see modules/sinks.py), that saves them to every enabled sink
+    from its own thread, in batches. If a sink falls behind and its queue is full, put waits for space
+    (backpressure) without blocking the event loop. The jobs that a sink can not save are kept in the dead
+    letter file of the sinks. close saves all the pending jobs.
+    """
+    def __init__(self, dict_user_opts):
+        self.dispatcher = SinkDispatcher(dict_user_opts)
+        self.started = False
+
+        # Metrics
+        self.put_wait_seconds_total = 0.0
+
+    def start(self):
+        """Start the threads of the sinks"""
+        self.dispatcher.start()
+        self.started = True
+        register_collector("background_writer", self.get_metric_samples)
+
+    async def put(self, list_jobs_instances, updates_only=False):
+        """Add the jobs to be saved. Waits until every sink has space for them if the sinks are falling behind.
+        With sink put_timeout_seconds the jobs that did not fit in time are saved to the dead letter file of the sinks
+
+        Parameters
+        ----------
+            list_jobs_instances : list
+                List of job instances with the jobs information
+            updates_only : bool
+                True if the jobs were already saved, to save them only to the sinks that update the saved jobs
+                (PostgreSQL and SQLite). The JSON and Parquet sinks append the jobs, so they would save them twice
+        """
+        start = time.perf_counter()
+        await asyncio.to_thread(self.dispatcher.put, list_jobs_instances, updates_only)
+        self.put_wait_seconds_total += time.perf_counter() - start
+
+    def get_metric_samples(self):
+        """Function that gets the metrics of the sinks and the time waiting for them for modules/metrics_export.py
+
+        Returns
+        -------
+            list_samples : list
+                Samples (name, labels, value)
+        """
+        list_samples = [("writer_wait_seconds_total", {}, self.put_wait_seconds_total)]
+        for name, metrics in self.dispatcher.get_metrics().items():
+            list_samples += [("jobs_saved_total", {"sink": name}, metrics["jobs_written"]),
+                             ("jobs_dropped_total", {"sink": name}, metrics["jobs_dropped"]),
+                             ("jobs_dead_letter_total", {"sink": name}, metrics["jobs_dead_letter"]),
+                             ("sink_errors_total", {"sink": name}, metrics["errors"]),
+                             ("sink_write_seconds_total", {"sink": name}, metrics["write_seconds_total"]),
+                             ("sink_queue_depth", {"sink": name}, metrics["queue_depth"])]
+        return list_samples
+
+    async def close(self):
+        """Save all the pending jobs and close the sinks"""
+        if not self.started:
+            return
+
+        await asyncio.to_thread(self.dispatcher.close)
+        self.started = False
+
+        logger.info(f"Background writer closed. Time waiting for the sinks: {self.put_wait_seconds_total:.2f} s")
@@ -5,6 +5,9 @@ from spacy.language import Language
 import json, re, logging, configparser
 from modules.helper_functions import translate_description, pre_process_description, \
     tokenize_words, check_similarity
+from modules.sentence_cache import SentenceCache
+from modules.instrumentation import timed, span
+from modules.metrics_export import register_collector
 
 logger = logging.getLogger('check apply module')
 
@@ -16,6 +19,10 @@ with open('./data/data.json', 'r') as json_file:
 config_obj = configparser.ConfigParser(converters={'list': lambda x: [i.strip() for i in x.split(',')]})
 config_obj.read("./configfile.ini")
 
+# Cache of the outcomes of the checks of each sentence, shared by all the descriptions of the run
+sentence_cache = SentenceCache(config_obj.getint("options", "sentence_cache_size"))
+register_collector("sentence_cache", sentence_cache.get_metric_samples)
+
 def load_user_words_to_check():
     """Function that loads the user options regarding the words to check for the language
     
@@ -270,6 +277,7 @@ def create_nlp_model():
     
     return nlp
 
+@timed("check_position_title")
 def check_position_title(position_name, nlp):
     """Function to check the experience or seniority required by the job title.
     
@@ -290,7 +298,8 @@ def check_position_title(position_name, nlp):
     reason_not_apply = ""
 
     # Create document with the description
-    doc = nlp(position_name.lower())
+    with span("nlp_title"):
+        doc = nlp(position_name.lower())
 
     # Load the user options
     seniority_do_not_apply, experience_max_year_threshold = load_user_experience_to_check()
@@ -306,6 +315,7 @@ def check_position_title(position_name, nlp):
 
     return apply_experience, reason_not_apply
 
+@timed("check_language_requirement")
 def check_language_requirement(doc, nlp):
     """Function to check the language requirement.
     
@@ -330,12 +340,10 @@ def check_language_requirement(doc, nlp):
     possible_languages, adj_to_check, noun_to_check, propn_to_check, verb_to_check, \
     adv_to_check, similarity_threshold = load_user_words_to_check()
 
-    # Tokenize words to check
-    adj_to_check = tokenize_words(adj_to_check, nlp)
-    noun_to_check = tokenize_words(noun_to_check, nlp)
-    propn_to_check = tokenize_words(propn_to_check, nlp)
-    verb_to_check = tokenize_words(verb_to_check, nlp)
-    adv_to_check = tokenize_words(adv_to_check, nlp)
+    # Words to check. They are tokenized the first time a sentence is not in the cache
+    words_to_check = {"adj": adj_to_check, "noun": noun_to_check, "propn": propn_to_check,
+                      "verb": verb_to_check, "adv": adv_to_check}
+    word_docs = {}
 
     # Check if there are languages in the job description
     for entity in doc.ents:
@@ -346,27 +354,39 @@ def check_language_requirement(doc, nlp):
             if entity.text not in possible_languages:                  
                 # Get the sentence where that entity is
                 sentence = entity.sent
-                # Get words from the sentence with the language that you do not speak
-                adjectives = [token for token in sentence if token.pos_ == "ADJ"]
-                nouns = [token for token in sentence if token.pos_ == "NOUN"]
-                propn = [token for token in sentence if token.pos_ == "PROPN"]
-                verbs = [token for token in sentence if token.pos_ == "VERB"]
-                adv = [token for token in sentence if token.pos_ == "ADV"]
-
-                # Calculate similarity with the words to check                
-                sim_1 = check_similarity(adjectives, adj_to_check, entity)
-                sim_2 = check_similarity(nouns, noun_to_check, entity)
-                sim_3 = check_similarity(propn, propn_to_check, entity)
-                sim_4 = check_similarity(verbs, verb_to_check, entity)
-                sim_5 = check_similarity(adv, adv_to_check, entity)
+
+                def check_language_sentence():
+                    """Max similarity of the words of the sentence with the words to check"""
+                    if not word_docs:
+                        for pos, list_words in words_to_check.items():
+                            word_docs[pos] = tokenize_words(list_words, nlp)
+
+                    # Get words from the sentence with the language that you do not speak
+                    adjectives = [token for token in sentence if token.pos_ == "ADJ"]
+                    nouns = [token for token in sentence if token.pos_ == "NOUN"]
+                    propn = [token for token in sentence if token.pos_ == "PROPN"]
+                    verbs = [token for token in sentence if token.pos_ == "VERB"]
+                    adv = [token for token in sentence if token.pos_ == "ADV"]
+
+                    # Calculate similarity with the words to check                
+                    sim_1 = check_similarity(adjectives, word_docs["adj"], entity)
+                    sim_2 = check_similarity(nouns, word_docs["noun"], entity)
+                    sim_3 = check_similarity(propn, word_docs["propn"], entity)
+                    sim_4 = check_similarity(verbs, word_docs["verb"], entity)
+                    sim_5 = check_similarity(adv, word_docs["adv"], entity)
+
+                    return max([sim_1, sim_2, sim_3, sim_4, sim_5])
                 
                 # Calculate the max similarity. If similarity > similarity_threshold then do not apply
-                if max([sim_1, sim_2, sim_3, sim_4, sim_5]) > similarity_threshold:
+                max_similarity = sentence_cache.get_or_compute("language", sentence.text, check_language_sentence,
+                                                               extra=entity.text)
+                if max_similarity > similarity_threshold:
                     apply_language = False
                     reason_not_apply = "Language Requirement"
     
     return apply_language, reason_not_apply
 
+@timed("check_experience_requirement")
 def check_experience_requirement(doc, nlp):
     """Function to check the experience or seniority required by the job description.
     
@@ -427,7 +447,8 @@ def check_experience_requirement(doc, nlp):
     # Analyze each sentence
     list_booleans = []
     for sentence in sentences_to_analyze:
-        list_booleans.append(analyze_sentences_for_experience(sentence, nlp))
+        list_booleans.append(sentence_cache.get_or_compute("experience", sentence.text,
+                                                           lambda: analyze_sentences_for_experience(sentence, nlp)))
 
     # If not True, return False
     if not all(list_booleans):
@@ -437,6 +458,7 @@ def check_experience_requirement(doc, nlp):
     
     return apply_experience, reason_not_apply
 
+@timed("check_technology_requirement")
 def check_technology_requirement(doc, nlp):
     """Function to check the technologies required by the job description.
     
@@ -490,26 +512,31 @@ def check_technology_requirement(doc, nlp):
             if entity.text not in programming_languages_apply:
                 sentence = entity.sent # sentence where the programming language is
                 
-                # Check if any of the programming languages that you know is in the sentence, as there can be an or
-                # example: proficiency in programming languages such as python, java, or scala
-                matcher = Matcher(nlp.vocab)
-                pattern_prog_lan = [{"LOWER": {"IN": programming_languages_apply}}] # If the sentence has a prog_lang to apply
-                pattern_or = [{"ORTH": "or"}] # If the sentence has an "or" word
-                matcher.add("programming language know", [pattern_prog_lan])
-                matcher.add("or", [pattern_or])
-                matches = matcher(sentence)
-                
-                prog_lan = False
-                or_word = False
-                for match_id, start, end in matches:
-                    string_id = nlp.vocab.strings[match_id]  # Get string representation
-
-                    if string_id == "programming language know":
-                        prog_lan = True
-                    if string_id == "or":
-                        or_word = True
-
-                if prog_lan and or_word:
+                def check_known_programming_language_alternative():
+                    """True if the sentence has a programming language that you know and an or"""
+                    # Check if any of the programming languages that you know is in the sentence, as there can be an or
+                    # example: proficiency in programming languages such as python, java, or scala
+                    matcher = Matcher(nlp.vocab)
+                    pattern_prog_lan = [{"LOWER": {"IN": programming_languages_apply}}] # If the sentence has a prog_lang to apply
+                    pattern_or = [{"ORTH": "or"}] # If the sentence has an "or" word
+                    matcher.add("programming language know", [pattern_prog_lan])
+                    matcher.add("or", [pattern_or])
+                    matches = matcher(sentence)
+                    
+                    prog_lan = False
+                    or_word = False
+                    for match_id, start, end in matches:
+                        string_id = nlp.vocab.strings[match_id]  # Get string representation
+
+                        if string_id == "programming language know":
+                            prog_lan = True
+                        if string_id == "or":
+                            or_word = True
+
+                    return prog_lan and or_word
+
+                if sentence_cache.get_or_compute("programming language", sentence.text,
+                                                 check_known_programming_language_alternative):
                     apply_technology = True
                 else:
                     apply_technology = False
@@ -530,6 +557,7 @@ def check_technology_requirement(doc, nlp):
 
     return apply_technology, reason_not_apply, list_technologies_no_knowledge, list_tags
 
+@timed("check_if_email")
 def check_if_email(doc,nlp):
     """Function to check if the job description has an email as the recruiters usually ask you to apply through
     email instead of the easy apply
@@ -558,6 +586,7 @@ def check_if_email(doc,nlp):
     
     return email
 
+@timed("check_apply_or_not")
 def check_apply_or_not(description, position_name, nlp):
     """Function to decide if apply for the job or not
     
@@ -591,7 +620,8 @@ def check_apply_or_not(description, position_name, nlp):
     clean_description, description_lang = pre_process_text(description)
     
     # Create document with the description
-    doc = nlp(clean_description)
+    with span("nlp_description"):
+        doc = nlp(clean_description)
 
     # Check language requirement
     apply_lang, reason_not_apply_lang = check_language_requirement(doc, nlp)
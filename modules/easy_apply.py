@@ -1,12 +1,29 @@
-import asyncio, logging
-from playwright.async_api import async_playwright
-from modules.helper_functions import scrap_easy_apply, load_json_to_dict, log_exceptions, \
-    save_job_questions_no_answer
-import itertools
-import json
+import logging, time
+from modules.helper_functions import load_json_to_dict, log_exceptions
+from modules.questions_no_answer_store import save_job_questions_no_answer
+from modules.answer_index import get_answer_index
+from modules.easy_apply_form import get_easy_apply_form, fill_question
+from modules.instrumentation import timed
+from modules.metrics_export import increment
 
 logger = logging.getLogger('easy apply module')
 
+# States of the Easy Apply flow (see EasyApplyFlow)
+STATE_OPEN = "open"
+STATE_FILL_STEP = "fill_step"
+STATE_NEXT_STEP = "next_step"
+STATE_SUBMIT = "submit"
+STATE_CONFIRM = "confirm"
+STATE_DONE = "done"
+STATE_MISSING_ANSWERS = "missing_answers"
+STATE_ABORTED = "aborted"
+FINAL_STATES = {STATE_DONE, STATE_MISSING_ANSWERS, STATE_ABORTED}
+
+# Duration of the transitions of the Easy Apply flow of all the jobs, by "from -> to". Times are in seconds
+transition_metrics = {}
+# Number of aborted flows by the state where the budget was exhausted
+abort_metrics = {}
+
 async def exception_questions(e, logger, job_inst, page):
     """Function used when there are exceptions in the questions
     
@@ -231,44 +248,11 @@ async def choose_cv(page, job_inst):
     else:
         await click_correct_cv(cvs, "English")    
 
-def add_answers_questions_work_visa(easy_apply_quest_answ, dict_user_opts, country):
-    """Function that adds to the easy_apply_quest_answ dict some answers about the work visa conditions,
-    depending the country of the job position
-    
-    Parameters
-    ----------
-        easy_apply_quest_answ : dict
-            Dictionary with the questions and answers for easy apply
-        dict_user_opts : dict
-            Dictionary with the user options of search, save and apply
-        country : str
-            Country of the job position
-    Returns
-    -------
-        easy_apply_quest_answ : dict
-            Dictionary with the questions and answers for easy apply
-    """
-    # Get the list of countries that you dont need a work visa to work
-    list_countries_no_work_visa = dict_user_opts["countries_no_visa"]
-
-    if country in list_countries_no_work_visa:
-        easy_apply_quest_answ["Do you need sponsorship for a new position?"] = "No"
-        easy_apply_quest_answ["Will you now or in the future require sponsorship for employment visa status?"] = "No"
-        easy_apply_quest_answ["Do you need visa sponsorship to work in this location?"] = "No"
-        easy_apply_quest_answ["Are you authorized to work in the job's country?"] = "Yes"
-        easy_apply_quest_answ[f"Are you legally authorized to work in {country}?"] = "Yes"
-    else:
-        easy_apply_quest_answ["Do you need sponsorship for a new position?"] = "Yes"
-        easy_apply_quest_answ["Will you now or in the future require sponsorship for employment visa status?"] = "Yes"
-        easy_apply_quest_answ["Do you need visa sponsorship to work in this location?"] = "Yes"
-        easy_apply_quest_answ["Are you authorized to work in the job's country?"] = "No"
-        easy_apply_quest_answ[f"Are you legally authorized to work in {country}?"] = "No"
-
-    return easy_apply_quest_answ
-
 async def check_questions(page, job_inst, dict_user_opts):
     """Function that checks if there are questions in the EasyApply tab. If there are questions
-    it checks if it has the answers, if not, it addes them to a list that is saved to a json file
+    it checks if it has the answers, if not, it addes them to the store of questions without answer.
+    The form is read with one evaluate call (see modules/easy_apply_form.py) and each question is
+    filled through its own element
     
     Parameters
     ----------
@@ -288,116 +272,47 @@ async def check_questions(page, job_inst, dict_user_opts):
     # List of missing questions 
     missing_questions = []
 
-    # Import the questions and answers of EasyApply
-    easy_apply_quest_answ = load_json_to_dict(dict_user_opts["easy_apply_quest_answ_path"])
+    # Index of the questions and answers of EasyApply, loaded once and reloaded if the file changes
+    answer_index = get_answer_index(dict_user_opts)
+
+    # Describe the form: questions with 4 types (Input, Select, Checkbox or Fill and Select) and the special tabs
+    form = await get_easy_apply_form(page)
+    work_experience, education = form["work_experience"], form["education"]
+    privacy_policy, resume = form["privacy_policy"], form["resume"]
 
-    # Get html code from the page
-    questions_html = await page.content()
-    # Scrap the html to check if there are questions with 4 types: Input, Select, Checkbox or Fill and Select
-    input_questions, select_questions, checkbox_questions, fill_select_questions, \
-                                      work_experience, education, privacy_policy, resume = scrap_easy_apply(questions_html)
-    # Make one list of the 4 lists
-    easy_apply_questions = list(itertools.chain(input_questions, select_questions, checkbox_questions, fill_select_questions))
     # Add to the job instance the Easy Apply questions
+    easy_apply_questions = [question["question"] for question in form["questions"]]
     job_inst.easy_apply_questions = easy_apply_questions
 
-    # Add visa related questions to the easy_apply questions and answers dict
-    easy_apply_quest_answ = add_answers_questions_work_visa(easy_apply_quest_answ, dict_user_opts, job_inst.search_country)
-
-    # Check if all the questions are in the dict with the answers, if not append the missing ones to the list
+    # Find the answer of each question (the visa answers depend on the country), if not append the missing ones to the list
+    easy_apply_quest_answ = {}
     for question in easy_apply_questions:
-        if question not in easy_apply_quest_answ.keys():
+        answer, confidence, matched_question = answer_index.get_answer(question, job_inst.search_country)
+        if answer is None:
             missing_questions.append(question)
             # If cannot apply due to missing questions change the bool to True to apply later
             job_inst.could_not_apply_due_to_questions = True
+            continue
 
-    # If the bool is true due to a missing question in the dict save all the missing questions to a json file
+        if confidence < 1:
+            logger.info(f"Answering '{question}' with the answer of '{matched_question}' (similarity {confidence:.2f})")
+        easy_apply_quest_answ[question] = answer
+
+    # If the bool is true due to a missing question in the dict save all the missing questions to the store
     # and return the job_instance
     if job_inst.could_not_apply_due_to_questions == True:
-        save_job_questions_no_answer(missing_questions, './data/questions_no_answer.json')
+        save_job_questions_no_answer(missing_questions, job_inst.url)
         logger.info(f"Questions without answers: {missing_questions}")
         return job_inst
 
-    # Locate only the EasyApply content
-    easy_apply_tab = page.locator("div.jobs-easy-apply-content")
-
-    # If there are input questions, fill them
-    if input_questions:
-        for input_question in input_questions:
-            try:
-                answer = easy_apply_quest_answ[input_question]
-                await easy_apply_tab.get_by_text(input_question, exact=True).fill(answer)
-                await page.wait_for_timeout(300)
-            except Exception as e:
-                job_inst = await exception_questions(e, logger, job_inst, page)
-                return job_inst
-    
-    # If there are select questions, select them
-    if select_questions:
-        for select_question in select_questions:
-            try:
-                answer = easy_apply_quest_answ[select_question]
-                await easy_apply_tab.get_by_label(select_question).select_option(answer)
-                await page.wait_for_timeout(300)
-            except Exception as e:
-                job_inst = await exception_questions(e, logger, job_inst, page)
-                return job_inst
-    
-    # If there are checkbox questions, check them            
-    if checkbox_questions:
-        fieldsets = await easy_apply_tab.locator("fieldset").all() # Get all the fieldsets with the checkbox questions
-        for checkbox_question in checkbox_questions:
-            try:
-                answer = easy_apply_quest_answ[checkbox_question]
-
-                for fieldset in fieldsets:
-                    legend_text_option1 = await fieldset.locator("legend > span > span[aria-hidden=true]").count()
-                    legend_text_option2 = await fieldset.locator("legend > div > span[aria-hidden=true]").count()
-                    
-                    if legend_text_option1 == 1:
-                        legend_text = await fieldset.locator("legend > span > span[aria-hidden=true]").text_content()
-                    elif legend_text_option2 == 1:
-                        legend_text = await fieldset.locator("legend > div > span[aria-hidden=true]").text_content()
-                    
-                    if checkbox_question == legend_text.strip():
-                        await fieldset.locator(f'div > label[data-test-text-selectable-option__label="{answer}"]').click()
-                        await page.wait_for_timeout(300)
-                        break
-
-            except Exception as e:
-                job_inst = await exception_questions(e, logger, job_inst, page)
-                return job_inst
-
-    # Check if there are fill questions
-    if fill_select_questions:
-        for fill_select_question in fill_select_questions:
-            try:
-                answer = easy_apply_quest_answ[fill_select_question]
-                divs = await page.locator("div.fb-dash-form-element").all()
-                for div in divs:
-                    label_text = await div.locator("span[aria-hidden=true]").text_content()
-                    if label_text == fill_select_question:
-                        await div.get_by_role("combobox").fill(answer) # Fill the answer
-                        await page.wait_for_timeout(500)
-                        await div.locator("span[aria-hidden=true]").press("ArrowDown")
-                        await div.locator("span[aria-hidden=true]").press("Enter")
-                        break
-                await page.wait_for_timeout(300)
-            except:
-                try:
-                    answer = easy_apply_quest_answ[fill_select_question]
-                    label_text = await page.locator("div.fb-dash-form-element").locator("span[aria-hidden=true]").text_content()
-                    div = page.locator("div.fb-dash-form-element")
-                    if label_text == fill_select_question:
-                        await div.get_by_role("combobox").fill(answer) # Fill the answer
-                        await page.wait_for_timeout(500)
-                        await div.locator("span[aria-hidden=true]").press("ArrowDown")
-                        await div.locator("span[aria-hidden=true]").press("Enter")
-                    await page.wait_for_timeout(300)
-                
-                except Exception as e:
-                    job_inst = await exception_questions(e, logger, job_inst, page)
-                    return job_inst
+    # Fill each question in its element
+    for question in form["questions"]:
+        try:
+            await fill_question(page, question, easy_apply_quest_answ[question["question"]])
+            await page.wait_for_timeout(300)
+        except Exception as e:
+            job_inst = await exception_questions(e, logger, job_inst, page)
+            return job_inst
 
     # Check for Work Experience Tab. If exists then delete all the jobs and fill with new
     if work_experience:
@@ -446,68 +361,200 @@ async def exit_easy_apply(page):
         await page.get_by_role("button", name="Dismiss").click()
         await page.wait_for_timeout(500)
         await page.get_by_role("button", name="Discard").click()
-    except:
+    except Exception:
         await page.locator("div.jobs-easy-apply-modal > button[aria-label=Dismiss]").click()
         await page.wait_for_timeout(500)
         await page.get_by_role("button", name="Discard").click()
 
-async def check_buttons(page, job_inst, dict_user_opts):
-    """Function that checks the 3 different buttons ofthe Easy Apply tabs: Next, Review, Submit Application
-    
+async def get_step_button(page):
+    """Function that finds the button that finishes the current Easy Apply step: Submit application,
+    Review or Next
+
     Parameters
     ----------
         page : playwright object
             Playwright page
-        job_inst : job instance
-            Instance of the job that is being processed
-        dict_user_opts : dict
-            Dictionary with the user options of search, save and apply 
     Returns
     -------
-        job_inst : job instance
-            Instance of the job that is being processed
+        button : str or None
+            "submit", "review" or "next", None if there is not one of them
     """
-    await page.wait_for_timeout(500)
-    
-    # Check if there are questions
-    job_inst = await check_questions(page, job_inst, dict_user_opts)
+    if (await page.get_by_label("Submit application").count()) == 1:
+        return "submit"
+    if (await page.locator("button[aria-label='Review your application']").count()) == 1:
+        return "review"
+    if (await page.locator("button[aria-label='Continue to next step']").count()) == 1:
+        return "next"
+    return None
 
-    # Check if questions could be answered, if not exit the EasyApply Tab and return the instance
-    if job_inst.could_not_apply_due_to_questions == True:
-        await exit_easy_apply(page)
-        return job_inst
-    
-    await page.wait_for_timeout(500)
+def record_transition(from_state, to_state, seconds):
+    """Function that adds the duration of a transition of the Easy Apply flow to the metrics
 
-    # If all was ok and then click "Submit application", "Review" or "Next"
+    Parameters
+    ----------
+        from_state : str
+            State before the transition
+        to_state : str
+            State after the transition
+        seconds : float
+            Duration of the transition
+    """
+    metrics = transition_metrics.setdefault(f"{from_state} -> {to_state}", {"count": 0, "seconds_total": 0.0, "seconds_max": 0.0})
+    metrics["count"] += 1
+    metrics["seconds_total"] += seconds
+    metrics["seconds_max"] = max(metrics["seconds_max"], seconds)
+
+def log_easy_apply_metrics():
+    """Function that logs the aborts and the duration of each transition of the Easy Apply flow, the slowest first"""
+    logger.info(f"Easy Apply aborts: {abort_metrics}")
+    for transition, metrics in sorted(transition_metrics.items(), key=lambda item: item[1]["seconds_total"], reverse=True):
+        logger.info(f"Easy Apply transition {transition}: {metrics['count']} times, "
+                    f"{metrics['seconds_total']:.1f} s total, {metrics['seconds_total'] / metrics['count']:.2f} s mean, "
+                    f"{metrics['seconds_max']:.2f} s max")
+
+class EasyApplyFlow():
+    """State machine of the Easy Apply flow of one job:
+
+        open -> fill_step -> next_step -> fill_step -> ... -> submit -> confirm -> done
+
+    fill_step answers the questions of the current step and goes to submit or next_step (Next or Review)
+    depending on the button of the step, or to missing_answers if a question has no answer. If there is
+    no button the step is filled again. The flow is aborted through exit_easy_apply when it takes more than
+    easy_apply_max_steps transitions or easy_apply_max_seconds seconds. The duration of each transition is
+    added to the metrics of the module (see log_easy_apply_metrics)
+    """
+    def __init__(self, page, job_inst, dict_user_opts):
+        self.page = page
+        self.job_inst = job_inst
+        self.dict_user_opts = dict_user_opts
+        self.max_steps = dict_user_opts["easy_apply_max_steps"]
+        self.max_seconds = dict_user_opts["easy_apply_max_seconds"]
+        self.state = STATE_OPEN
+        self.step_button = None
+        self.handlers = {
+            STATE_OPEN: self.open,
+            STATE_FILL_STEP: self.fill_step,
+            STATE_NEXT_STEP: self.next_step,
+            STATE_SUBMIT: self.submit,
+            STATE_CONFIRM: self.confirm,
+        }
+
+    async def run(self):
+        """Function that runs the flow until a final state
+
+        Returns
+        -------
+            job_inst : instance
+                Instance of a job class with the job information
+        """
+        self.job_inst.applied = False
+        self.job_inst.could_not_apply_due_to_questions = False
+
+        start = time.perf_counter()
+        num_steps = 0
+        while self.state not in FINAL_STATES:
+            if num_steps >= self.max_steps:
+                await self.abort(f"more than {self.max_steps} steps")
+                break
+            if time.perf_counter() - start > self.max_seconds:
+                await self.abort(f"more than {self.max_seconds} seconds")
+                break
 
-    if (await page.get_by_label("Submit application").count()) == 1:
-        # If there is a Submit Application button
-        await page.get_by_label("Submit application").click()
-        job_inst.applied = True
-        await page.wait_for_timeout(2000)
+            transition_start = time.perf_counter()
+            from_state = self.state
+            self.state = await self.handlers[from_state]()
+            record_transition(from_state, self.state, time.perf_counter() - transition_start)
+            num_steps += 1
+
+        return self.job_inst
+
+    async def open(self):
+        """Click the Easy Apply button"""
+        await self.page.locator("div.jobs-s-apply > div > button:visible > span", has_text="Easy Apply").click()
+        await self.page.wait_for_timeout(1000)
+        return STATE_FILL_STEP
 
+    async def fill_step(self):
+        """Answer the questions of the current step and find its button"""
+        await self.page.wait_for_timeout(500)
+
+        # Check if there are questions
+        self.job_inst = await check_questions(self.page, self.job_inst, self.dict_user_opts)
+
+        # Check if questions could be answered, if not exit the EasyApply Tab
+        if self.job_inst.could_not_apply_due_to_questions == True:
+            try:
+                await exit_easy_apply(self.page)
+            except Exception as e:
+                log_exceptions(e, logger)
+            return STATE_MISSING_ANSWERS
+
+        await self.page.wait_for_timeout(500)
+
+        self.step_button = await get_step_button(self.page)
+        if self.step_button == "submit":
+            return STATE_SUBMIT
+        if self.step_button is not None:
+            return STATE_NEXT_STEP
+
+        # The step is not loaded yet or it has an unknown button
+        logger.info("Easy Apply step without Next, Review or Submit button")
+        await self.page.wait_for_timeout(1000)
+        return STATE_FILL_STEP
+
+    async def next_step(self):
+        """Click the Next or Review button"""
+        if self.step_button == "review":
+            await self.page.locator("button[aria-label='Review your application']").click()
+        else:
+            await self.page.locator("button[aria-label='Continue to next step']").click()
+        await self.page.wait_for_timeout(1000)
+        return STATE_FILL_STEP
+
+    async def submit(self):
+        """Click the Submit application button"""
+        await self.page.get_by_label("Submit application").click()
+        self.job_inst.applied = True
+        await self.page.wait_for_timeout(2000)
+        return STATE_CONFIRM
+
+    async def confirm(self):
+        """Close the confirmation of the application"""
         try:
             logger.info("Pressing button 1 to close")
-            await page.get_by_role("button", name="Done").click()
-            await page.wait_for_timeout(1000)
-        except:
+            await self.page.get_by_role("button", name="Done").click()
+            await self.page.wait_for_timeout(1000)
+        except Exception:
             logger.info("Pressing button 2 to close")
-            await page.get_by_role("button", name="Dismiss").click()
-            await page.wait_for_timeout(1000)
-        
-        return job_inst
-
-    elif (await page.locator("button[aria-label='Review your application']").count()) == 1:
-        await page.locator("button[aria-label='Review your application']").click()
-    elif (await page.locator("button[aria-label='Continue to next step']").count()) == 1:
-        await page.locator("button[aria-label='Continue to next step']").click()
-
-    return job_inst
+            await self.page.get_by_role("button", name="Dismiss").click()
+            await self.page.wait_for_timeout(1000)
+        return STATE_DONE
+
+    async def abort(self, reason):
+        """Exit the Easy Apply tab when the budget of the flow is exhausted
+
+        Parameters
+        ----------
+            reason : str
+                Reason of the abort, for the logs
+        """
+        logger.info(f"Aborting Easy Apply in state {self.state}: {reason}")
+        abort_metrics[self.state] = abort_metrics.get(self.state, 0) + 1
+        increment("easy_apply_aborts_total", state=self.state)
+
+        # After submitting, the application was sent and only the confirmation is missing
+        if self.state != STATE_CONFIRM:
+            try:
+                await exit_easy_apply(self.page)
+            except Exception as e:
+                log_exceptions(e, logger)
+        self.state = STATE_ABORTED
 
+@timed("easy_apply")
 async def easy_apply(page, job_inst, dict_user_opts):
     """Function that applies to the job with Easy Apply. It is going to check if it has a tab with specific questions
-    for the job. If this questions are not in a dict, then they are saved to answer and later apply again
+    for the job. If this questions are not in a dict, then they are saved to answer and later apply again.
+    The steps of the form are followed by EasyApplyFlow
     
     Parameters
     ----------
@@ -522,21 +569,4 @@ async def easy_apply(page, job_inst, dict_user_opts):
         job_inst : instance
             Instance of a job class with the job information
     """
-    # Click Easy apply button
-    await page.locator("div.jobs-s-apply > div > button:visible > span", has_text="Easy Apply").click()
-    await page.wait_for_timeout(1000)
-
-    job_inst.applied = False
-    job_inst.could_not_apply_due_to_questions = False
-
-    # Do the loop of checking buttons and filling information until applied or until cannot
-    # Apply do to missing answers
-    applied = job_inst.applied
-    not_apply_due_to_questions = job_inst.could_not_apply_due_to_questions
-    while (applied == False) and (not_apply_due_to_questions == False):
-        job_inst = await check_buttons(page, job_inst, dict_user_opts)
-        applied = job_inst.applied
-        not_apply_due_to_questions = job_inst.could_not_apply_due_to_questions
-        await page.wait_for_timeout(1000)
-    
-    return job_inst
\ No newline at end of file
+    return await EasyApplyFlow(page, job_inst, dict_user_opts).run()
@@ -0,0 +1,116 @@
+import logging
+
+logger = logging.getLogger('easy_apply_form')
+
+# Attribute added to each question of the Easy Apply form, to locate it directly when it is filled
+QUESTION_INDEX_ATTRIBUTE = "data-easy-apply-question-index"
+
+# Script that runs in the page and describes the Easy Apply form in one round trip. It follows the same rules
+# as the previous BeautifulSoup scraper, so the text of the questions (the keys of the answers file) do not change
+EASY_APPLY_FORM_SCRIPT = """
+(indexAttribute) => {
+    const text = (element) => element ? element.textContent.trim() : "";
+    const form = {work_experience: false, education: false, privacy_policy: false, resume: false, questions: []};
+
+    for (const h3 of document.querySelectorAll("h3")) {
+        const title = text(h3);
+        if (title === "Work experience") form.work_experience = true;
+        if (title === "Education") form.education = true;
+        if (title === "Privacy policy") form.privacy_policy = true;
+    }
+
+    form.resume = document.querySelector("input[id^='jobs-document-upload-file-input-upload-resume']") !== null;
+
+    if (form.work_experience || form.education || form.privacy_policy) {
+        return form;
+    }
+
+    const groupings = document.querySelectorAll("div.jobs-easy-apply-form-section__grouping");
+    groupings.forEach((grouping, index) => {
+        grouping.setAttribute(indexAttribute, String(index));
+        const select = grouping.querySelector("select");
+
+        if (grouping.querySelector("label.artdeco-text-input--label")) {
+            form.questions.push({index: index, type: "input", question: text(grouping), options: []});
+        }
+        if (select) {
+            form.questions.push({index: index, type: "select", question: text(grouping.querySelector("span")),
+                                 options: Array.from(select.options).map((option) => text(option))});
+        }
+        if (grouping.querySelector("input.fb-form-element__checkbox")) {
+            const legend = grouping.querySelector("legend");
+            form.questions.push({index: index, type: "checkbox",
+                                 question: text(legend ? legend.querySelector("span.visually-hidden") : null),
+                                 options: Array.from(grouping.querySelectorAll("label[data-test-text-selectable-option__label]"))
+                                     .map((label) => label.getAttribute("data-test-text-selectable-option__label"))});
+        }
+        if (grouping.querySelector("label.fb-dash-form-element__label") && !select) {
+            form.questions.push({index: index, type: "fill_select",
+                                 question: text(grouping.querySelector("span.visually-hidden")), options: []});
+        }
+    });
+
+    return form;
+}
+"""
+
+async def get_easy_apply_form(page):
+    """Function that describes the form of the current Easy Apply step with one evaluate call
+
+    Parameters
+    ----------
+        page : playwright object
+            Playwright page
+    Returns
+    -------
+        form : dict
+            Dict with the booleans work_experience, education, privacy_policy and resume, and the list of
+            questions. Each question is a dict with its index, type (input, select, checkbox or fill_select),
+            question text and options
+    """
+    return await page.evaluate(EASY_APPLY_FORM_SCRIPT, QUESTION_INDEX_ATTRIBUTE)
+
+def get_question_locator(page, question):
+    """Function that gets the locator of the element of a question of the form
+
+    Parameters
+    ----------
+        page : playwright object
+            Playwright page
+        question : dict
+            Question of the form returned by get_easy_apply_form
+    Returns
+    -------
+        locator : playwright object
+            Locator of the element of the question
+    """
+    return page.locator(f'[{QUESTION_INDEX_ATTRIBUTE}="{question["index"]}"]')
+
+async def fill_question(page, question, answer):
+    """Function that fills a question of the form with its answer, using the element of the question directly
+
+    Parameters
+    ----------
+        page : playwright object
+            Playwright page
+        question : dict
+            Question of the form returned by get_easy_apply_form
+        answer : str
+            Answer of the question
+    """
+    element = get_question_locator(page, question)
+
+    if question["type"] == "input":
+        await element.locator("input, textarea").first.fill(answer)
+    elif question["type"] == "select":
+        await element.locator("select").select_option(answer)
+    elif question["type"] == "checkbox":
+        await element.locator(f'label[data-test-text-selectable-option__label="{answer}"]').click()
+    elif question["type"] == "fill_select":
+        combobox = element.get_by_role("combobox")
+        await combobox.fill(answer) # Fill the answer
+        await page.wait_for_timeout(500)
+        await combobox.press("ArrowDown") # Select from the list
+        await combobox.press("Enter")
+    else:
+        raise ValueError(f"Unknown question type: {question['type']}")
@@ -1,18 +1,21 @@
 from bs4 import BeautifulSoup
 import re, sys, json, logging, configparser
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import os.path
 from googletrans import Translator
-from modules.save_to_postgresql_db import save_to_postgresql_db
 from modules.item import Job
+from modules.instrumentation import timed
 
-def scrap_job(job_html):
+@timed("scrap_job")
+def scrap_job(job_html, base_url="https://www.linkedin.com"):
     """Function to scrap the information of the job
     
     Parameters
     ----------
         job_html : html
             html code of the job description
+        base_url : str
+            Url of LinkedIn, to build the url of the job
     Returns
     -------
         job : instance
@@ -28,8 +31,9 @@ def scrap_job(job_html):
     soup = soup.find(class_="job-view-layout")
     
     # Get job url
-    job_url = "https://www.linkedin.com" + soup.find("a", href=True)['href']
+    job_url = base_url + soup.find("a", href=True)['href']
     job.url = job_url.split("?")[0]
+    job.linkedin_job_id = get_linkedin_job_id(job.url)
 
     # Start class data
     start_class_data = "job-details-jobs-unified-top-card__"
@@ -69,6 +73,7 @@ def scrap_job(job_html):
         job.city = None
 
     try:
+        job.reposted = "Reposted" in undesired_text_list[0]
         posted_date_text = undesired_text_list[0].replace("Reposted", "").replace("ago", "").strip()
         job.posted_date = get_aprox_posted_date(posted_date_text)
     except:
@@ -105,6 +110,24 @@ def scrap_job(job_html):
 
     return job
 
+def get_linkedin_job_id(job_url):
+    """Function that gets the LinkedIn job id from the url of the job. It identifies the job even if
+    its description changes
+    
+    Parameters
+    ----------
+        job_url : str
+            Url of the job. Example: https://www.linkedin.com/jobs/view/3750000000/
+    Returns
+    -------
+        linkedin_job_id : str or None
+            LinkedIn job id or None if the url does not have it
+    """
+    match = re.search(r"/jobs/view/(?:[^/]*-)?(\d+)(?:/|$)", job_url or "")
+    if match:
+        return match.group(1)
+    return None
+
 def get_aprox_posted_date(posted_date_text):
     """Function that calculates an approximate posted date of the job
     
@@ -133,71 +156,29 @@ def get_aprox_posted_date(posted_date_text):
     
     return posted_date
 
-def save_job_questions_no_answer(list_questions_no_answer, path):
-    """Function to save the questions without answers
-        
-        Parameters
-        ----------
-            list_questions_no_answer : list
-                List of questions without answers
-            path : str
-                path to save the information in a json file
-        Returns
-        -------
-            json_file : json
-                Create a json file in the path directory
-        """
-
-    # if file exists open the file, append the data and write again the file
-    if os.path.isfile(path):
-        with open(path, 'r+') as json_file:
-            file_data = json.load(json_file)
-            for question in list_questions_no_answer:
-                file_data.append(question)
-        with open(path, 'w') as json_file:        
-            json.dump(file_data, json_file, indent=4)
-    # Else create the file and write it
-    else:
-        with open(path, 'w') as json_file:
-            json.dump(list_questions_no_answer, json_file, indent=4)
+def parse_posted_date(posted_date):
+    """Function that transforms the posted date to a date. The scraper saves it as "%d-%m-%Y" and the
+    database returns a date
 
-def save_job_info_to_json(list_jobs_instances, path):
-    """Function to scrap the information of the job
-    
     Parameters
     ----------
-        list_jobs_instances : instances
-            List of job instances with the linkedin jobs information
-        path : str
-            path to save the information in a json file
+        posted_date : str, date or None
+            Posted date of the job
     Returns
     -------
-        json_file : json
-            Create a json file in the path directory
+        posted_date : date or None
+            Posted date of the job
     """
-    
-    logger = logging.getLogger('save_job_info_to_json')
-
-    logger.info("Saving to json file")
-
-    list_dicts = []
-    # Transform objects to dict
-    for instance in list_jobs_instances:
-        list_dicts.append(instance.transform_to_dict())
-    
-    # if file exists open the file, append the data and write again the file
-    if os.path.isfile(path):
-        with open(path, 'r+') as json_file:
-            file_data = json.load(json_file)
-            for dictionary in list_dicts:
-                file_data.append(dictionary)
-        with open(path, 'w') as json_file:        
-            json.dump(file_data, json_file, indent=4)
-    # Else create the file and write it
-    else:
-        with open(path, 'w') as json_file:
-            json.dump(list_dicts, json_file, indent=4)
+    if posted_date is None or isinstance(posted_date, date):
+        return posted_date
+    for date_format in ["%d-%m-%Y", "%Y-%m-%d"]:
+        try:
+            return datetime.strptime(posted_date, date_format).date()
+        except ValueError:
+            continue
+    return None
 
+@timed("translate_description")
 def translate_description(description):
     """Function to translate the description if needed.
     
@@ -304,78 +285,6 @@ def check_similarity(list_doc, list_check, entity):
 
     return max_similarity
 
-def scrap_easy_apply(questions_html):
-    """Function to scrap the information of EasyApply Questions tab
-    
-    Parameters
-    ----------
-        questions_html : html
-            html code of the questions
-    Returns
-    -------
-        input_questions : list
-            List of questions that require input
-        select_questions : list
-            List of questions that require to select from options
-        checkbox_questions : list
-            List of questions that require to click a button with options
-        fill_select_questions : list
-            List of questions that require first to fill and then select an option
-        work_experience : bool
-            True if the tab with the questions is named "Work Experience"
-        education : bool
-            True if the tab with the questions is named "Education"
-        privacy_policy : bool
-            True if the tab with the questions is named "Privacy Policy"
-        resume : bool
-            True if the tab has the button to upload the CV
-    """
-    # Parse the tab with Beautiful Soup
-    soup = BeautifulSoup(questions_html, "lxml")
-
-    # Initiate variables
-    work_experience = False
-    education = False
-    privacy_policy = False
-    resume = False
-    input_questions = []
-    select_questions = []
-    checkbox_questions = []
-    fill_select_questions = []
-    
-    # Check if there is a tab names "Work Experience" or "Education" or "Privacy policy"
-    list_h3 = soup.find_all("h3")
-    for h3 in list_h3:
-        if h3.get_text().strip() == "Work experience":
-            work_experience = True
-        if h3.get_text().strip() == "Education":
-            education = True
-        if h3.get_text().strip() == "Privacy policy":
-            privacy_policy = True
-
-    # Check if there is a button (input) to upload the cv
-    resume_upload_button = soup.find("input", id=re.compile("^jobs-document-upload-file-input-upload-resume"))
-
-    if resume_upload_button:
-        resume = True
-
-    # Check for the questions
-    if not any([work_experience, education, privacy_policy]):
-        questions = soup.find_all("div", class_="jobs-easy-apply-form-section__grouping")
-
-        for i, question in enumerate(questions):
-            if question.find("label", class_="artdeco-text-input--label"):
-                input_questions.append(question.get_text().strip())
-            if question.find("select"):
-                select_questions.append(question.find("span").get_text().strip())
-            if question.find("input", class_="fb-form-element__checkbox"):
-                legend = question.find("legend")
-                checkbox_questions.append(legend.find("span", class_="visually-hidden").get_text().strip())
-            if question.find("label",class_="fb-dash-form-element__label") and not question.find("select"):
-                fill_select_questions.append(question.find("span", class_="visually-hidden").get_text().strip())
-
-    return input_questions, select_questions, checkbox_questions, fill_select_questions, work_experience, education, privacy_policy, resume
-
 def load_json_to_dict(path):
     """Function that loads a json file as dict
     
@@ -408,11 +317,63 @@ def load_user_search_save_apply_options():
     
     # Options
     dict_user_opts["save_to_json_file"] = config_obj.getboolean('options', 'save_to_json_file')
+    dict_user_opts["json_file_path"] = config_obj["options"]["json_file_path"]
+    dict_user_opts["json_file_compress"] = config_obj.getboolean('options', 'json_file_compress')
+    dict_user_opts["json_file_rotate"] = config_obj["options"]["json_file_rotate"]
+    dict_user_opts["json_file_rotate_max_mb"] = config_obj.getfloat('options', 'json_file_rotate_max_mb')
+    dict_user_opts["save_to_parquet"] = config_obj.getboolean('options', 'save_to_parquet')
+    dict_user_opts["parquet_dir"] = config_obj["options"]["parquet_dir"]
     dict_user_opts["save_to_postgresql_db"] = config_obj.getboolean('options', 'save_to_postgresql_db')
+    dict_user_opts["save_to_sqlite_db"] = config_obj.getboolean('options', 'save_to_sqlite_db')
+    dict_user_opts["sqlite_db_path"] = config_obj["options"]["sqlite_db_path"]
     dict_user_opts["apply_with_easy_apply"] = config_obj.getboolean('options', 'easy_apply')
     dict_user_opts["easy_apply_quest_answ_path"] = config_obj["options"]["easy_apply_quest_answ_path"]
+    dict_user_opts["easy_apply_answer_min_confidence"] = config_obj.getfloat('options', 'easy_apply_answer_min_confidence')
+    dict_user_opts["easy_apply_max_steps"] = config_obj.getint('options', 'easy_apply_max_steps')
+    dict_user_opts["easy_apply_max_seconds"] = config_obj.getfloat('options', 'easy_apply_max_seconds')
+    dict_user_opts["apply_job_deadline_seconds"] = config_obj.getfloat('options', 'apply_job_deadline_seconds')
+    dict_user_opts["apply_queue_path"] = config_obj["options"]["apply_queue_path"]
+    dict_user_opts["apply_min_interval_seconds"] = config_obj.getfloat('options', 'apply_min_interval_seconds')
+    dict_user_opts["apply_queue_drain"] = config_obj.getboolean('options', 'apply_queue_drain')
+    dict_user_opts["questions_no_answer_path"] = config_obj["options"]["questions_no_answer_path"]
     dict_user_opts["name_postgre_table"] = config_obj["options"]["name_postgre_table"]
+    dict_user_opts["postgresql_pool_min_connections"] = config_obj.getint('options', 'postgresql_pool_min_connections')
+    dict_user_opts["postgresql_pool_max_connections"] = config_obj.getint('options', 'postgresql_pool_max_connections')
+    dict_user_opts["postgresql_batch_page_size"] = config_obj.getint('options', 'postgresql_batch_page_size')
+    dict_user_opts["near_duplicate_detection"] = config_obj.getboolean('options', 'near_duplicate_detection')
+    dict_user_opts["near_duplicate_similarity"] = config_obj.getfloat('options', 'near_duplicate_similarity')
+    dict_user_opts["near_duplicate_db_path"] = config_obj["options"]["near_duplicate_db_path"]
+    dict_user_opts["job_deadline_seconds"] = config_obj.getfloat('options', 'job_deadline_seconds')
+    dict_user_opts["page_deadline_seconds"] = config_obj.getfloat('options', 'page_deadline_seconds')
     dict_user_opts["headless"] = config_obj.getboolean('options', 'headless')
+    dict_user_opts["linkedin_base_url"] = config_obj["options"]["linkedin_base_url"].rstrip("/")
+    dict_user_opts["auth_state_path"] = config_obj["options"]["auth_state_path"]
+    dict_user_opts["instrumentation"] = config_obj.getboolean('options', 'instrumentation')
+    dict_user_opts["instrumentation_job_spans"] = config_obj.getboolean('options', 'instrumentation_job_spans')
+    dict_user_opts["metrics_export"] = config_obj["options"]["metrics_export"]
+    dict_user_opts["metrics_http_port"] = config_obj.getint('options', 'metrics_http_port')
+    dict_user_opts["metrics_textfile_path"] = config_obj["options"]["metrics_textfile_path"]
+    dict_user_opts["metrics_textfile_interval_seconds"] = config_obj.getfloat('options', 'metrics_textfile_interval_seconds')
+
+    # Logging
+    dict_user_opts["log_path"] = config_obj["logging"]["path"]
+    dict_user_opts["log_format"] = config_obj["logging"]["format"]
+    dict_user_opts["log_level"] = config_obj["logging"]["level"]
+    dict_user_opts["log_max_mb"] = config_obj.getfloat("logging", "max_mb")
+    dict_user_opts["log_backup_count"] = config_obj.getint("logging", "backup_count")
+
+    # Sinks
+    dict_user_opts["sink_queue_size"] = config_obj.getint("sinks", "queue_size")
+    dict_user_opts["sink_put_timeout_seconds"] = config_obj.getfloat("sinks", "put_timeout_seconds")
+    dict_user_opts["sink_retries"] = config_obj.getint("sinks", "retries")
+    dict_user_opts["sink_retry_backoff_seconds"] = config_obj.getfloat("sinks", "retry_backoff_seconds")
+    dict_user_opts["sink_dead_letter_path"] = config_obj["sinks"]["dead_letter_path"]
+    dict_user_opts["sinks"] = dict()
+    for sink_name in ["json", "parquet", "postgresql", "sqlite"]:
+        dict_user_opts["sinks"][sink_name] = {
+            "batch_size": config_obj.getint("sinks", f"{sink_name}_batch_size"),
+            "flush_seconds": config_obj.getfloat("sinks", f"{sink_name}_flush_seconds"),
+        }
 
     # No visa countries
     dict_user_opts["countries_no_visa"] = config_obj.getlist("countries_no_visa","countries")
@@ -430,14 +391,18 @@ def load_user_search_save_apply_options():
 
     return dict_user_opts
 
-def logger_config():
-    """Function that sets the logger config"""
-    logging.basicConfig(
-        filename="logs.log",
-        encoding="utf-8",
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        level=logging.INFO,
-    )
+def logger_config(dict_user_opts):
+    """Function that sets the logger config. The records are written to the log file by a thread
+    (see modules/log_queue.py)
+
+    Parameters
+    ----------
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    """
+    from modules.log_queue import start_log_listener
+
+    start_log_listener(dict_user_opts)
 
 async def get_total_number_job_pages(page):
     """Function that gets the number of job pages that has the search results
@@ -466,25 +431,6 @@ async def get_total_number_job_pages(page):
 
     return init_page_number, max_number_pages
 
-def save_jobs_information(list_jobs_instances, dict_user_opts):
-    """Function that saves the information to a json and/or PostgreSQL database
-    
-    Parameters
-    ----------
-        list_jobs_instances : list
-            List of job instances with the jobs information
-        dict_user_opt_search_save_apply : dict
-            Dictionary with the user options of search, save and apply  
-    """
-
-    # After one page has been webscrapped and analyzed then save all the instances of the list to a json file. If Option = True
-    if dict_user_opts["save_to_json_file"]:
-        save_job_info_to_json(list_jobs_instances, "./data/linkedin_jobs.json")
-
-    # Save to postgresql if option = True
-    if dict_user_opts["save_to_postgresql_db"]:
-        save_to_postgresql_db(list_jobs_instances, dict_user_opts)
-
 def log_exceptions(e, logger):
     """Function that log the exceptions and break the try
     Parameters
@@ -0,0 +1,238 @@
+import math, time, inspect, logging, threading, functools, contextvars
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger('instrumentation')
+
+# Growth factor of the buckets of the histograms. The percentiles have an error below 5%
+BUCKET_FACTOR = 1.1
+# Shortest duration of the histograms, the shorter ones go to the first bucket
+MIN_SECONDS = 1e-6
+# Span returned when the instrumentation is off. It does nothing
+NULL_SPAN = nullcontext()
+
+# The instrumentation is off until init_instrumentation is called with instrumentation = True
+enabled = False
+log_job_spans = False
+
+# Histogram of the durations of each stage of the run, by name
+histograms = {}
+histograms_lock = threading.Lock()
+# Durations of the spans of the job that is being processed (count and seconds by name), None out of a job
+current_job_spans = contextvars.ContextVar("current_job_spans", default=None)
+
+class Histogram():
+    """Histogram of durations with logarithmic buckets, so its size does not grow with the number of
+    durations and the percentiles are known with a relative error below BUCKET_FACTOR - 1
+    """
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.seconds_total = 0.0
+        self.seconds_max = 0.0
+
+    def add(self, seconds):
+        """Function that adds a duration to the histogram
+
+        Parameters
+        ----------
+            seconds : float
+                Duration
+        """
+        bucket = int(math.log(max(seconds, MIN_SECONDS) / MIN_SECONDS, BUCKET_FACTOR))
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.seconds_total += seconds
+        self.seconds_max = max(self.seconds_max, seconds)
+
+    def get_percentile(self, percentile):
+        """Function that gets a percentile of the durations
+
+        Parameters
+        ----------
+            percentile : float
+                Percentile between 0 and 100
+        Returns
+        -------
+            seconds : float
+                Upper bound of the bucket of the percentile (never more than the max duration)
+        """
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * percentile / 100)
+        cumulative = 0
+        for bucket in sorted(self.buckets):
+            cumulative += self.buckets[bucket]
+            if cumulative >= rank:
+                return min(MIN_SECONDS * BUCKET_FACTOR ** (bucket + 1), self.seconds_max)
+        return self.seconds_max
+
+def init_instrumentation(dict_user_opts):
+    """Function that turns the instrumentation on or off for the run. It must be called once at startup
+
+    Parameters
+    ----------
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    """
+    global enabled, log_job_spans
+
+    enabled = dict_user_opts["instrumentation"]
+    log_job_spans = dict_user_opts["instrumentation_job_spans"]
+
+def record(name, seconds):
+    """Function that adds the duration of a stage to its histogram and to the spans of the current job
+
+    Parameters
+    ----------
+        name : str
+            Name of the stage. Example: "scrap_job"
+        seconds : float
+            Duration
+    """
+    if not enabled:
+        return
+
+    with histograms_lock:
+        if name not in histograms:
+            histograms[name] = Histogram()
+        histograms[name].add(seconds)
+
+    job_spans = current_job_spans.get()
+    if job_spans is not None:
+        count, seconds_total = job_spans.get(name, (0, 0.0))
+        job_spans[name] = (count + 1, seconds_total + seconds)
+
+@contextmanager
+def timed_span(name):
+    """Context manager that records the duration of its block"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+def span(name):
+    """Function that returns a context manager that records the duration of its block as a stage
+
+    Example:
+        with span("page_content"):
+            job_html = await page.content()
+
+    Parameters
+    ----------
+        name : str
+            Name of the stage
+    Returns
+    -------
+        span : context manager
+            It does nothing when the instrumentation is off
+    """
+    if not enabled:
+        return NULL_SPAN
+    return timed_span(name)
+
+def timed(name):
+    """Decorator that records the duration of each call of a function (or coroutine function) as a stage
+
+    Parameters
+    ----------
+        name : str
+            Name of the stage
+    """
+    def decorator(function):
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                if not enabled:
+                    return await function(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    record(name, time.perf_counter() - start)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+class JobSpans():
+    """Spans of the processing of one job: count and seconds of each stage by name, and the label of the job
+    in the log (its url, known after scraping it)"""
+    def __init__(self):
+        self.label = ""
+        self.spans = {}
+
+@contextmanager
+def job_spans(name="job_total"):
+    """Context manager that groups the spans of the processing of one job. When the block ends the total
+    duration of each stage of the job is logged, if instrumentation_job_spans is True
+
+    Example:
+        with job_spans() as spans:
+            job_inst = scrap_job(job_html)
+            spans.label = job_inst.url
+
+    Parameters
+    ----------
+        name : str
+            Name of the stage of the total duration of the job
+
+    Yields
+    ------
+        spans : JobSpans
+            Spans of the job
+    """
+    spans = JobSpans()
+    if not enabled:
+        yield spans
+        return
+
+    token = current_job_spans.set(spans.spans)
+    start = time.perf_counter()
+    try:
+        yield spans
+    finally:
+        current_job_spans.reset(token)
+        elapsed = time.perf_counter() - start
+        record(name, elapsed)
+        if log_job_spans:
+            spans_text = ", ".join(f"{name} {count}x {seconds_total * 1000:.0f} ms"
+                                   for name, (count, seconds_total) in spans.spans.items())
+            logger.info(f"Job spans {spans.label}: total {elapsed * 1000:.0f} ms, {spans_text}")
+
+def get_instrumentation_summary():
+    """Function that gets the statistics of the durations of each stage of the run
+
+    Returns
+    -------
+        dict_summary : dict
+            For each stage, dict with count, total, mean, p50, p95, p99 and max seconds
+    """
+    with histograms_lock:
+        return {name: {"count": histogram.count, "seconds_total": histogram.seconds_total,
+                       "seconds_mean": histogram.seconds_total / histogram.count,
+                       "p50": histogram.get_percentile(50), "p95": histogram.get_percentile(95),
+                       "p99": histogram.get_percentile(99), "seconds_max": histogram.seconds_max}
+                for name, histogram in histograms.items() if histogram.count}
+
+def log_instrumentation_summary():
+    """Function that logs the statistics of the durations of each stage of the run, the stage with the most
+    total time first"""
+    if not enabled:
+        return
+
+    dict_summary = get_instrumentation_summary()
+    logger.info("Time per stage (ms): count, total, mean, p50, p95, p99, max")
+    for name, stats in sorted(dict_summary.items(), key=lambda item: item[1]["seconds_total"], reverse=True):
+        logger.info(f"{name}: {stats['count']}, {stats['seconds_total'] * 1000:.0f}, {stats['seconds_mean'] * 1000:.1f}, "
+                    f"{stats['p50'] * 1000:.1f}, {stats['p95'] * 1000:.1f}, {stats['p99'] * 1000:.1f}, "
+                    f"{stats['seconds_max'] * 1000:.1f}")
@@ -3,6 +3,7 @@ class Job():
         self.search_position = None
         self.search_country = None
         self.url = None
+        self.linkedin_job_id = None
         self.position_name = None
         self.company = None
         self.country = None
@@ -13,7 +14,9 @@ class Job():
         self.experience = None
         self.description = None
         self.description_lang = None
+        self.content_hash = None
         self.posted_date = None
+        self.reposted = None
         self.apply = None
         self.email = None
         self.reason_not_apply = None
@@ -23,6 +26,7 @@ class Job():
         self.applied = None
         self.could_not_apply_due_to_questions = None
         self.manual_apply = None
+        self.near_duplicate_of = None
     
     def transform_to_dict(self):
         return self.__dict__
\ No newline at end of file
@@ -0,0 +1,138 @@
+import logging
+from modules import save_to_sqlite_db
+
+logger = logging.getLogger('job_search_index')
+
+def search_jobs_postgresql(query, dict_user_opts, list_tags=None, country=None, limit=20):
+    """Function that searches the job descriptions with the PostgreSQL full-text index (description_tsv).
+    The query uses the web search syntax: words are joined with AND, "or" for OR, - to exclude
+    and quotes for phrases
+
+    Parameters
+    ----------
+        query : str
+            Text to search. Example: dbt AND snowflake
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+        list_tags : list
+            Only jobs that have all these tags
+        country : str
+            Only jobs of this search country
+        limit : int
+            Max number of results
+    Returns
+    -------
+        list_results : list
+            List of dicts with the jobs, the best ranked first
+    """
+    from modules.postgresql_pool import get_postgresql_connection
+
+    name_postgre_table = dict_user_opts["name_postgre_table"]
+
+    # "AND" is a stop word for the web search syntax, the words are already joined with AND
+    sql = f"""SELECT id, position_name, company, search_country, posted_date, url,
+                     ts_rank(description_tsv, query) AS rank
+              FROM {name_postgre_table}, websearch_to_tsquery('english', %s) query
+              WHERE description_tsv @@ query"""
+    params = [query]
+    if list_tags:
+        sql += " AND list_tags @> %s::TEXT[]"
+        params.append(list(list_tags))
+    if country:
+        sql += " AND search_country = %s"
+        params.append(country)
+    sql += " ORDER BY rank DESC LIMIT %s"
+    params.append(limit)
+
+    with get_postgresql_connection() as connection:
+        with connection.cursor() as cur:
+            cur.execute(sql, params)
+            columns = [column.name for column in cur.description]
+            rows = cur.fetchall()
+        connection.rollback()
+
+    return [dict(zip(columns, row)) for row in rows]
+
+def search_jobs_sqlite(query, dict_user_opts, list_tags=None, country=None, limit=20):
+    """Function that searches the job descriptions with the SQLite FTS5 index. The query uses the FTS5
+    syntax: AND, OR, NOT, quotes for phrases and * for prefixes
+
+    Parameters
+    ----------
+        query : str
+            Text to search. Example: dbt AND snowflake
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+        list_tags : list
+            Only jobs that have all these tags
+        country : str
+            Only jobs of this search country
+        limit : int
+            Max number of results
+    Returns
+    -------
+        list_results : list
+            List of dicts with the jobs, the best ranked first
+    """
+    name_table = dict_user_opts["name_postgre_table"]
+    columns = "j.id, j.position_name, j.company, j.search_country, j.posted_date, j.url"
+
+    # bm25 gives lower values to better matches. It is computed for every match, so a query that matches
+    # most of the jobs (a common phrase) is slower than a selective one
+    if not list_tags and not country:
+        # Rank the matches in the FTS table and only read the jobs of the best ones
+        sql = f"""WITH matches AS (SELECT rowid, bm25({name_table}_fts) AS score FROM {name_table}_fts
+                                   WHERE {name_table}_fts MATCH ? ORDER BY score LIMIT ?)
+                  SELECT {columns}, -matches.score AS rank
+                  FROM matches JOIN {name_table} j ON j.rowid = matches.rowid
+                  ORDER BY matches.score"""
+        params = [query, limit]
+    else:
+        # The filters need the job of each match
+        sql = f"""SELECT {columns}, -bm25({name_table}_fts) AS rank
+                  FROM {name_table}_fts JOIN {name_table} j ON j.rowid = {name_table}_fts.rowid
+                  WHERE {name_table}_fts MATCH ?"""
+        params = [query]
+        for tag in list_tags or []:
+            sql += " AND EXISTS (SELECT 1 FROM json_each(j.list_tags) WHERE value = ?)"
+            params.append(tag)
+        if country:
+            sql += " AND j.search_country = ?"
+            params.append(country)
+        sql += " ORDER BY rank DESC LIMIT ?"
+        params.append(limit)
+
+    with save_to_sqlite_db.sqlite_lock:
+        cur = save_to_sqlite_db.sqlite_connection.execute(sql, params)
+        columns = [column[0] for column in cur.description]
+        rows = cur.fetchall()
+
+    return [dict(zip(columns, row)) for row in rows]
+
+def search_jobs(query, backend, dict_user_opts, list_tags=None, country=None, limit=20):
+    """Function that searches the stored job descriptions with the full-text index of the backend
+
+    Parameters
+    ----------
+        query : str
+            Text to search
+        backend : str
+            "postgresql" or "sqlite"
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+        list_tags : list
+            Only jobs that have all these tags
+        country : str
+            Only jobs of this search country
+        limit : int
+            Max number of results
+    Returns
+    -------
+        list_results : list
+            List of dicts with the jobs, the best ranked first
+    """
+    if backend == "postgresql":
+        return search_jobs_postgresql(query, dict_user_opts, list_tags, country, limit)
+    if backend == "sqlite":
+        return search_jobs_sqlite(query, dict_user_opts, list_tags, country, limit)
+    raise ValueError(f"Unknown backend: {backend}")
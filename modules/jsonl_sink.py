@@ -0,0 +1,274 @@
+import os, re, glob, gzip, json, logging
+from datetime import datetime
+
+logger = logging.getLogger('jsonl_sink')
+
+# Whitespace and commas between the objects of a json array
+JSON_ARRAY_SEPARATOR = re.compile(r"[\s,]*")
+
+def open_jsonl(path, mode):
+    """Function that opens a JSON Lines file, compressed with gzip if the path ends with .gz
+
+    Parameters
+    ----------
+        path : str
+            Path to the file
+        mode : str
+            "a" to append or "r" to read
+    Returns
+    -------
+        file : file object
+            Text file object
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+def get_jsonl_path(dict_user_opts):
+    """Function that gets the path of the file where the next jobs must be appended, applying the rotation
+    chosen in the configfile.ini. With rotation by date there is one file per day. With rotation by size the
+    current file is renamed with a timestamp when it is bigger than the max size
+
+    Parameters
+    ----------
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    Returns
+    -------
+        path : str
+            Path to the JSON Lines file
+    """
+    path = dict_user_opts["json_file_path"]
+    if dict_user_opts["json_file_compress"]:
+        path += ".gz"
+
+    root, extension = split_jsonl_extension(path)
+    rotate = dict_user_opts["json_file_rotate"]
+
+    if rotate == "date":
+        path = f"{root}.{datetime.now().strftime('%Y-%m-%d')}{extension}"
+
+    elif rotate == "size" and os.path.isfile(path):
+        if os.path.getsize(path) >= dict_user_opts["json_file_rotate_max_mb"] * 1024 * 1024:
+            rotated_path = f"{root}.{datetime.now().strftime('%Y-%m-%d_%H%M%S')}{extension}"
+            # Do not overwrite a file rotated in the same second
+            num = 1
+            while os.path.exists(rotated_path):
+                rotated_path = f"{root}.{datetime.now().strftime('%Y-%m-%d_%H%M%S')}_{num}{extension}"
+                num += 1
+            logger.info(f"Rotating {path} to {rotated_path}")
+            os.rename(path, rotated_path)
+
+    return path
+
+def split_jsonl_extension(path):
+    """Function that splits a path into the root and the .jsonl or .jsonl.gz extension
+
+    Parameters
+    ----------
+        path : str
+            Path to the file
+    Returns
+    -------
+        root : str
+            Path without the extension
+        extension : str
+            Extension of the file
+    """
+    for extension in [".jsonl.gz", ".jsonl"]:
+        if path.endswith(extension):
+            return path[:-len(extension)], extension
+    return os.path.splitext(path)
+
+def append_jobs_to_jsonl(list_jobs_instances, dict_user_opts):
+    """Function that appends the jobs to the JSON Lines file, one json object per line. Only the new jobs are
+    written, so the cost does not depend on the size of the file
+
+    Parameters
+    ----------
+        list_jobs_instances : list
+            List of job instances with the jobs information
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    """
+    logger.info("Saving to JSON Lines file")
+
+    path = get_jsonl_path(dict_user_opts)
+
+    lines = "".join(json.dumps(job.transform_to_dict(), ensure_ascii=False) + "\n" for job in list_jobs_instances)
+
+    # One write per batch. If the process dies in the middle only the last line can be incomplete
+    with open_jsonl(path, "a") as jsonl_file:
+        jsonl_file.write(lines)
+
+def get_jsonl_files(path):
+    """Function that gets the JSON Lines files of a path: the file itself and its rotated files, oldest first
+
+    Parameters
+    ----------
+        path : str
+            Path to the JSON Lines file, as in the configfile.ini (without .gz)
+    Returns
+    -------
+        list_paths : list
+            List of paths of the files
+    """
+    root, extension = split_jsonl_extension(path)
+    list_paths = glob.glob(f"{glob.escape(root)}.*{extension}") + glob.glob(f"{glob.escape(root)}.*{extension}.gz")
+
+    # The rotated files have a date in their name, so sorting them by name sorts them by date
+    list_paths = sorted(set(list_paths) - {path, path + ".gz"})
+    list_paths += [p for p in [path, path + ".gz"] if os.path.isfile(p)]
+
+    return list_paths
+
+def read_jobs_jsonl(path):
+    """Generator that reads the jobs from the JSON Lines file and its rotated files, one at a time.
+    Incomplete lines (for example the last line after a crash) are skipped
+
+    Parameters
+    ----------
+        path : str
+            Path to the JSON Lines file, as in the configfile.ini (without .gz)
+    Yields
+    ------
+        job_dict : dict
+            Dictionary with the information of a job
+    """
+    for file_path in get_jsonl_files(path):
+        with open_jsonl(file_path, "r") as jsonl_file:
+            for line_number, line in enumerate(jsonl_file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping invalid line {line_number} of {file_path}")
+
+def read_json_array(path, chunk_size=1024 * 1024):
+    """Generator that reads the objects of a file with a json array (the old ./data/linkedin_jobs.json)
+    without loading the whole file in memory
+
+    Parameters
+    ----------
+        path : str
+            Path to the json file
+        chunk_size : int
+            Number of characters read each time
+    Yields
+    ------
+        job_dict : dict
+            Dictionary with the information of a job
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+
+    with open(path, "r", encoding="utf-8") as json_file:
+        while True:
+            chunk = json_file.read(chunk_size)
+            buffer = buffer[position:] + chunk
+            position = 0
+
+            while True:
+                # Skip whitespace, commas and the brackets of the array
+                match = JSON_ARRAY_SEPARATOR.match(buffer, position)
+                position = match.end()
+                if not started and buffer[position:position + 1] == "[":
+                    started = True
+                    position += 1
+                    continue
+                if buffer[position:position + 1] == "]" or position >= len(buffer):
+                    break
+                try:
+                    job_dict, position = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    # The object is not complete, read the next chunk
+                    if not chunk:
+                        raise
+                    break
+                yield job_dict
+
+            if not chunk or buffer[position:position + 1] == "]":
+                return
+
+def write_jobs_dicts_to_jsonl(iterable_job_dicts, path):
+    """Function that writes dictionaries of jobs to a JSON Lines file, replacing it if it exists.
+    The file is written to a temporary file first, so the old file is kept if it fails
+
+    Parameters
+    ----------
+        iterable_job_dicts : iterable
+            Dictionaries with the information of the jobs
+        path : str
+            Path to the JSON Lines file (compressed if it ends with .gz)
+    Returns
+    -------
+        num_jobs : int
+            Number of jobs written
+    """
+    num_jobs = 0
+    tmp_path = path + ".tmp"
+    if path.endswith(".gz"):
+        tmp_file = gzip.open(tmp_path, "wt", encoding="utf-8")
+    else:
+        tmp_file = open(tmp_path, "w", encoding="utf-8")
+
+    with tmp_file:
+        for job_dict in iterable_job_dicts:
+            tmp_file.write(json.dumps(job_dict, ensure_ascii=False) + "\n")
+            num_jobs += 1
+
+    os.replace(tmp_path, path)
+
+    return num_jobs
+
+def migrate_json_array_to_jsonl(json_path, jsonl_path):
+    """Function that migrates the old json array file to a JSON Lines file
+
+    Parameters
+    ----------
+        json_path : str
+            Path to the json array file
+        jsonl_path : str
+            Path to the new JSON Lines file
+    Returns
+    -------
+        num_jobs : int
+            Number of jobs migrated
+    """
+    num_jobs = write_jobs_dicts_to_jsonl(read_json_array(json_path), jsonl_path)
+    logger.info(f"Migrated {num_jobs} jobs from {json_path} to {jsonl_path}")
+    return num_jobs
+
+def compact_jsonl(path, output_path):
+    """Function that merges the JSON Lines file and its rotated files into one file, removing the repeated
+    jobs (same url). The last saved version of each job is kept. Only the urls are kept in memory
+
+    Parameters
+    ----------
+        path : str
+            Path to the JSON Lines file, as in the configfile.ini (without .gz)
+        output_path : str
+            Path to the compacted file
+    Returns
+    -------
+        num_jobs : int
+            Number of jobs in the compacted file
+        num_removed : int
+            Number of repeated jobs removed
+    """
+    # First pass: position of the last version of each job
+    dict_last_position = {}
+    num_read = 0
+    for i, job_dict in enumerate(read_jobs_jsonl(path)):
+        dict_last_position[job_dict.get("url") or i] = i
+        num_read += 1
+    positions_to_keep = set(dict_last_position.values())
+
+    # Second pass: write only the last versions
+    iterable_job_dicts = (job_dict for i, job_dict in enumerate(read_jobs_jsonl(path)) if i in positions_to_keep)
+    num_jobs = write_jobs_dicts_to_jsonl(iterable_job_dicts, output_path)
+
+    return num_jobs, num_read - num_jobs
@@ -0,0 +1,174 @@
+import json, queue, uuid, atexit, logging, threading, contextvars
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from modules.metrics_export import register_collector
+
+logger = logging.getLogger('log_queue')
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Fields of the context of the crawl added to each record
+CONTEXT_FIELDS = ["position", "country", "page", "job_id"]
+
+# Fields of the context of the crawl of the current task (search position and country, results page and job)
+log_context = contextvars.ContextVar("log_context", default={})
+
+# Process-wide listener that writes the records of the queue to the file, started once with start_log_listener
+log_listener = None
+
+def set_log_context(**fields):
+    """Function that sets fields of the context of the crawl that are added to the records logged from the
+    current task (and the tasks it creates after this call). None removes a field
+
+    Example:
+        set_log_context(position="data engineer", country="Denmark")
+
+    Parameters
+    ----------
+        fields : str or int
+            Values of the fields of CONTEXT_FIELDS
+    """
+    dict_context = dict(log_context.get())
+    for field, value in fields.items():
+        if value is None:
+            dict_context.pop(field, None)
+        else:
+            dict_context[field] = value
+    log_context.set(dict_context)
+
+class LogContextFilter(logging.Filter):
+    """Filter that adds the run id and the context of the crawl to each record and counts the records by level
+    and logger. It runs in the thread that logs, so the context is the one of the task that logged"""
+    def __init__(self, run_id):
+        super().__init__()
+        self.run_id = run_id
+        self.lock = threading.Lock()
+
+        # Metrics
+        self.records_by_level = {}
+        self.records_by_logger = {}
+
+    def filter(self, record):
+        record.run_id = self.run_id
+        dict_context = log_context.get()
+        for field in CONTEXT_FIELDS:
+            setattr(record, field, dict_context.get(field))
+
+        with self.lock:
+            self.records_by_level[record.levelname] = self.records_by_level.get(record.levelname, 0) + 1
+            self.records_by_logger[record.name] = self.records_by_logger.get(record.name, 0) + 1
+        return True
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formatter that writes each record as one JSON object per line, with the time, level, logger, message,
+    run id and the fields of the context of the crawl that are set. The QueueHandler already added the
+    traceback of the exceptions to the message"""
+    def format(self, record):
+        dict_record = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "run_id": getattr(record, "run_id", None),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                dict_record[field] = value
+        return json.dumps(dict_record, ensure_ascii=False, default=str)
+
+class CountingRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that counts the bytes it writes, to measure the log volume of the run"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bytes_written = 0
+
+    def format(self, record):
+        text = super().format(record)
+        # The text and the new line
+        self.bytes_written += len(text.encode(self.encoding or "utf-8")) + 1
+        return text
+
+class LogListener():
+    """Writes the log records from a thread. The loggers only put the records in a queue (QueueHandler), so the
+    event loop does not wait for the file I/O. The file is rotated when it reaches log_max_mb, keeping
+    log_backup_count old files. With log_format = json each record is a JSON line with the run id and the
+    position, country, page and job id of the crawl
+    """
+    def __init__(self, dict_user_opts):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.queue = queue.SimpleQueue()
+
+        self.file_handler = CountingRotatingFileHandler(dict_user_opts["log_path"], encoding="utf-8",
+                                                        maxBytes=int(dict_user_opts["log_max_mb"] * 1024 ** 2),
+                                                        backupCount=dict_user_opts["log_backup_count"])
+        if dict_user_opts["log_format"] == "json":
+            self.file_handler.setFormatter(JsonLinesFormatter())
+        else:
+            self.file_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+        self.context_filter = LogContextFilter(self.run_id)
+        self.queue_handler = QueueHandler(self.queue)
+        self.queue_handler.addFilter(self.context_filter)
+        self.listener = QueueListener(self.queue, self.file_handler)
+        self.level = logging.getLevelName(dict_user_opts["log_level"].upper())
+
+    def start(self):
+        """Route the records of all the loggers to the queue and start the thread that writes them"""
+        root_logger = logging.getLogger()
+        root_logger.setLevel(self.level)
+        root_logger.addHandler(self.queue_handler)
+        self.listener.start()
+        logger.info(f"Run id: {self.run_id}")
+
+    def get_metric_samples(self):
+        """Function that gets the records by level and the bytes written for modules/metrics_export.py
+
+        Returns
+        -------
+            list_samples : list
+                Samples (name, labels, value)
+        """
+        with self.context_filter.lock:
+            list_samples = [("log_records_total", {"level": level}, count)
+                            for level, count in self.context_filter.records_by_level.items()]
+        list_samples.append(("log_bytes_total", {}, self.file_handler.bytes_written))
+        return list_samples
+
+    def close(self):
+        """Log the log volume of the run, write the records left in the queue and close the file"""
+        with self.context_filter.lock:
+            num_records = sum(self.context_filter.records_by_level.values())
+            list_top_loggers = sorted(self.context_filter.records_by_logger.items(), key=lambda item: item[1], reverse=True)[:5]
+        logger.info(f"Log volume: {num_records} records, {self.file_handler.bytes_written / 1024 ** 2:.2f} MB. "
+                    f"Top loggers: {dict(list_top_loggers)}")
+
+        logging.getLogger().removeHandler(self.queue_handler)
+        self.listener.stop()
+        self.file_handler.close()
+
+def start_log_listener(dict_user_opts):
+    """Function that starts the process-wide log listener. It must be called once at startup, before logging
+
+    Parameters
+    ----------
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    """
+    global log_listener
+
+    if log_listener is None:
+        log_listener = LogListener(dict_user_opts)
+        log_listener.start()
+        register_collector("log_queue", log_listener.get_metric_samples)
+        # The records of the queue are written even if the program ends without calling close_log_listener
+        atexit.register(close_log_listener)
+
+def close_log_listener():
+    """Function that writes the pending records and stops the process-wide log listener"""
+    global log_listener
+
+    if log_listener is None:
+        return
+
+    log_listener.close()
+    log_listener = None
@@ -1,8 +1,14 @@
 import asyncio, logging
 from playwright.async_api import async_playwright
 from modules.helper_functions import scrap_job, log_exceptions, check_easy_apply_button
-from modules.check_apply import check_apply_or_not
-from modules.easy_apply import easy_apply
+from modules.check_apply import check_apply_or_not, check_position_title
+from modules.analysis_executor import get_analysis_executor
+from modules.apply_queue import get_apply_queue
+from modules.near_duplicate_index import get_near_duplicate_index, get_simhash
+from modules.save_to_postgresql_db import get_job_id
+from modules.instrumentation import span, job_spans
+from modules.metrics_export import increment
+from modules.log_queue import set_log_context
 
 async def create_broswer_page(p, dict_user_opts):
     """Function that creates a broswer, context and page.
@@ -25,14 +31,16 @@ async def create_broswer_page(p, dict_user_opts):
     """
     # Create browser
     browser = await p.chromium.launch(headless=dict_user_opts["headless"])
+    increment("browser_launches_total", kind="crawl")
     
     # Create a context and load the cookies with the login info
-    context = await browser.new_context(storage_state="auth.json")
+    context = await browser.new_context(storage_state=dict_user_opts["auth_state_path"])
     
     # Enter to linkedin
     page = await context.new_page()
+    page.on("crash", lambda _: increment("browser_page_crashes_total", kind="crawl"))
     
-    await page.goto("https://www.linkedin.com/jobs/")
+    await page.goto(f"{dict_user_opts['linkedin_base_url']}/jobs/")
 
     return page, browser, context
 
@@ -173,12 +181,63 @@ async def search_job_offers(page, user_search_position, user_search_country, \
     
         return page
 
-async def scrap_apply_jobs_page(page, user_search_position, user_search_country, dict_user_opts, nlp):
-    """Function that performs the scrap decide if apply and apply actions to a job search results page
+def get_deadline_timeout(deadline_seconds, loop_deadline):
+    """Function that gets the seconds that a step can take: its own deadline, but never after the deadline of
+    the step that contains it
+
+    Parameters
+    ----------
+        deadline_seconds : float
+            Max seconds of the step. 0 means without deadline
+        loop_deadline : float or None
+            Loop time (asyncio loop.time()) when the containing step must be finished. None means without deadline
+    Returns
+    -------
+        timeout : float or None
+            Seconds for asyncio.wait_for, None without deadline. It can be 0 or less if the containing step is
+            already late
+    """
+    timeout = deadline_seconds or None
+    if loop_deadline is not None:
+        remaining = loop_deadline - asyncio.get_running_loop().time()
+        timeout = remaining if timeout is None else min(timeout, remaining)
+    return timeout
+
+async def reset_jobs_page(page):
+    """Function that leaves the results page ready for the next job after a job was cancelled: closes the
+    modal or dialog that was left open and moves the mouse back to the list of jobs. It never takes more than
+    a few seconds
+
+    Parameters
+    ----------
+        page : playwright object
+            playwright page
+    """
+    logger = logging.getLogger('scrap_apply_jobs_page')
+
+    async def reset():
+        await page.keyboard.press("Escape")
+        dismiss_button = page.get_by_role("button", name="Dismiss")
+        if await dismiss_button.count() != 0:
+            await dismiss_button.first.click(timeout=2000)
+        # The same position used to scroll the list
+        await page.mouse.move(x=100, y=300)
+
+    try:
+        await asyncio.wait_for(reset(), 10)
+    except Exception as e:
+        logger.info("Could not clean up the results page after the job deadline")
+        log_exceptions(e, logger)
+
+async def scrap_apply_job(page, job, user_search_position, user_search_country, dict_user_opts, nlp, job_state):
+    """Function that performs the scrap decide if apply and apply actions to one job of a search results page
+
     Parameters
     ----------
         page : playwright object
             playwright page
+        job : playwright object
+            Locator of the job in the list of results
         user_search_position : str
             Position to search for
         user_search_country : str
@@ -187,66 +246,206 @@ async def scrap_apply_jobs_page(page, user_search_position, user_search_country,
             Dictionary with the user options of search, save and apply
         nlp : spacy nlp model
             Spacy nlp model to be used
+        job_state : dict
+            Dict where the job instance is left as soon as it is scraped ("job_inst"), so the caller can save it
+            if the job is cancelled by its deadline
     Returns
     -------
-        list_jobs_instances : list
-            List of job instances with the jobs information
+        job_inst : instance or None
+            Instance of a job class with the job information, None if the job was skipped
     """
-    
-    list_jobs_instances = [] # List of job instances to save to the json (After scrapping one website page)
-    
     logger = logging.getLogger('scrap_apply_jobs_page')
 
-    await page.wait_for_timeout(3000)
-
-    # Locate the list of jobs results
-    for job in await page.locator("ul.scaffold-layout__list-container > li.ember-view").all():
+    set_log_context(job_id=None)
+    # Durations of the stages of the job
+    with job_spans() as spans:
         # Click on each job        
-        await job.click()
-
-        await page.wait_for_timeout(2000)
-        
+        with span("click_job_and_wait"):
+            await job.click()
+            await page.wait_for_timeout(2000)
+    
         # Get the html code of the job
-        job_html = await page.content()
-        
+        with span("page_content"):
+            job_html = await page.content()
+    
         # Scrap the job information
         try:
-            job_inst = scrap_job(job_html) # Get the job instance with the scrapped info
+            job_inst = scrap_job(job_html, dict_user_opts["linkedin_base_url"]) # Get the job instance with the scrapped info
         except:
             logger.warn("Skipping job due to problem while scraping the information")
-            continue
+            increment("jobs_scrape_errors_total")
+            return None
+        job_state["job_inst"] = job_inst
+        spans.label = job_inst.url
+        set_log_context(job_id=get_job_id(job_inst))
+        increment("jobs_scraped_total")
 
         # Add to the job instance the search_position and search_country
         job_inst.search_position = user_search_position
         job_inst.search_country = user_search_country
 
-        logger.info(f"Check if apply: {job_inst.position_name}, {job_inst.company}, {job_inst.url}")
-        # Check the description to decide if apply or not. Also get the email if must be applied sending email
-        # instead of EasyApply, and Reasons not to apply and job tags 
-        job_inst.apply, job_inst.email, job_inst.reason_not_apply, \
-        job_inst.list_tech_no_knowledge, job_inst.list_tags,  \
-        job_inst.description, job_inst.description_lang = check_apply_or_not(job_inst.description, job_inst.position_name, nlp)
+        # The analysis (translation and spaCy) is synchronous, so it runs in the thread of the analysis executor
+        # and the event loop keeps running
+        analysis_executor = get_analysis_executor()
+
+        # Look for an analyzed job with almost the same description (same job posted again with small changes).
+        # The job itself is skipped, a job seen again is analyzed again and replaces its decision in the index
+        near_duplicate_index = get_near_duplicate_index() if job_inst.description else None
+        near_duplicate = None
+        if near_duplicate_index:
+            with span("near_duplicate_lookup"):
+                fingerprint = get_simhash(job_inst.description)
+                near_duplicate = near_duplicate_index.find(fingerprint, get_job_id(job_inst))
+
+        if near_duplicate:
+            logger.info(f"Near duplicate ({near_duplicate['similarity']:.2f}) of {near_duplicate['url']}, reusing its decision: "
+                        f"{job_inst.position_name}, {job_inst.company}, {job_inst.url}")
+            decision = dict(near_duplicate["decision"])
+            # The jobs added to the index before the processed description was saved only have its language, that
+            # does not match the scraped description
+            if "description" not in decision:
+                decision.pop("description_lang", None)
+            for field, value in decision.items():
+                setattr(job_inst, field, value)
+            job_inst.near_duplicate_of = near_duplicate["job_id"]
+
+            # The title is not part of the fingerprint. A Senior job with the same description as a Junior one
+            # must not reuse its decision to apply
+            apply_title, reason_not_apply_title = await analysis_executor.run(check_position_title, job_inst.position_name, nlp)
+            if not apply_title:
+                job_inst.apply = False
+                if reason_not_apply_title not in job_inst.reason_not_apply:
+                    job_inst.reason_not_apply = job_inst.reason_not_apply + [reason_not_apply_title]
+
+            # Do not apply twice to the same job
+            if near_duplicate["applied"] and job_inst.apply:
+                job_inst.apply = False
+                job_inst.reason_not_apply = job_inst.reason_not_apply + ["Near Duplicate"]
+        else:
+            logger.info(f"Check if apply: {job_inst.position_name}, {job_inst.company}, {job_inst.url}")
+            # Check the description to decide if apply or not. Also get the email if must be applied sending email
+            # instead of EasyApply, and Reasons not to apply and job tags 
+            job_inst.apply, job_inst.email, job_inst.reason_not_apply, \
+            job_inst.list_tech_no_knowledge, job_inst.list_tags,  \
+            job_inst.description, job_inst.description_lang = await analysis_executor.run(check_apply_or_not, job_inst.description,
+                                                                                         job_inst.position_name, nlp)
+
+        increment("jobs_analyzed_total", decision="apply" if job_inst.apply else "skip",
+                  source="near_duplicate" if near_duplicate else "analysis")
+        for reason in job_inst.reason_not_apply:
+            increment("jobs_skipped_total", reason=reason)
 
         # Check if there is an Easy Apply Button
-        bool_easy_apply_button = await check_easy_apply_button(page)
+        with span("check_easy_apply_button"):
+            bool_easy_apply_button = await check_easy_apply_button(page)
         logger.info(f"EasyApply button: {bool_easy_apply_button}")
         if not bool_easy_apply_button and job_inst.apply:
             job_inst.manual_apply = True
 
-        # If it was decided to apply and there is not an email in the description (many require to send an email)
-        if job_inst.apply and not job_inst.email and dict_user_opts["apply_with_easy_apply"] and bool_easy_apply_button:
-            logger.info(f"Apply: {job_inst.position_name}, {job_inst.company}, {job_inst.url}")
-            job_inst = await easy_apply(page, job_inst, dict_user_opts)
-            logger.info(f"Applied: {job_inst.applied}")
-
         # Scroll with the mouse
         try:
             await page.mouse.move(x=100, y=300)
             await page.mouse.wheel(delta_x=0.0, delta_y=140.0)
-        except:
+        except Exception:
+            return None
+
+        # There is no await after this point, so a job cancelled by its deadline is never queued or indexed
+
+        # If it was decided to apply and there is not an email in the description (many require to send an email)
+        # add it to the apply queue. The Easy Apply worker applies it without stopping the scraping
+        if job_inst.apply and not job_inst.email and dict_user_opts["apply_with_easy_apply"] and bool_easy_apply_button:
+            if get_apply_queue().put(job_inst):
+                increment("jobs_queued_to_apply_total")
+                logger.info(f"Queued to apply: {job_inst.position_name}, {job_inst.company}, {job_inst.url}")
+
+        # Add the decision to the near duplicate index
+        if near_duplicate_index and not near_duplicate:
+            near_duplicate_index.add(get_job_id(job_inst), fingerprint, job_inst)
+
+        return job_inst
+
+async def scrap_apply_jobs_page(page, user_search_position, user_search_country, dict_user_opts, nlp):
+    """Function that performs the scrap decide if apply and apply actions to a job search results page
+    Parameters
+    ----------
+        page : playwright object
+            playwright page
+        user_search_position : str
+            Position to search for
+        user_search_country : str
+            Country to search for
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+        nlp : spacy nlp model
+            Spacy nlp model to be used
+    Returns
+    -------
+        list_jobs_instances : list
+            List of job instances with the jobs information
+    """
+    
+    list_jobs_instances = [] # List of job instances to save to the json (After scrapping one website page)
+    
+    logger = logging.getLogger('scrap_apply_jobs_page')
+
+    # Loop time when the page must be finished, None without page deadline
+    page_deadline = None
+    if dict_user_opts["page_deadline_seconds"]:
+        page_deadline = asyncio.get_running_loop().time() + dict_user_opts["page_deadline_seconds"]
+
+    await page.wait_for_timeout(3000)
+
+    # Locate the list of jobs results
+    for job in await page.locator("ul.scaffold-layout__list-container > li.ember-view").all():
+        # Each job must finish before job_deadline_seconds and before the page deadline. Otherwise it is cancelled,
+        # the page is cleaned up and the crawl continues with the next job
+        timeout = get_deadline_timeout(dict_user_opts["job_deadline_seconds"], page_deadline)
+        if timeout is not None and timeout <= 0:
+            logger.warning(f"Page deadline of {dict_user_opts['page_deadline_seconds']} s exceeded, skipping the rest of its jobs")
+            increment("deadlines_exceeded_total", deadline="page")
+            break
+
+        # A job cancelled by its deadline can leave its analysis running. The analyses run one at a time, so it
+        # is waited for before the deadline of this job starts (within the same time limit)
+        if not await get_analysis_executor().wait_idle(timeout):
+            logger.warning("The analysis of a cancelled job is still running, skipping the job")
+            increment("deadlines_exceeded_total", deadline="analysis")
             continue
+        timeout = get_deadline_timeout(dict_user_opts["job_deadline_seconds"], page_deadline)
+
+        job_state = {}
+        try:
+            job_inst = await asyncio.wait_for(scrap_apply_job(page, job, user_search_position, user_search_country,
+                                                              dict_user_opts, nlp, job_state), timeout)
+        except asyncio.TimeoutError:
+            await reset_jobs_page(page)
+
+            # Save the job if it was scraped, with the deadline as its reason not to apply
+            job_inst = job_state.get("job_inst")
+            if job_inst is not None:
+                job_inst.apply = False
+                job_inst.reason_not_apply = (job_inst.reason_not_apply or []) + ["Deadline Exceeded"]
+                list_jobs_instances.append(job_inst)
+
+            # The timeout was the job deadline or what was left of the page deadline
+            if timeout == dict_user_opts["job_deadline_seconds"]:
+                logger.warning(f"Job deadline of {timeout} s exceeded, skipping the job")
+                increment("deadlines_exceeded_total", deadline="job")
+                continue
+            logger.warning(f"Page deadline of {dict_user_opts['page_deadline_seconds']} s exceeded, skipping the rest of its jobs")
+            increment("deadlines_exceeded_total", deadline="page")
+            break
 
         # Append the job instance to a list
-        list_jobs_instances.append(job_inst)
+        if job_inst is not None:
+            list_jobs_instances.append(job_inst)
+
+    # The jobs of the page added to the near duplicate index and the apply queue are committed at once
+    if get_near_duplicate_index():
+        get_near_duplicate_index().commit()
+    if get_apply_queue():
+        get_apply_queue().commit()
+
+    increment("result_pages_scraped_total")
 
     return list_jobs_instances
\ No newline at end of file
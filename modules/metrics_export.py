@@ -0,0 +1,263 @@
+import os, logging, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from modules import instrumentation
+
+logger = logging.getLogger('metrics_export')
+
+# Prefix of the names of all the metrics
+PREFIX = "linkedin_"
+# Type and help of each metric, by name without the prefix
+METRICS = {
+    "jobs_scraped_total": ("counter", "Jobs whose detail was scraped"),
+    "jobs_scrape_errors_total": ("counter", "Jobs skipped because their detail could not be scraped"),
+    "jobs_analyzed_total": ("counter", "Jobs with a decision to apply or not, by decision and source of the decision"),
+    "jobs_skipped_total": ("counter", "Reasons not to apply of the analyzed jobs (a job can have several)"),
+    "jobs_queued_to_apply_total": ("counter", "Jobs added to the apply queue"),
+    "jobs_applied_total": ("counter", "Jobs of the apply queue processed by the Easy Apply workers, by status"),
+    "deadlines_exceeded_total": ("counter", "Deadlines exceeded, by deadline (job, page, apply_job or analysis, a job skipped while the analysis of a cancelled job runs). The job or the rest of the page is skipped"),
+    "result_pages_scraped_total": ("counter", "Result pages of the searches that were scraped"),
+    "browser_launches_total": ("counter", "Browsers and browser contexts launched. More than one per kind are restarts"),
+    "browser_page_crashes_total": ("counter", "Pages of the browser that crashed"),
+    "jobs_saved_total": ("counter", "Jobs saved by each sink"),
+    "jobs_dropped_total": ("counter", "Jobs that each sink lost (they could not be saved to the dead letter file either)"),
+    "jobs_dead_letter_total": ("counter", "Jobs that each sink could not save, saved to the dead letter file"),
+    "sink_errors_total": ("counter", "Errors of each sink, including the attempts that were retried"),
+    "sink_write_seconds_total": ("counter", "Time writing the batches of each sink"),
+    "sink_queue_depth": ("gauge", "Jobs waiting in the queue of each sink"),
+    "writer_wait_seconds_total": ("counter", "Time the crawl waited for space in the queues of the sinks"),
+    "apply_queue_pending": ("gauge", "Jobs of the apply queue still to apply"),
+    "apply_rate_limit_wait_seconds_total": ("counter", "Time the Easy Apply workers waited between two applications"),
+    "easy_apply_aborts_total": ("counter", "Easy Apply flows aborted, by the state where they were aborted"),
+    "analyses_total": ("counter", "Analyses (translation and spaCy) run by the analysis executor"),
+    "analyses_abandoned_total": ("counter", "Analyses that kept running after their job was cancelled by its deadline"),
+    "sentence_cache_hits_total": ("counter", "Lookups of the sentence cache that were found"),
+    "sentence_cache_misses_total": ("counter", "Lookups of the sentence cache that were computed"),
+    "sentence_cache_hit_ratio": ("gauge", "Hits / lookups of the sentence cache"),
+    "near_duplicate_lookups_total": ("counter", "Lookups of the near duplicate index"),
+    "near_duplicate_matches_total": ("counter", "Lookups of the near duplicate index that found a near duplicate"),
+    "postgresql_pool_requests_total": ("counter", "Connections taken from the PostgreSQL pool"),
+    "postgresql_pool_wait_seconds_total": ("counter", "Time waiting for a free connection of the PostgreSQL pool"),
+    "postgresql_reconnects_total": ("counter", "Broken PostgreSQL connections that were replaced"),
+    "log_records_total": ("counter", "Records logged, by level"),
+    "log_bytes_total": ("counter", "Bytes written to the log file"),
+    "stage_seconds": ("summary", "Duration of each stage of the run (needs instrumentation = True)"),
+}
+# Quantiles of the stage_seconds summary
+QUANTILES = [0.5, 0.95, 0.99]
+
+# Counters and gauges set by the modules, by (name, labels)
+counters = {}
+gauges = {}
+# Functions that return samples (name, labels, value) of the metrics that the modules already keep, by name
+collectors = {}
+metrics_lock = threading.Lock()
+
+# Process-wide exporter, started once at startup with init_metrics_export
+metrics_exporter = None
+
+def increment(name, value=1, **labels):
+    """Function that adds a value to a counter
+
+    Parameters
+    ----------
+        name : str
+            Name of the counter in METRICS. Example: "jobs_scraped_total"
+        value : float
+            Value to add
+        labels : str
+            Labels of the counter. Example: sink="sqlite"
+    """
+    key = (name, tuple(sorted(labels.items())))
+    with metrics_lock:
+        counters[key] = counters.get(key, 0) + value
+
+def set_gauge(name, value, **labels):
+    """Function that sets the value of a gauge
+
+    Parameters
+    ----------
+        name : str
+            Name of the gauge in METRICS. Example: "apply_queue_pending"
+        value : float
+            Current value
+        labels : str
+            Labels of the gauge
+    """
+    with metrics_lock:
+        gauges[(name, tuple(sorted(labels.items())))] = value
+
+def register_collector(name, get_samples):
+    """Function that registers a function that reads the metrics that a module already keeps. It is called
+    each time the metrics are exported, from the thread of the exporter, so it must only read values.
+    Registering again with the same name replaces the function
+
+    Parameters
+    ----------
+        name : str
+            Name of the collector. Example: "sinks"
+        get_samples : function
+            Function without parameters that returns a list of samples (name, labels dict, value)
+    """
+    with metrics_lock:
+        collectors[name] = get_samples
+
+def escape_label_value(value):
+    """Function that escapes the backslashes, quotes and new lines of the value of a label"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(labels):
+    """Function that formats the labels of a sample as {name="value",...}"""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in labels) + "}"
+
+def get_samples():
+    """Function that gets the samples of all the metrics, except stage_seconds
+
+    Returns
+    -------
+        dict_samples : dict
+            List of (labels, value) by name of the metric
+    """
+    with metrics_lock:
+        list_samples = [(name, labels, value) for (name, labels), value in list(counters.items()) + list(gauges.items())]
+        list_collectors = list(collectors.items())
+
+    for collector_name, get_collector_samples in list_collectors:
+        try:
+            list_samples += [(name, tuple(sorted(labels.items())), value) for name, labels, value in get_collector_samples()]
+        except Exception as e:
+            logger.warning(f"Metrics collector {collector_name} failed: {e!r}")
+
+    dict_samples = {}
+    for name, labels, value in list_samples:
+        dict_samples.setdefault(name, []).append((labels, value))
+    return dict_samples
+
+def render_metrics():
+    """Function that renders all the metrics in the Prometheus text format
+
+    Returns
+    -------
+        text : str
+            Metrics in the Prometheus text exposition format
+    """
+    dict_samples = get_samples()
+    list_lines = []
+
+    for name, list_name_samples in sorted(dict_samples.items()):
+        metric_type, help_text = METRICS.get(name, ("untyped", ""))
+        list_lines.append(f"# HELP {PREFIX}{name} {help_text}")
+        list_lines.append(f"# TYPE {PREFIX}{name} {metric_type}")
+        for labels, value in sorted(list_name_samples):
+            list_lines.append(f"{PREFIX}{name}{format_labels(labels)} {value}")
+
+    # Percentiles of the stages of the instrumentation
+    dict_summary = instrumentation.get_instrumentation_summary()
+    if dict_summary:
+        metric_type, help_text = METRICS["stage_seconds"]
+        list_lines.append(f"# HELP {PREFIX}stage_seconds {help_text}")
+        list_lines.append(f"# TYPE {PREFIX}stage_seconds {metric_type}")
+        for stage, stats in sorted(dict_summary.items()):
+            for quantile in QUANTILES:
+                labels = format_labels((("stage", stage), ("quantile", str(quantile))))
+                list_lines.append(f"{PREFIX}stage_seconds{labels} {stats[f'p{round(quantile * 100)}']}")
+            labels = format_labels((("stage", stage),))
+            list_lines.append(f"{PREFIX}stage_seconds_sum{labels} {stats['seconds_total']}")
+            list_lines.append(f"{PREFIX}stage_seconds_count{labels} {stats['count']}")
+
+    return "\n".join(list_lines) + "\n"
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Serves the metrics at /metrics"""
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        data = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+class MetricsExporter():
+    """Exports the metrics in the Prometheus text format from a thread, so a long unattended run can be watched
+    while it runs. With metrics_export = http they are served at http://127.0.0.1:<metrics_http_port>/metrics.
+    With metrics_export = textfile they are written to metrics_textfile_path every
+    metrics_textfile_interval_seconds (for the textfile collector of the Prometheus node exporter). The file is
+    replaced atomically, so it is never read half written
+    """
+    def __init__(self, dict_user_opts):
+        self.mode = dict_user_opts["metrics_export"]
+        self.port = dict_user_opts["metrics_http_port"]
+        self.textfile_path = dict_user_opts["metrics_textfile_path"]
+        self.textfile_interval = dict_user_opts["metrics_textfile_interval_seconds"]
+        self.server = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Start the HTTP server or the textfile writer in a thread"""
+        if self.mode == "http":
+            self.server = ThreadingHTTPServer(("127.0.0.1", self.port), MetricsRequestHandler)
+            self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-export", daemon=True)
+            logger.info(f"Metrics served at http://127.0.0.1:{self.server.server_address[1]}/metrics")
+        else:
+            self.thread = threading.Thread(target=self.run_textfile_writer, name="metrics-export", daemon=True)
+            logger.info(f"Metrics written to {self.textfile_path} every {self.textfile_interval} s")
+        self.thread.start()
+
+    def run_textfile_writer(self):
+        """Loop of the thread: write the textfile every textfile_interval seconds until it is closed"""
+        while not self.stop_event.wait(self.textfile_interval):
+            self.write_textfile()
+
+    def write_textfile(self):
+        """Write the metrics to a temporary file and rename it to the textfile"""
+        tmp_path = f"{self.textfile_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as textfile:
+                textfile.write(render_metrics())
+            os.replace(tmp_path, self.textfile_path)
+        except OSError as e:
+            logger.warning(f"Could not write the metrics to {self.textfile_path}: {e!r}")
+
+    def close(self):
+        """Stop the thread. The textfile is written a last time with the final values"""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        else:
+            self.stop_event.set()
+            self.thread.join()
+            self.write_textfile()
+
+def init_metrics_export(dict_user_opts):
+    """Function that starts the process-wide metrics exporter if metrics_export is http or textfile in the
+    configfile.ini. It must be called once at startup
+
+    Parameters
+    ----------
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    """
+    global metrics_exporter
+
+    if metrics_exporter is None and dict_user_opts["metrics_export"] in ["http", "textfile"]:
+        metrics_exporter = MetricsExporter(dict_user_opts)
+        metrics_exporter.start()
+
+def close_metrics_export():
+    """Function that stops the process-wide metrics exporter"""
+    global metrics_exporter
+
+    if metrics_exporter is None:
+        return
+
+    metrics_exporter.close()
+    metrics_exporter = None
@@ -0,0 +1,324 @@
+import re, json, math, random, sqlite3, hashlib, logging
+from array import array
+from datetime import datetime
+from modules.metrics_export import register_collector
+
+logger = logging.getLogger('near_duplicate_index')
+
+# Number of bits of the SimHash fingerprints
+FINGERPRINT_BITS = 64
+# Number of words of each shingle of the description
+SHINGLE_SIZE = 3
+# Number of bits of the keys of the tables of the index. Each table is keyed by one block of the fingerprint
+KEY_BITS = 16
+# Min probability of finding a near duplicate that differs in max_distance bits. The closer ones are found more often
+MIN_RECALL = 0.95
+# Fields of the job with the decision that is reused by its near duplicates. The description is the processed one
+# (translated and cleaned), so it is saved with its description_lang like the analyzed jobs
+DECISION_FIELDS = ["apply", "email", "reason_not_apply", "list_tech_no_knowledge", "list_tags", "description",
+                   "description_lang"]
+
+# Process-wide index, loaded once at startup with init_near_duplicate_index
+near_duplicate_index = None
+
+def get_shingles(description):
+    """Function that splits the description in shingles of SHINGLE_SIZE words. The text is normalized, so
+    changes of capital letters, punctuation or spaces do not change the shingles
+
+    Parameters
+    ----------
+        description : str
+            Description of the job
+    Returns
+    -------
+        shingles : set
+            Set of shingles of the description
+    """
+    words = re.findall(r"\w+", (description or "").lower())
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+def get_simhash(description):
+    """Function that calculates the SimHash fingerprint of the description. Similar descriptions have
+    fingerprints that differ in a few bits
+
+    Parameters
+    ----------
+        description : str
+            Description of the job
+    Returns
+    -------
+        fingerprint : int
+            Fingerprint of FINGERPRINT_BITS bits
+    """
+    weights = [0] * FINGERPRINT_BITS
+    for shingle in get_shingles(description):
+        shingle_hash = int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=FINGERPRINT_BITS // 8).digest(), "big")
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if shingle_hash >> bit & 1 else -1
+
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+def get_hamming_distance(fingerprint_1, fingerprint_2):
+    """Function that counts the bits that are different in two fingerprints
+
+    Parameters
+    ----------
+        fingerprint_1, fingerprint_2 : int
+            Fingerprints to compare
+    Returns
+    -------
+        distance : int
+            Number of different bits
+    """
+    return bin(fingerprint_1 ^ fingerprint_2).count("1")
+
+def to_sqlite_integer(fingerprint):
+    """Function that transforms a fingerprint to a signed 64 bits integer, the integer type of SQLite"""
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+class NearDuplicateIndex():
+    """Index of the SimHash fingerprints of the analyzed jobs, to find the jobs whose description is almost
+    the same as one that was already analyzed.
+
+    The similarity is the cosine similarity of the shingles of the descriptions. SimHash estimates it with
+    the number of different bits: the angle between the descriptions is the different bits / FINGERPRINT_BITS * pi.
+    Two jobs are near duplicates if their fingerprints differ in max_distance bits or less.
+
+    The fingerprint is split in blocks of KEY_BITS bits and each block is the key of a table of buckets. A lookup
+    reads the bucket of the block of the new job and the buckets of the keys that differ from it in one bit, so
+    the near duplicates with at most one different bit in a block are found, which are all the ones with less than
+    2 * blocks different bits. To find the ones that differ in more bits, the same tables are built with the bits of
+    the fingerprint in other (fixed random) orders, until a near duplicate at max_distance is found with a
+    probability of MIN_RECALL. Only the fingerprints of those buckets are compared, with KEY_BITS bits
+    there are few of them even with hundreds of thousands of jobs.
+    The fingerprints are kept in memory and persisted in a SQLite file, with the decision of each job.
+    """
+    def __init__(self, path, similarity):
+        self.max_distance = round(FINGERPRINT_BITS * math.acos(similarity) / math.pi)
+        self.num_blocks = FINGERPRINT_BITS // KEY_BITS
+        self.permutations = [None]
+        miss_probability = self.get_miss_probability(self.max_distance)
+        while miss_probability ** len(self.permutations) > 1 - MIN_RECALL:
+            self.permutations.append(self.create_permutation(len(self.permutations)))
+        self.buckets = [{} for _ in range(len(self.permutations) * self.num_blocks)]
+        self.fingerprints = []
+        self.job_ids = []
+        self.positions = {}
+
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("""
+        CREATE TABLE IF NOT EXISTS near_duplicates (
+            job_id TEXT PRIMARY KEY,
+            fingerprint INTEGER,
+            url TEXT,
+            decision TEXT,
+            applied INTEGER,
+            first_seen TEXT
+        )
+        """)
+
+        # Metrics
+        self.num_lookups = 0
+        self.num_matches = 0
+
+        for job_id, fingerprint in self.connection.execute("SELECT job_id, fingerprint FROM near_duplicates"):
+            self.add_fingerprint(job_id, fingerprint % (1 << 64))
+
+        logger.info(f"Near duplicate index loaded: {len(self.job_ids)} jobs, max distance {self.max_distance} bits, "
+                    f"{len(self.buckets)} tables")
+
+    def get_miss_probability(self, distance):
+        """Function that calculates the probability that the tables of one order of the bits do not find a near
+        duplicate that differs in distance bits, because all its blocks have 2 or more different bits"""
+        ways = [1] + [0] * distance
+        for _ in range(self.num_blocks):
+            ways = [sum(math.comb(KEY_BITS, bits) * ways[total - bits] for bits in range(2, min(KEY_BITS, total) + 1))
+                    for total in range(distance + 1)]
+        return ways[distance] / math.comb(FINGERPRINT_BITS, distance)
+
+    def create_permutation(self, seed):
+        """Function that creates a fixed random order of the bits of the fingerprint. It is applied with a
+        table for each KEY_BITS bits of the fingerprint, with the permuted bits of each of its values"""
+        bits = list(range(FINGERPRINT_BITS))
+        random.Random(seed).shuffle(bits)
+        permutation = []
+        for start in range(0, FINGERPRINT_BITS, KEY_BITS):
+            chunk_table = array("Q", [0]) * (1 << KEY_BITS)
+            for value in range(1, 1 << KEY_BITS):
+                lowest_bit = (value & -value).bit_length() - 1
+                chunk_table[value] = chunk_table[value & (value - 1)] | 1 << bits[start + lowest_bit]
+            permutation.append(chunk_table)
+        return permutation
+
+    def get_block_keys(self, fingerprint):
+        """Function that gets the key of each table: the blocks of the fingerprint in each order of the bits"""
+        mask = (1 << KEY_BITS) - 1
+        keys = []
+        for permutation in self.permutations:
+            if permutation is not None:
+                permuted = 0
+                for i, chunk_table in enumerate(permutation):
+                    permuted |= chunk_table[fingerprint >> (i * KEY_BITS) & mask]
+            else:
+                permuted = fingerprint
+            keys.extend(permuted >> (i * KEY_BITS) & mask for i in range(self.num_blocks))
+        return keys
+
+    def add_fingerprint(self, job_id, fingerprint):
+        """Function that adds a fingerprint to the buckets in memory. If the job is already in them, its
+        fingerprint is replaced"""
+        position = self.positions.get(job_id)
+        if position is None:
+            position = len(self.fingerprints)
+            self.fingerprints.append(fingerprint)
+            self.job_ids.append(job_id)
+            self.positions[job_id] = position
+        elif self.fingerprints[position] == fingerprint:
+            return
+        else:
+            for buckets, key in zip(self.buckets, self.get_block_keys(self.fingerprints[position])):
+                buckets[key].remove(position)
+            self.fingerprints[position] = fingerprint
+
+        for buckets, key in zip(self.buckets, self.get_block_keys(fingerprint)):
+            buckets.setdefault(key, []).append(position)
+
+    def find(self, fingerprint, job_id):
+        """Function that finds an analyzed job whose description is a near duplicate of the description
+        of a new job. The job itself is not a near duplicate: a job seen again is analyzed again
+
+        Parameters
+        ----------
+            fingerprint : int
+                SimHash fingerprint of the scraped description of the new job (see get_simhash)
+            job_id : str
+                Id of the new job
+        Returns
+        -------
+            match : dict or None
+                Dict with the job_id, url, similarity, applied and decision of the most similar job,
+                None if there is not a near duplicate
+        """
+        self.num_lookups += 1
+
+        best_position, best_distance = None, self.max_distance + 1
+        compared_positions = {self.positions.get(job_id)}
+        for buckets, key in zip(self.buckets, self.get_block_keys(fingerprint)):
+            for probe_key in [key] + [key ^ 1 << bit for bit in range(KEY_BITS)]:
+                for position in buckets.get(probe_key, []):
+                    if position in compared_positions:
+                        continue
+                    compared_positions.add(position)
+                    distance = get_hamming_distance(fingerprint, self.fingerprints[position])
+                    if distance < best_distance:
+                        best_position, best_distance = position, distance
+
+        if best_position is None:
+            return None
+
+        match_job_id = self.job_ids[best_position]
+        url, decision, applied = self.connection.execute(
+            "SELECT url, decision, applied FROM near_duplicates WHERE job_id = ?", (match_job_id,)).fetchone()
+        self.num_matches += 1
+
+        return {"job_id": match_job_id, "url": url, "similarity": math.cos(best_distance / FINGERPRINT_BITS * math.pi),
+                "applied": bool(applied), "decision": json.loads(decision)}
+
+    def add(self, job_id, fingerprint, job_inst):
+        """Function that adds an analyzed job to the index with its decision. A job that is already in the
+        index (seen again and analyzed again) gets the new fingerprint and decision, and keeps if it was applied.
+        It is not committed until commit is called (once per results page), the lookups of the same connection
+        already find it
+
+        Parameters
+        ----------
+            job_id : str
+                Id of the job
+            fingerprint : int
+                SimHash fingerprint of the scraped description of the job (see get_simhash)
+            job_inst : instance
+                Instance of a job class with the job information and the decision
+        """
+        decision = {field: getattr(job_inst, field, None) for field in DECISION_FIELDS}
+
+        self.connection.execute("""
+        INSERT INTO near_duplicates VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (job_id) DO UPDATE SET fingerprint = excluded.fingerprint, url = excluded.url,
+                                           decision = excluded.decision, applied = max(applied, excluded.applied)
+        """, (job_id, to_sqlite_integer(fingerprint), job_inst.url, json.dumps(decision, ensure_ascii=False),
+              int(bool(job_inst.applied)), datetime.now().isoformat(timespec="seconds")))
+
+        self.add_fingerprint(job_id, fingerprint)
+
+    def mark_applied(self, job_id):
+        """Function that records that a job of the index (or one of its near duplicates) was applied
+
+        Parameters
+        ----------
+            job_id : str
+                Id of the job of the index
+        """
+        with self.connection:
+            self.connection.execute("UPDATE near_duplicates SET applied = 1 WHERE job_id = ?", (job_id,))
+
+    def commit(self):
+        """Function that commits the jobs added since the last commit"""
+        self.connection.commit()
+
+    def close(self):
+        """Function that commits the jobs added, closes the SQLite file of the index and logs its metrics"""
+        logger.info(f"Near duplicate index: {self.num_matches} near duplicates in {self.num_lookups} jobs")
+        self.connection.commit()
+        self.connection.close()
+
+def init_near_duplicate_index(dict_user_opts):
+    """Function that loads the process-wide near duplicate index if it is enabled in the configfile.ini.
+    It must be called once at startup
+
+    Parameters
+    ----------
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    """
+    global near_duplicate_index
+
+    if near_duplicate_index is None and dict_user_opts["near_duplicate_detection"]:
+        near_duplicate_index = NearDuplicateIndex(dict_user_opts["near_duplicate_db_path"],
+                                                  dict_user_opts["near_duplicate_similarity"])
+
+def get_near_duplicate_index():
+    """Function that returns the process-wide near duplicate index
+
+    Returns
+    -------
+        near_duplicate_index : NearDuplicateIndex or None
+            The index, None if near duplicate detection is disabled
+    """
+    return near_duplicate_index
+
+def get_near_duplicate_metric_samples():
+    """Function that gets the lookups and matches of the process-wide index for modules/metrics_export.py
+
+    Returns
+    -------
+        list_samples : list
+            Samples (name, labels, value), empty if near duplicate detection is disabled
+    """
+    if near_duplicate_index is None:
+        return []
+    return [("near_duplicate_lookups_total", {}, near_duplicate_index.num_lookups),
+            ("near_duplicate_matches_total", {}, near_duplicate_index.num_matches)]
+
+register_collector("near_duplicate_index", get_near_duplicate_metric_samples)
+
+def close_near_duplicate_index():
+    """Function that closes the process-wide near duplicate index"""
+    global near_duplicate_index
+
+    if near_duplicate_index is None:
+        return
+
+    near_duplicate_index.close()
+    near_duplicate_index = None
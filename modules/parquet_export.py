@@ -0,0 +1,224 @@
+import os, uuid, logging
+from modules.save_to_postgresql_db import JOB_COLUMNS, get_job_row
+from modules.jsonl_sink import read_jobs_jsonl
+from modules.item import Job
+from modules.helper_functions import parse_posted_date
+
+logger = logging.getLogger('parquet_export')
+
+# Columns used to partition the Parquet dataset (one folder per value)
+PARQUET_PARTITION_COLUMNS = ["search_country", "posted_date"]
+
+def import_pyarrow():
+    """Function that imports pyarrow, that is only needed for the Parquet export
+
+    Returns
+    -------
+        pa : module
+            pyarrow module
+        pq : module
+            pyarrow.parquet module
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("The Parquet export needs pyarrow. Install it with: pip install pyarrow")
+    return pa, pq
+
+def get_parquet_schema():
+    """Function that creates the Parquet schema from the columns of the jobs table. Array columns
+    are kept as lists of strings
+
+    Returns
+    -------
+        schema : pyarrow schema
+            Schema of the Parquet dataset
+    """
+    pa, pq = import_pyarrow()
+
+    fields = []
+    for column, column_type in JOB_COLUMNS.items():
+        if column == "posted_date":
+            arrow_type = pa.date32()
+        elif column_type.endswith("[]"):
+            arrow_type = pa.list_(pa.string())
+        elif column_type.startswith("INTEGER"):
+            arrow_type = pa.int64()
+        elif column_type.startswith("BOOL"):
+            arrow_type = pa.bool_()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column, arrow_type))
+
+    return pa.schema(fields)
+
+def iter_chunks(iterable_job_dicts, chunk_size):
+    """Generator that groups the job dicts in lists of chunk_size elements
+
+    Parameters
+    ----------
+        iterable_job_dicts : iterable
+            Dictionaries with the information of the jobs
+        chunk_size : int
+            Number of jobs per chunk
+    Yields
+    ------
+        chunk : list
+            List of job dicts
+    """
+    chunk = []
+    for job_dict in iterable_job_dicts:
+        chunk.append(job_dict)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def iter_job_dicts_postgresql(dict_user_opts, chunk_size):
+    """Generator that reads the jobs from the PostgreSQL table with a server-side cursor, so only
+    chunk_size rows are in memory at the same time
+
+    Parameters
+    ----------
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+        chunk_size : int
+            Number of rows fetched from the server each time
+    Yields
+    ------
+        job_dict : dict
+            Dictionary with the information of a job
+    """
+    from modules.postgresql_pool import get_postgresql_connection
+
+    name_postgre_table = dict_user_opts["name_postgre_table"]
+    columns = list(JOB_COLUMNS)
+
+    with get_postgresql_connection() as connection:
+        with connection.cursor(name=f"parquet_export_{uuid.uuid4().hex}") as cur:
+            cur.itersize = chunk_size
+            cur.execute(f"SELECT {', '.join(columns)} FROM {name_postgre_table}")
+            for row in cur:
+                yield dict(zip(columns, row))
+        connection.rollback()
+
+def get_jsonl_job_dict(job_dict):
+    """Function that transforms a job of the JSON Lines file into a dict with the JOB_COLUMNS. The file has the
+    attributes of the Job class, without the id and content hash, so they are computed as in the database sinks
+
+    Parameters
+    ----------
+        job_dict : dict
+            Dictionary with the information of a job, as saved in the JSON Lines file
+    Returns
+    -------
+        job_dict : dict
+            Dictionary with the values of the JOB_COLUMNS
+    """
+    job_inst = Job()
+    for attribute, value in job_dict.items():
+        setattr(job_inst, attribute, value)
+    return dict(zip(JOB_COLUMNS, get_job_row(job_inst)))
+
+def job_dicts_to_table(list_job_dicts, schema):
+    """Function that transforms a list of job dicts into a pyarrow table
+
+    Parameters
+    ----------
+        list_job_dicts : list
+            List of dictionaries with the information of the jobs
+        schema : pyarrow schema
+            Schema of the Parquet dataset
+    Returns
+    -------
+        table : pyarrow table
+            Table with the jobs
+    """
+    pa, pq = import_pyarrow()
+
+    dict_columns = {name: [] for name in schema.names}
+    for job_dict in list_job_dicts:
+        for name in schema.names:
+            value = job_dict.get(name)
+            if name == "posted_date":
+                value = parse_posted_date(value)
+            elif name == "id" and value is not None:
+                value = value.strip()
+            dict_columns[name].append(value)
+
+    return pa.table(dict_columns, schema=schema)
+
+def write_parquet_chunks(iterable_chunks, output_dir):
+    """Function that writes chunks of jobs to a Parquet dataset partitioned by PARQUET_PARTITION_COLUMNS.
+    Each chunk is written as new files, so the memory used depends only on the chunk size
+
+    Parameters
+    ----------
+        iterable_chunks : iterable
+            Lists of job dicts
+        output_dir : str
+            Folder of the Parquet dataset
+    Returns
+    -------
+        num_jobs : int
+            Number of jobs written
+    """
+    pa, pq = import_pyarrow()
+
+    schema = get_parquet_schema()
+    os.makedirs(output_dir, exist_ok=True)
+
+    num_jobs = 0
+    for list_job_dicts in iterable_chunks:
+        table = job_dicts_to_table(list_job_dicts, schema)
+        pq.write_to_dataset(table, output_dir, partition_cols=PARQUET_PARTITION_COLUMNS,
+                            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+                            existing_data_behavior="overwrite_or_ignore")
+        num_jobs += len(list_job_dicts)
+        logger.info(f"Written {num_jobs} jobs to {output_dir}")
+
+    return num_jobs
+
+def export_jobs_to_parquet(source, output_dir, dict_user_opts, chunk_size=50000):
+    """Function that exports the saved jobs to a Parquet dataset, reading them in chunks
+
+    Parameters
+    ----------
+        source : str
+            "jsonl" to read the JSON Lines file or "postgresql" to read the PostgreSQL table
+        output_dir : str
+            Folder of the Parquet dataset
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+        chunk_size : int
+            Number of jobs in memory at the same time
+    Returns
+    -------
+        num_jobs : int
+            Number of jobs exported
+    """
+    if source == "jsonl":
+        iterable_job_dicts = map(get_jsonl_job_dict, read_jobs_jsonl(dict_user_opts["json_file_path"]))
+    elif source == "postgresql":
+        iterable_job_dicts = iter_job_dicts_postgresql(dict_user_opts, chunk_size)
+    else:
+        raise ValueError(f"Unknown source: {source}")
+
+    return write_parquet_chunks(iter_chunks(iterable_job_dicts, chunk_size), output_dir)
+
+def append_jobs_to_parquet(list_jobs_instances, dict_user_opts):
+    """Function that saves a batch of jobs to the Parquet dataset of the configfile.ini
+
+    Parameters
+    ----------
+        list_jobs_instances : list
+            List of job instances with the jobs information
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    """
+    logger.info("Saving to the Parquet dataset")
+
+    list_job_dicts = [dict(zip(JOB_COLUMNS, get_job_row(job))) for job in list_jobs_instances]
+    write_parquet_chunks([list_job_dicts], dict_user_opts["parquet_dir"])
@@ -0,0 +1,164 @@
+import logging
+from modules.postgresql_pool import get_postgresql_connection
+from modules.save_to_postgresql_db import JOB_COLUMNS, TRACKING_COLUMNS, get_snapshots_ddl
+from modules.skill_demand_aggregates import get_aggregates_ddl
+
+logger = logging.getLogger('postgresql_migrations')
+
+# Versioned migrations of the jobs table. Each one runs once in its own transaction and is recorded in the
+# schema_migrations table. {table} is replaced by the name of the jobs table. Never edit a migration that
+# was already released, add a new one with the next version instead.
+# Array columns use GIN indexes, so the queries must filter them with @> or && (not ANY) to use them.
+MIGRATIONS = [
+    (1, "create jobs table", """
+        CREATE TABLE IF NOT EXISTS {table} (
+            id CHAR(10) PRIMARY KEY,
+            search_position VARCHAR(255),
+            search_country VARCHAR(255),
+            url TEXT,
+            position_name VARCHAR(255),
+            company VARCHAR(255),
+            city VARCHAR(255),
+            country VARCHAR(255),
+            contract_type VARCHAR(255),
+            applicants INTEGER,
+            contract_time VARCHAR(255),
+            experience VARCHAR(255),
+            description TEXT,
+            description_lang VARCHAR(5),
+            posted_date DATE,
+            apply BOOL,
+            email TEXT [],
+            reason_not_apply TEXT [],
+            list_tech_no_knowledge TEXT [],
+            list_tags TEXT [],
+            easy_apply_questions TEXT [],
+            applied BOOL,
+            could_not_apply_due_to_questions BOOL,
+            manual_apply BOOL
+        );
+    """),
+    (2, "analytic indexes", """
+        CREATE INDEX IF NOT EXISTS {table}_posted_date_idx ON {table} (posted_date);
+        CREATE INDEX IF NOT EXISTS {table}_company_idx ON {table} (company);
+        CREATE INDEX IF NOT EXISTS {table}_search_country_idx ON {table} (search_country);
+        CREATE INDEX IF NOT EXISTS {table}_apply_idx ON {table} (apply);
+        CREATE INDEX IF NOT EXISTS {table}_list_tags_idx ON {table} USING GIN (list_tags);
+        CREATE INDEX IF NOT EXISTS {table}_reason_not_apply_idx ON {table} USING GIN (reason_not_apply);
+        CREATE INDEX IF NOT EXISTS {table}_list_tech_no_knowledge_idx ON {table} USING GIN (list_tech_no_knowledge);
+        ANALYZE {table};
+    """),
+    (3, "full-text search on description", """
+        ALTER TABLE {table} ADD COLUMN IF NOT EXISTS description_tsv tsvector
+            GENERATED ALWAYS AS (to_tsvector('english', coalesce(description, ''))) STORED;
+        CREATE INDEX IF NOT EXISTS {table}_description_tsv_idx ON {table} USING GIN (description_tsv);
+    """),
+    # Same DDL as the SQLite backend. The counters of the jobs saved before this migration are
+    # computed with: python linkedin_job_tools.py rebuild-aggregates
+    (4, "skill demand aggregates", get_aggregates_ddl("{table}")),
+    # The id changes from the hash of the description to the LinkedIn job id of the url. When a job was
+    # saved several times because its description changed, only its last version is re-keyed
+    (5, "stable job id and tracking", """
+        ALTER TABLE {table} ALTER COLUMN id TYPE VARCHAR(20);
+        ALTER TABLE {table}
+            ADD COLUMN IF NOT EXISTS content_hash CHAR(40),
+            ADD COLUMN IF NOT EXISTS reposted BOOL,
+            ADD COLUMN IF NOT EXISTS first_seen TIMESTAMP,
+            ADD COLUMN IF NOT EXISTS last_seen TIMESTAMP,
+            ADD COLUMN IF NOT EXISTS times_seen INTEGER,
+            ADD COLUMN IF NOT EXISTS repost_count INTEGER,
+            ADD COLUMN IF NOT EXISTS edit_count INTEGER;
+        UPDATE {table} SET content_hash = encode(sha1(convert_to(coalesce(description, ''), 'UTF8')), 'hex'),
+            first_seen = now(), last_seen = now(), times_seen = 1, repost_count = 0, edit_count = 0
+            WHERE times_seen IS NULL;
+        WITH linkedin_ids AS (
+            SELECT id, substring(url FROM '/jobs/view/(?:[^/]*-)?([0-9]+)(?:/|$)') AS linkedin_job_id FROM {table}
+        ), last_versions AS (
+            SELECT id, linkedin_job_id,
+                row_number() OVER (PARTITION BY linkedin_job_id ORDER BY posted_date DESC NULLS LAST, id) AS version
+            FROM linkedin_ids WHERE linkedin_job_id IS NOT NULL
+        )
+        UPDATE {table} SET id = last_versions.linkedin_job_id FROM last_versions
+            WHERE {table}.id = last_versions.id AND last_versions.version = 1
+            AND NOT EXISTS (SELECT 1 FROM {table} saved WHERE saved.id = last_versions.linkedin_job_id);
+    """ + get_snapshots_ddl("{table}")),
+]
+
+def get_table_columns(cur, name_postgre_table):
+    """Function that gets the names of the columns of a table
+
+    Parameters
+    ----------
+        cur : psycopg2 cursor
+            Cursor of the connection
+        name_postgre_table : str
+            Name of the table
+    Returns
+    -------
+        columns : set
+            Names of the columns of the table
+    """
+    cur.execute("""SELECT column_name FROM information_schema.columns
+                   WHERE table_schema = current_schema() AND table_name = %s""", (name_postgre_table,))
+    return {row[0] for row in cur.fetchall()}
+
+def add_missing_columns(cur, name_postgre_table):
+    """Function that adds to the jobs table the columns of JOB_COLUMNS and TRACKING_COLUMNS that it does not have yet
+
+    Parameters
+    ----------
+        cur : psycopg2 cursor
+            Cursor of the connection
+        name_postgre_table : str
+            Name of the jobs table
+    """
+    table_columns = get_table_columns(cur, name_postgre_table)
+
+    for column, column_type in {**JOB_COLUMNS, **TRACKING_COLUMNS}.items():
+        if column not in table_columns:
+            logger.info(f"Adding column {column} {column_type} to {name_postgre_table}")
+            cur.execute(f"ALTER TABLE {name_postgre_table} ADD COLUMN IF NOT EXISTS {column} {column_type}")
+
+def run_postgresql_migrations(dict_user_opts):
+    """Function that brings the jobs table to the last schema version. It runs once at startup:
+    applies the pending MIGRATIONS and then adds the columns of JOB_COLUMNS that are missing
+
+    Parameters
+    ----------
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    """
+    name_postgre_table = dict_user_opts["name_postgre_table"]
+
+    with get_postgresql_connection() as connection:
+        with connection.cursor() as cur:
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                table_name VARCHAR(255),
+                version INTEGER,
+                name VARCHAR(255),
+                applied_at TIMESTAMP DEFAULT now(),
+                PRIMARY KEY (table_name, version)
+            );
+            """)
+            connection.commit()
+
+            for version, name, sql in MIGRATIONS:
+                # Lock the table migrations so two processes starting at the same time do not run them twice
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (name_postgre_table,))
+                cur.execute("SELECT 1 FROM schema_migrations WHERE table_name = %s AND version = %s",
+                            (name_postgre_table, version))
+                if cur.fetchone():
+                    connection.commit()
+                    continue
+
+                logger.info(f"Applying migration {version} ({name}) to {name_postgre_table}")
+                cur.execute(sql.format(table=name_postgre_table))
+                cur.execute("INSERT INTO schema_migrations (table_name, version, name) VALUES (%s, %s, %s)",
+                            (name_postgre_table, version, name))
+                connection.commit()
+
+            # New columns declared in JOB_COLUMNS do not need a migration
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (name_postgre_table,))
+            add_missing_columns(cur, name_postgre_table)
+            connection.commit()
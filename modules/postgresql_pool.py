@@ -0,0 +1,187 @@
+import psycopg2, os, time, logging, threading
+from psycopg2 import pool
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from modules.metrics_export import register_collector
+
+load_dotenv()
+
+logger = logging.getLogger('postgresql_pool')
+
+# Process-wide pool, created once at startup with init_postgresql_pool
+postgresql_pool = None
+# Semaphore with one slot per connection of the pool, used to wait for a free connection
+pool_slots = None
+
+# Metrics of the pool. Times are in seconds
+pool_metrics = {
+    "connections_created": 0,
+    "connection_setup_seconds_total": 0.0,
+    "connection_setup_seconds_max": 0.0,
+    "pool_requests": 0,
+    "pool_wait_seconds_total": 0.0,
+    "pool_wait_seconds_max": 0.0,
+    "health_check_failures": 0,
+    "reconnects": 0,
+}
+metrics_lock = threading.Lock()
+# Lock so the pool is created once if several threads (the sinks) start at the same time
+pool_init_lock = threading.Lock()
+
+class TimedConnectionPool(pool.ThreadedConnectionPool):
+    """ThreadedConnectionPool that records the time spent opening new connections"""
+    def _connect(self, key=None):
+        start = time.perf_counter()
+        connection = super()._connect(key)
+        elapsed = time.perf_counter() - start
+
+        with metrics_lock:
+            pool_metrics["connections_created"] += 1
+            pool_metrics["connection_setup_seconds_total"] += elapsed
+            pool_metrics["connection_setup_seconds_max"] = max(pool_metrics["connection_setup_seconds_max"], elapsed)
+
+        return connection
+
+def init_postgresql_pool(dict_user_opts):
+    """Function that creates the process-wide PostgreSQL connection pool. It must be called once at startup
+
+    Parameters
+    ----------
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    """
+    with pool_init_lock:
+        if postgresql_pool is None:
+            create_postgresql_pool(dict_user_opts)
+
+def create_postgresql_pool(dict_user_opts):
+    """Function that creates the pool. Use init_postgresql_pool instead, that creates it only once
+
+    Parameters
+    ----------
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    """
+    global postgresql_pool, pool_slots
+
+    min_connections = dict_user_opts["postgresql_pool_min_connections"]
+    max_connections = dict_user_opts["postgresql_pool_max_connections"]
+
+    logger.info(f"Creating PostgreSQL connection pool ({min_connections}-{max_connections} connections)")
+
+    ## Connection details
+    postgresql_pool = TimedConnectionPool(min_connections, max_connections,
+                                          host=os.getenv("POSTGRESQL_HOSTNAME"),
+                                          user=os.getenv("POSTGRESQL_USERNAME"),
+                                          password=os.getenv("POSTGRESQL_PASSWORD"),
+                                          dbname=os.getenv("POSTGRESQL_DATABASE"))
+    pool_slots = threading.BoundedSemaphore(max_connections)
+
+def connection_is_healthy(connection):
+    """Function that checks if a connection of the pool can still be used
+
+    Parameters
+    ----------
+        connection : psycopg2 connection
+            Connection to check
+    Returns
+    -------
+        bool : bool
+            True if the connection answers a trivial query, False otherwise
+    """
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cur:
+            cur.execute("SELECT 1")
+        connection.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+@contextmanager
+def get_postgresql_connection():
+    """Context manager that borrows a healthy connection from the pool and gives it back at the end.
+    If the block raises, the transaction is rolled back. Broken connections are discarded and replaced
+
+    Yields
+    ------
+        connection : psycopg2 connection
+            Connection to the PostgreSQL database
+    """
+    if postgresql_pool is None:
+        raise RuntimeError("The PostgreSQL pool was not initialized. Call init_postgresql_pool at startup")
+
+    # Wait for a free connection and record how long it took
+    start = time.perf_counter()
+    pool_slots.acquire()
+    waited = time.perf_counter() - start
+
+    with metrics_lock:
+        pool_metrics["pool_requests"] += 1
+        pool_metrics["pool_wait_seconds_total"] += waited
+        pool_metrics["pool_wait_seconds_max"] = max(pool_metrics["pool_wait_seconds_max"], waited)
+
+    connection = None
+    try:
+        connection = postgresql_pool.getconn()
+
+        # Health check. If the server closed the connection open a new one
+        if not connection_is_healthy(connection):
+            logger.warning("Discarding broken PostgreSQL connection and reconnecting")
+            with metrics_lock:
+                pool_metrics["health_check_failures"] += 1
+                pool_metrics["reconnects"] += 1
+            postgresql_pool.putconn(connection, close=True)
+            connection = postgresql_pool.getconn()
+
+        try:
+            yield connection
+        except Exception:
+            if not connection.closed:
+                connection.rollback()
+            raise
+    finally:
+        if connection is not None:
+            postgresql_pool.putconn(connection, close=bool(connection.closed))
+        pool_slots.release()
+
+def get_pool_metrics():
+    """Function that returns a copy of the pool metrics
+
+    Returns
+    -------
+        metrics : dict
+            Connection setup and pool wait metrics
+    """
+    with metrics_lock:
+        return dict(pool_metrics)
+
+def get_pool_metric_samples():
+    """Function that gets the requests, wait time and reconnects of the pool for modules/metrics_export.py
+
+    Returns
+    -------
+        list_samples : list
+            Samples (name, labels, value), empty if the pool was not used
+    """
+    metrics = get_pool_metrics()
+    if not metrics["pool_requests"]:
+        return []
+    return [("postgresql_pool_requests_total", {}, metrics["pool_requests"]),
+            ("postgresql_pool_wait_seconds_total", {}, metrics["pool_wait_seconds_total"]),
+            ("postgresql_reconnects_total", {}, metrics["reconnects"])]
+
+register_collector("postgresql_pool", get_pool_metric_samples)
+
+def close_postgresql_pool():
+    """Function that closes all the connections of the pool and logs the pool metrics"""
+    global postgresql_pool, pool_slots
+
+    if postgresql_pool is None:
+        return
+
+    logger.info(f"PostgreSQL pool metrics: {get_pool_metrics()}")
+    postgresql_pool.closeall()
+    postgresql_pool = None
+    pool_slots = None
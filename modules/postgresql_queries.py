@@ -0,0 +1,54 @@
+import logging
+from modules.postgresql_pool import get_postgresql_connection
+
+logger = logging.getLogger('postgresql_queries')
+
+# Common dashboard queries. They filter the array columns with @> and && so the planner can use the
+# GIN indexes, and the scalar columns directly so it can use the B-tree indexes (see modules/postgresql_migrations.py)
+DASHBOARD_QUERIES = {
+    "jobs_with_tag_in_country": (
+        """SELECT id, position_name, company, posted_date FROM {table}
+           WHERE search_country = %s AND list_tags @> ARRAY[%s]::TEXT[]
+           ORDER BY posted_date DESC LIMIT 100""",
+        ("Denmark", "python")),
+    "rejections_by_reason": (
+        """SELECT id, position_name, company FROM {table}
+           WHERE reason_not_apply && ARRAY[%s]::TEXT[] AND posted_date >= current_date - 30""",
+        ("Language Requirement",)),
+    "unknown_technology": (
+        """SELECT id, position_name, company FROM {table}
+           WHERE list_tech_no_knowledge @> ARRAY[%s]::TEXT[]""",
+        ("java",)),
+    "jobs_of_company": (
+        """SELECT id, position_name, posted_date, apply FROM {table}
+           WHERE company = %s ORDER BY posted_date DESC""",
+        ("Company",)),
+    "jobs_to_apply_last_week": (
+        """SELECT id, position_name, company, url FROM {table}
+           WHERE apply AND posted_date >= current_date - 7""",
+        ()),
+}
+
+def explain_dashboard_queries(dict_user_opts):
+    """Function that gets the query plan of each one of the DASHBOARD_QUERIES
+
+    Parameters
+    ----------
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    Returns
+    -------
+        dict_plans : dict
+            Query plan (text) of each dashboard query
+    """
+    name_postgre_table = dict_user_opts["name_postgre_table"]
+    dict_plans = {}
+
+    with get_postgresql_connection() as connection:
+        with connection.cursor() as cur:
+            for name, (sql, params) in DASHBOARD_QUERIES.items():
+                cur.execute("EXPLAIN " + sql.format(table=name_postgre_table), params)
+                dict_plans[name] = "\n".join(row[0] for row in cur.fetchall())
+        connection.rollback()
+
+    return dict_plans
@@ -0,0 +1,208 @@
+import os, re, json, sqlite3, logging
+from datetime import datetime
+
+logger = logging.getLogger('questions_no_answer_store')
+
+# Max number of job urls saved as example of each question
+MAX_SAMPLE_JOB_URLS = 5
+
+# Connection to the store, opened once at startup with init_questions_store
+questions_store_connection = None
+
+def normalize_question(question):
+    """Function that normalizes the text of a question, so the same question with different spaces or
+    capital letters is counted once
+
+    Parameters
+    ----------
+        question : str
+            Text of the question
+    Returns
+    -------
+        normalized_question : str
+            Question in lowercase, without repeated spaces and without spaces at the start or end
+    """
+    return re.sub(r"\s+", " ", question).strip().lower()
+
+def connect_questions_store(path):
+    """Function that opens the store of questions without answer, creating the table if it does not exist
+
+    Parameters
+    ----------
+        path : str
+            Path to the SQLite file of the store
+    Returns
+    -------
+        connection : sqlite3 connection
+            Connection to the store
+    """
+    connection = sqlite3.connect(path)
+    connection.execute("""
+    CREATE TABLE IF NOT EXISTS questions_no_answer (
+        normalized_question TEXT PRIMARY KEY,
+        question TEXT,
+        count INTEGER,
+        first_seen TEXT,
+        last_seen TEXT,
+        sample_job_urls TEXT
+    )
+    """)
+    connection.execute("CREATE INDEX IF NOT EXISTS questions_no_answer_count_idx ON questions_no_answer (count)")
+    return connection
+
+def init_questions_store(dict_user_opts):
+    """Function that opens the store of questions without answer used by the Easy Apply. It must be called
+    once at startup
+
+    Parameters
+    ----------
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    """
+    global questions_store_connection
+
+    if questions_store_connection is None:
+        questions_store_connection = connect_questions_store(dict_user_opts["questions_no_answer_path"])
+
+def upsert_questions_no_answer(connection, list_questions_no_answer, job_url):
+    """Function that adds the questions of a job to the store, in one transaction
+
+    Parameters
+    ----------
+        connection : sqlite3 connection
+            Connection to the store
+        list_questions_no_answer : list
+            List of questions without answers
+        job_url : str
+            Url of the job that asked the questions
+    """
+    now = datetime.now().isoformat(timespec="seconds")
+
+    # Count each question once per job. Keep the text of the first time it appears
+    dict_questions = {}
+    for question in list_questions_no_answer:
+        dict_questions.setdefault(normalize_question(question), question)
+
+    with connection:
+        connection.executemany("""
+        INSERT INTO questions_no_answer VALUES (:normalized_question, :question, 1, :now, :now, :sample_job_urls)
+        ON CONFLICT (normalized_question) DO UPDATE SET
+            count = count + 1,
+            last_seen = excluded.last_seen,
+            sample_job_urls = CASE
+                WHEN :job_url IS NOT NULL
+                    AND json_array_length(sample_job_urls) < :max_sample_job_urls
+                    AND NOT EXISTS (SELECT 1 FROM json_each(sample_job_urls) WHERE value = :job_url)
+                THEN json_insert(sample_job_urls, '$[#]', :job_url)
+                ELSE sample_job_urls
+            END
+        """, [{"normalized_question": normalized_question, "question": question, "now": now,
+               "sample_job_urls": json.dumps([job_url] if job_url else []), "job_url": job_url,
+               "max_sample_job_urls": MAX_SAMPLE_JOB_URLS}
+              for normalized_question, question in dict_questions.items()])
+
+def save_job_questions_no_answer(list_questions_no_answer, job_url):
+    """Function to save the questions without answers. Each question is saved once with the number of times
+    it was found, when it was found the first and last time and some urls of the jobs that asked it.
+    It uses the connection opened by init_questions_store
+        
+    Parameters
+    ----------
+        list_questions_no_answer : list
+            List of questions without answers
+        job_url : str
+            Url of the job that asked the questions
+    """
+    if questions_store_connection is None:
+        raise RuntimeError("The store of questions without answer was not initialized. Call init_questions_store at startup")
+
+    upsert_questions_no_answer(questions_store_connection, list_questions_no_answer, job_url)
+
+def close_questions_store():
+    """Function that closes the store of questions without answer"""
+    global questions_store_connection
+
+    if questions_store_connection is None:
+        return
+
+    questions_store_connection.close()
+    questions_store_connection = None
+
+def get_questions_no_answer(path, limit=None):
+    """Function that gets the questions without answers, the most frequent first
+
+    Parameters
+    ----------
+        path : str
+            Path to the SQLite file of the store
+        limit : int
+            Max number of questions to get. All of them if None
+    Returns
+    -------
+        list_questions : list
+            List of dicts with the question, count, first_seen, last_seen and sample_job_urls
+    """
+    connection = connect_questions_store(path)
+    try:
+        rows = connection.execute("""
+        SELECT question, count, first_seen, last_seen, sample_job_urls FROM questions_no_answer
+        ORDER BY count DESC, last_seen DESC LIMIT ?
+        """, (-1 if limit is None else limit,)).fetchall()
+    finally:
+        connection.close()
+
+    return [{"question": question, "count": count, "first_seen": first_seen, "last_seen": last_seen,
+             "sample_job_urls": json.loads(sample_job_urls)}
+            for question, count, first_seen, last_seen, sample_job_urls in rows]
+
+def export_questions_no_answer(path, export_path):
+    """Function that exports the questions without answers to a json file, the most frequent first
+
+    Parameters
+    ----------
+        path : str
+            Path to the SQLite file of the store
+        export_path : str
+            Path to the json file
+    Returns
+    -------
+        num_questions : int
+            Number of questions exported
+    """
+    list_questions = get_questions_no_answer(path)
+    with open(export_path, 'w') as json_file:
+        json.dump(list_questions, json_file, indent=4)
+
+    return len(list_questions)
+
+def import_questions_no_answer_json(json_path, path):
+    """Function that imports the old ./data/questions_no_answer.json file (a list of questions with repeated
+    questions) to the store
+
+    Parameters
+    ----------
+        json_path : str
+            Path to the old json file
+        path : str
+            Path to the SQLite file of the store
+    Returns
+    -------
+        num_questions : int
+            Number of questions imported (with repetitions)
+    """
+    if not os.path.isfile(json_path):
+        return 0
+
+    with open(json_path, 'r') as json_file:
+        list_questions = json.load(json_file)
+
+    # Each question is saved as many times as it appears, to keep the counts
+    connection = connect_questions_store(path)
+    try:
+        for question in list_questions:
+            upsert_questions_no_answer(connection, [question], None)
+    finally:
+        connection.close()
+
+    logger.info(f"Imported {len(list_questions)} questions from {json_path}")
+    return len(list_questions)
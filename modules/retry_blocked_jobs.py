@@ -0,0 +1,165 @@
+import json, logging
+from modules.item import Job
+from modules.save_to_postgresql_db import JOB_COLUMNS
+from modules.answer_index import get_answer_index
+from modules.questions_no_answer_store import get_questions_no_answer, normalize_question
+
+logger = logging.getLogger('retry_blocked_jobs')
+
+def get_blocked_jobs(backend, dict_user_opts):
+    """Function that gets the saved jobs that could not be applied because of questions without answer
+
+    Parameters
+    ----------
+        backend : str
+            "postgresql" or "sqlite"
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    Returns
+    -------
+        list_jobs_instances : list
+            List of job instances of the blocked jobs
+    """
+    name_table = dict_user_opts["name_postgre_table"]
+    columns = list(JOB_COLUMNS)
+    sql = f"""SELECT {', '.join(columns)} FROM {name_table}
+              WHERE could_not_apply_due_to_questions = TRUE AND COALESCE(applied, FALSE) = FALSE"""
+
+    if backend == "postgresql":
+        from modules.postgresql_pool import get_postgresql_connection
+
+        with get_postgresql_connection() as connection:
+            with connection.cursor() as cur:
+                cur.execute(sql)
+                rows = cur.fetchall()
+            connection.rollback()
+    else:
+        from modules import save_to_sqlite_db
+
+        with save_to_sqlite_db.sqlite_lock:
+            rows = save_to_sqlite_db.sqlite_connection.execute(sql).fetchall()
+
+    list_jobs_instances = []
+    for row in rows:
+        job_inst = Job()
+        for (column, column_type), value in zip(JOB_COLUMNS.items(), row):
+            if column == "id":
+                continue
+            # SQLite saves the arrays as json text
+            if isinstance(value, str) and column_type.endswith("[]"):
+                value = json.loads(value)
+            setattr(job_inst, column, value)
+        list_jobs_instances.append(job_inst)
+
+    return list_jobs_instances
+
+def find_unblocked_jobs(list_jobs_instances, dict_user_opts):
+    """Function that checks the recorded Easy Apply questions of the blocked jobs against the current answers,
+    without a browser. A job is unblocked when all its questions have an answer now
+
+    Parameters
+    ----------
+        list_jobs_instances : list
+            List of job instances of the blocked jobs
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    Returns
+    -------
+        list_unblocked_jobs : list
+            List of job instances whose questions have all an answer
+        dict_unblocked_by_answer : dict
+            Number of jobs unblocked by each question of the answers file, counting only the questions
+            that were in the store of questions without answer
+    """
+    answer_index = get_answer_index(dict_user_opts)
+
+    # Questions that had no answer when the jobs were blocked
+    questions_no_answer = {normalize_question(question["question"])
+                           for question in get_questions_no_answer(dict_user_opts["questions_no_answer_path"])}
+
+    list_unblocked_jobs = []
+    dict_unblocked_by_answer = {}
+    for job_inst in list_jobs_instances:
+        # Jobs without the recorded questions can not be checked
+        if not job_inst.easy_apply_questions:
+            continue
+
+        matched_questions = set()
+        for question in job_inst.easy_apply_questions:
+            answer, confidence, matched_question = answer_index.get_answer(question, job_inst.search_country)
+            if answer is None:
+                break
+            if normalize_question(question) in questions_no_answer:
+                matched_questions.add(matched_question)
+        else:
+            list_unblocked_jobs.append(job_inst)
+            for matched_question in matched_questions:
+                dict_unblocked_by_answer[matched_question] = dict_unblocked_by_answer.get(matched_question, 0) + 1
+
+    logger.info(f"{len(list_unblocked_jobs)} of {len(list_jobs_instances)} blocked jobs can be applied now")
+
+    return list_unblocked_jobs, dict_unblocked_by_answer
+
+async def apply_unblocked_jobs(list_unblocked_jobs, dict_user_opts, num_workers):
+    """Function that applies the unblocked jobs with Easy Apply, with num_workers browser contexts in parallel.
+    The workers share the rate limit of the applications (apply_min_interval_seconds). The jobs are added
+    again to the apply queue and the results are saved to the enabled sinks
+
+    Parameters
+    ----------
+        list_unblocked_jobs : list
+            List of job instances to apply
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+        num_workers : int
+            Number of Easy Apply workers, each one with its own browser context
+    Returns
+    -------
+        metrics : dict
+            Sum of the metrics of the workers
+    """
+    from playwright.async_api import async_playwright
+    from modules.background_writer import BackgroundWriter
+    from modules.apply_queue import init_apply_queue, get_apply_queue, EasyApplyWorker, ApplyRateLimiter
+    from modules.easy_apply import log_easy_apply_metrics
+    from modules.instrumentation import init_instrumentation, log_instrumentation_summary
+    from modules.metrics_export import init_metrics_export, close_metrics_export
+    from modules.questions_no_answer_store import init_questions_store, close_questions_store
+
+    init_instrumentation(dict_user_opts)
+    init_metrics_export(dict_user_opts)
+    init_questions_store(dict_user_opts)
+    init_apply_queue(dict_user_opts)
+    list_job_ids = [get_apply_queue().requeue(job_inst) for job_inst in list_unblocked_jobs]
+
+    writer = BackgroundWriter(dict_user_opts)
+    writer.start()
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=dict_user_opts["headless"])
+        rate_limiter = ApplyRateLimiter(dict_user_opts["apply_min_interval_seconds"])
+        list_workers = [EasyApplyWorker(browser, writer, dict_user_opts, list_job_ids=list_job_ids, drain=True,
+                                        rate_limiter=rate_limiter)
+                        for _ in range(num_workers)]
+        try:
+            for worker in list_workers:
+                worker.start()
+            # The workers stop when all the jobs were applied
+            for worker in list_workers:
+                await worker.close()
+        finally:
+            # Save the results of the applications even if the browser can not be closed
+            try:
+                await browser.close()
+            finally:
+                await writer.close()
+            close_questions_store()
+            log_easy_apply_metrics()
+            log_instrumentation_summary()
+            close_metrics_export()
+
+    metrics = {}
+    for worker in list_workers:
+        for name, value in worker.metrics.items():
+            metrics[name] = metrics.get(name, 0) + value
+    return metrics
@@ -1,13 +1,166 @@
-import psycopg2, os, logging
-from dotenv import load_dotenv
+import logging
 import hashlib
-
-load_dotenv()
+from psycopg2.extras import execute_values
+from modules.postgresql_pool import get_postgresql_connection
+from modules.skill_demand_aggregates import update_aggregates
+from modules.helper_functions import get_linkedin_job_id
 
 logger = logging.getLogger('save_to_postgresql_db')
 
+# Columns of the jobs table and their types, in insert order. All but id and content_hash are attributes
+# of the Job class. To add a column add it here, the migrations step (modules/postgresql_migrations.py)
+# creates it at startup
+JOB_COLUMNS = {
+    "id": "VARCHAR(20) PRIMARY KEY",
+    "search_position": "VARCHAR(255)",
+    "search_country": "VARCHAR(255)",
+    "url": "TEXT",
+    "position_name": "VARCHAR(255)",
+    "company": "VARCHAR(255)",
+    "city": "VARCHAR(255)",
+    "country": "VARCHAR(255)",
+    "contract_type": "VARCHAR(255)",
+    "applicants": "INTEGER",
+    "contract_time": "VARCHAR(255)",
+    "experience": "VARCHAR(255)",
+    "description": "TEXT",
+    "description_lang": "VARCHAR(5)",
+    "content_hash": "CHAR(40)",
+    "posted_date": "DATE",
+    "reposted": "BOOL",
+    "apply": "BOOL",
+    "email": "TEXT []",
+    "reason_not_apply": "TEXT []",
+    "list_tech_no_knowledge": "TEXT []",
+    "list_tags": "TEXT []",
+    "easy_apply_questions": "TEXT []",
+    "applied": "BOOL",
+    "could_not_apply_due_to_questions": "BOOL",
+    "manual_apply": "BOOL",
+    "near_duplicate_of": "VARCHAR(20)",
+}
+
+# Columns with the history of each job, maintained by the upsert of the save functions
+TRACKING_COLUMNS = {
+    "first_seen": "TIMESTAMP",
+    "last_seen": "TIMESTAMP",
+    "times_seen": "INTEGER",
+    "repost_count": "INTEGER",
+    "edit_count": "INTEGER",
+}
+
+def get_job_id(job):
+    """Function that gets the unique id of the job. It is the LinkedIn job id of the url, so edits of the
+    description do not create a new job. Jobs without it use the first 10 characters of the content hash
+    
+    Parameters
+    ----------
+        job : instance
+            Instance of a job class with the job information
+    Returns
+    -------
+        unique_id : str
+            Id of the job
+    """
+    linkedin_job_id = getattr(job, "linkedin_job_id", None) or get_linkedin_job_id(job.url)
+    if linkedin_job_id:
+        return linkedin_job_id
+    return get_content_hash(job)[0:10]
+
+def get_content_hash(job):
+    """Function that gets the hash of the job description, used to detect edits of the job
+    
+    Parameters
+    ----------
+        job : instance
+            Instance of a job class with the job information
+    Returns
+    -------
+        content_hash : str
+            sha1 of the description in hexadecimal
+    """
+    return hashlib.sha1((job.description or "").encode()).hexdigest()
+
+def get_job_row(job):
+    """Function that transforms a job instance into a tuple with the values of the JOB_COLUMNS
+    
+    Parameters
+    ----------
+        job : instance
+            Instance of a job class with the job information
+    Returns
+    -------
+        row : tuple
+            Values of the job in the same order as JOB_COLUMNS
+    """
+    dict_values = {"id": get_job_id(job), "content_hash": get_content_hash(job)}
+    return tuple(dict_values[column] if column in dict_values else getattr(job, column, None) for column in JOB_COLUMNS)
+
+def get_upsert_set_clause(name_table):
+    """Function that creates the SET clause of the upsert of a job that is already saved, valid in PostgreSQL
+    and SQLite. It refreshes the applicants, the description and the last seen time and counts the times seen,
+    the result of the Easy Apply is kept unless the new save has one (the apply queue saves the job again after applying),
+    the reposts (a reposted job with a newer posted date) and the edits (a different content hash).
+    The posted date only changes when the job is reposted, because it is approximate and earlier
+    sightings are more precise
+
+    Parameters
+    ----------
+        name_table : str
+            Name of the jobs table
+    Returns
+    -------
+        set_clause : str
+            SET clause of the ON CONFLICT (id) DO UPDATE
+    """
+    is_repost = f"excluded.reposted AND excluded.posted_date > {name_table}.posted_date"
+    return f"""
+        applicants = excluded.applicants,
+        reposted = excluded.reposted,
+        posted_date = CASE WHEN {is_repost} THEN excluded.posted_date ELSE {name_table}.posted_date END,
+        repost_count = COALESCE({name_table}.repost_count, 0) + CASE WHEN {is_repost} THEN 1 ELSE 0 END,
+        edit_count = COALESCE({name_table}.edit_count, 0)
+            + CASE WHEN excluded.content_hash <> {name_table}.content_hash THEN 1 ELSE 0 END,
+        description = excluded.description,
+        description_lang = excluded.description_lang,
+        content_hash = excluded.content_hash,
+        last_seen = excluded.last_seen,
+        times_seen = COALESCE({name_table}.times_seen, 1) + 1,
+        applied = COALESCE(excluded.applied, {name_table}.applied),
+        could_not_apply_due_to_questions = COALESCE(excluded.could_not_apply_due_to_questions, {name_table}.could_not_apply_due_to_questions),
+        manual_apply = COALESCE(excluded.manual_apply, {name_table}.manual_apply),
+        easy_apply_questions = COALESCE(excluded.easy_apply_questions, {name_table}.easy_apply_questions)"""
+
+def get_snapshots_ddl(name_table):
+    """Function that creates the DDL of the snapshots table, valid in PostgreSQL and SQLite. It has one
+    row each time a job is saved, with the applicants, posted date and content hash seen at that time
+
+    Parameters
+    ----------
+        name_table : str
+            Name of the jobs table
+    Returns
+    -------
+        ddl : str
+            SQL statements that create the table and its index
+    """
+    return f"""
+        CREATE TABLE IF NOT EXISTS {name_table}_snapshots (
+            job_id VARCHAR(20),
+            seen_at TIMESTAMP,
+            applicants INTEGER,
+            posted_date DATE,
+            content_hash CHAR(40)
+        );
+        CREATE INDEX IF NOT EXISTS {name_table}_snapshots_job_id_idx ON {name_table}_snapshots (job_id, seen_at);
+    """
+
 def save_to_postgresql_db(list_jobs_instances, dict_user_opts):
-    """Function used to saved the data from the jobs to a PosgreSQL Database
+    """Function used to saved the data from the jobs to a PosgreSQL Database. All the jobs are written
+    in one transaction with a multi-row upsert. Jobs that are already in the database are updated
+    (see get_upsert_set_clause) and every saved job adds a row to the snapshots table.
+    The new jobs are added to the skill demand aggregates (see modules/skill_demand_aggregates.py).
+    It uses a connection of the process-wide pool (see modules/postgresql_pool.py)
     
     Parameters
     ----------
@@ -17,154 +170,61 @@ def save_to_postgresql_db(list_jobs_instances, dict_user_opts):
             Dictionary with the user options of search, save and apply 
     Returns
     -------
-        apply : bool
-            Boolean to apply or not according to language requirements
-        reason_not_apply : str
-            Reason not to apply if there is one
+        num_new_jobs : int
+            Number of jobs inserted in the database
+        num_updated_jobs : int
+            Number of jobs that were already in the database and were updated
     """
     
     logger.info("Saving to the PostgreSQL DB")
 
-    ## Connection details
-    POSTGRESQL_HOSTNAME = os.getenv("POSTGRESQL_HOSTNAME")
-    POSTGRESQL_USERNAME = os.getenv("POSTGRESQL_USERNAME")
-    POSTGRESQL_PASSWORD = os.getenv("POSTGRESQL_PASSWORD")
-    POSTGRESQL_DATABASE = os.getenv("POSTGRESQL_DATABASE")
+    if not list_jobs_instances:
+        return 0, 0
 
-    # Connect to database
-    connection = psycopg2.connect(host=POSTGRESQL_HOSTNAME, user=POSTGRESQL_USERNAME,
-                                  password=POSTGRESQL_PASSWORD, dbname=POSTGRESQL_DATABASE)
-    
-    # Create cursor
-    cur = connection.cursor()
-    
     name_postgre_table = dict_user_opts["name_postgre_table"]
+    page_size = dict_user_opts["postgresql_batch_page_size"]
 
-    # Create linkedin_jobs table if none exists
-    cur.execute(f"""
-    CREATE TABLE IF NOT EXISTS {name_postgre_table} (
-        id CHAR(10) PRIMARY KEY,
-        search_position VARCHAR(255),
-        search_country VARCHAR(255), 
-        url TEXT,
-        position_name VARCHAR(255),
-        company VARCHAR(255),
-        city VARCHAR(255),
-        country VARCHAR(255),
-        contract_type VARCHAR(255),
-        applicants INTEGER,
-        contract_time VARCHAR(255),
-        experience VARCHAR(255),
-        description TEXT,
-        description_lang VARCHAR(5),
-        posted_date DATE,
-        apply BOOL,
-        email TEXT [],
-        reason_not_apply TEXT [],
-        list_tech_no_knowledge TEXT [],
-        list_tags TEXT [],
-        easy_apply_questions TEXT [],
-        applied BOOL,
-        could_not_apply_due_to_questions BOOL,
-        manual_apply BOOL
-    );
-    """)
-
+    # Build the rows. Jobs repeated inside the batch are only sent once
+    dict_rows = {}
     for job in list_jobs_instances:
-        # Get unique id hassing the job description and shortening the hash
-        unique_id = hashlib.sha1(job.description.encode()).hexdigest()[0:10]
+        row = get_job_row(job)
+        dict_rows.setdefault(row[0], (job, row))
+    rows = [row for job, row in dict_rows.values()]
 
-        # Check if already in Database
-        cur.execute(
-            f"""SELECT * FROM {name_postgre_table} WHERE id = %s""", (unique_id,))
-        result = cur.fetchone()
+    with get_postgresql_connection() as connection:
+        with connection.cursor() as cur:
+            # Upsert all the rows. xmax is 0 for the inserted rows and the id of the transaction for the updated ones
+            placeholders = ", ".join(["%s"] * len(JOB_COLUMNS))
+            upserted_rows = execute_values(cur, f"""
+                INSERT INTO {name_postgre_table} ({", ".join(JOB_COLUMNS)}, {", ".join(TRACKING_COLUMNS)}) VALUES %s
+                ON CONFLICT (id) DO UPDATE SET {get_upsert_set_clause(name_postgre_table)}
+                RETURNING id, (xmax = 0) AS inserted""",
+                rows,
+                template=f"({placeholders}, now(), now(), 1, 0, 0)",
+                page_size=page_size,
+                fetch=True)
+            inserted_ids = {unique_id for unique_id, inserted in upserted_rows if inserted}
 
-        ## If it is in the Db then log but do not insert
-        if result:
-            logger.warn(f"Job already in database: {job.position_name}")
+            # History of the applicants and reposts
+            list_columns = list(JOB_COLUMNS)
+            execute_values(cur, f"""
+                INSERT INTO {name_postgre_table}_snapshots (job_id, seen_at, applicants, posted_date, content_hash)
+                VALUES %s""",
+                [tuple(row[list_columns.index(column)] for column in ["id", "applicants", "posted_date", "content_hash"])
+                 for row in rows],
+                template="(%s, now(), %s, %s, %s)",
+                page_size=page_size)
+
+            # Add the new jobs to the skill demand counters in the same transaction
+            update_aggregates(cur, name_postgre_table, "%s",
+                              [dict_rows[unique_id][0].transform_to_dict() for unique_id in inserted_ids])
         
-        else:
-            # Define insert statement
-            cur.execute(f"""INSERT INTO {name_postgre_table} (
-                id,
-                search_position,
-                search_country, 
-                url,
-                position_name,
-                company,
-                city,
-                country,
-                contract_type,
-                applicants,
-                contract_time,
-                experience,
-                description,
-                description_lang,
-                posted_date,
-                apply,
-                email,
-                reason_not_apply,
-                list_tech_no_knowledge,
-                list_tags,
-                easy_apply_questions,
-                applied,
-                could_not_apply_due_to_questions,
-                manual_apply
-                ) values (
-                    %s,
-                    %s,
-                    %s,
-                    %s,
-                    %s,
-                    %s,
-                    %s,
-                    %s,
-                    %s,
-                    %s,
-                    %s,
-                    %s,
-                    %s,
-                    %s,
-                    %s,
-                    %s,
-                    %s,
-                    %s,
-                    %s,
-                    %s,
-                    %s,    
-                    %s,
-                    %s,
-                    %s
-                    );""", (
-                unique_id,
-                job.search_position,
-                job.search_country,            
-                job.url,
-                job.position_name,
-                job.company,
-                job.city,
-                job.country,
-                job.contract_type,
-                job.applicants,
-                job.contract_time,
-                job.experience,
-                job.description,
-                job.description_lang,
-                job.posted_date,
-                job.apply,
-                job.email,
-                job.reason_not_apply,
-                job.list_tech_no_knowledge,
-                job.list_tags,
-                job.easy_apply_questions,
-                job.applied,
-                job.could_not_apply_due_to_questions,
-                job.manual_apply
-            ))
-
-            # Execute insert of data into database
-            connection.commit()
-    
-    # Close cursor and connection to database 
-    cur.close()
-    connection.close()
\ No newline at end of file
+        # Execute insert of data into database
+        connection.commit()
+
+    num_new_jobs = len(inserted_ids)
+    num_updated_jobs = len(dict_rows) - num_new_jobs
+
+    logger.info(f"Saved to the PostgreSQL DB. New jobs: {num_new_jobs}, updated jobs: {num_updated_jobs}")
+
+    return num_new_jobs, num_updated_jobs
@@ -0,0 +1,256 @@
+import json, sqlite3, hashlib, logging, threading
+from modules.save_to_postgresql_db import (JOB_COLUMNS, TRACKING_COLUMNS, get_job_row, get_upsert_set_clause,
+                                           get_snapshots_ddl)
+from modules.helper_functions import get_linkedin_job_id, parse_posted_date
+from modules.skill_demand_aggregates import get_aggregates_ddl, update_aggregates
+
+logger = logging.getLogger('save_to_sqlite_db')
+
+# Connection to the SQLite database, opened once at startup with init_sqlite_db. The lock serializes its
+# use between the event loop and the background writer thread
+sqlite_connection = None
+sqlite_lock = threading.Lock()
+
+def get_sqlite_column_type(column_type):
+    """Function that transforms the PostgreSQL type of a column of JOB_COLUMNS to a SQLite type.
+    Arrays are saved as json text, booleans as integers and dates as ISO text
+
+    Parameters
+    ----------
+        column_type : str
+            PostgreSQL type of the column
+    Returns
+    -------
+        sqlite_type : str
+            SQLite type of the column
+    """
+    sqlite_type = "INTEGER" if column_type.startswith(("BOOL", "INTEGER")) else "TEXT"
+    if "PRIMARY KEY" in column_type:
+        sqlite_type += " PRIMARY KEY"
+    return sqlite_type
+
+def init_sqlite_db(dict_user_opts):
+    """Function that opens the SQLite database in WAL mode and creates or updates the jobs table and its
+    indexes. It must be called once at startup
+
+    Parameters
+    ----------
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    """
+    global sqlite_connection
+
+    if sqlite_connection is not None:
+        return
+
+    path = dict_user_opts["sqlite_db_path"]
+    name_table = dict_user_opts["name_postgre_table"]
+
+    logger.info(f"Opening SQLite database {path}")
+
+    sqlite_connection = sqlite3.connect(path, check_same_thread=False, cached_statements=256)
+    # WAL lets readers work while the crawler writes. NORMAL is safe with WAL and avoids a fsync per commit
+    sqlite_connection.execute("PRAGMA journal_mode=WAL")
+    sqlite_connection.execute("PRAGMA synchronous=NORMAL")
+
+    with sqlite_lock, sqlite_connection:
+        columns = ",\n".join(f"{column} {get_sqlite_column_type(column_type)}"
+                             for column, column_type in {**JOB_COLUMNS, **TRACKING_COLUMNS}.items())
+        sqlite_connection.execute(f"CREATE TABLE IF NOT EXISTS {name_table} (\n{columns}\n)")
+
+        # Add the columns of JOB_COLUMNS and TRACKING_COLUMNS that the table does not have yet
+        table_columns = {row[1] for row in sqlite_connection.execute(f"PRAGMA table_info({name_table})")}
+        for column, column_type in {**JOB_COLUMNS, **TRACKING_COLUMNS}.items():
+            if column not in table_columns:
+                logger.info(f"Adding column {column} to {name_table}")
+                sqlite_connection.execute(f"ALTER TABLE {name_table} ADD COLUMN {column} "
+                                          f"{get_sqlite_column_type(column_type)}")
+        if "times_seen" not in table_columns:
+            rekey_sqlite_jobs(name_table)
+
+        for column in ["posted_date", "company", "search_country", "apply"]:
+            sqlite_connection.execute(f"CREATE INDEX IF NOT EXISTS {name_table}_{column}_idx ON {name_table} ({column})")
+
+        create_sqlite_fts(name_table)
+        sqlite_connection.executescript(get_aggregates_ddl(name_table))
+        sqlite_connection.executescript(get_snapshots_ddl(name_table))
+
+def rekey_sqlite_jobs(name_table):
+    """Function that changes the id of the jobs saved before the ids were LinkedIn job ids (the hash of the
+    description) to the LinkedIn job id of their url, and fills their content hash and tracking columns. When a job was saved
+    several times because its description changed, only its last version is re-keyed
+
+    Parameters
+    ----------
+        name_table : str
+            Name of the jobs table
+    """
+    sqlite_connection.execute(f"""UPDATE {name_table} SET first_seen = CURRENT_TIMESTAMP, last_seen = CURRENT_TIMESTAMP,
+                                  times_seen = 1, repost_count = 0, edit_count = 0 WHERE times_seen IS NULL""")
+
+    dict_new_ids = {}
+    list_hashes = []
+    rows = sqlite_connection.execute(f"SELECT id, url, description FROM {name_table} ORDER BY posted_date DESC, id")
+    for unique_id, url, description in rows.fetchall():
+        list_hashes.append((hashlib.sha1((description or "").encode()).hexdigest(), unique_id))
+        linkedin_job_id = get_linkedin_job_id(url)
+        if linkedin_job_id and linkedin_job_id != unique_id:
+            dict_new_ids.setdefault(linkedin_job_id, unique_id)
+
+    sqlite_connection.executemany(f"UPDATE {name_table} SET content_hash = ? WHERE id = ?", list_hashes)
+
+    saved_ids = select_saved_job_ids(list(dict_new_ids), name_table)
+    list_updates = [(new_id, old_id) for new_id, old_id in dict_new_ids.items() if new_id not in saved_ids]
+    sqlite_connection.executemany(f"UPDATE {name_table} SET id = ? WHERE id = ?", list_updates)
+    if list_updates:
+        logger.info(f"Changed the id of {len(list_updates)} jobs of {name_table} to the LinkedIn job id")
+
+def create_sqlite_fts(name_table):
+    """Function that creates the FTS5 full-text index of the job descriptions. The triggers keep it up
+    to date when jobs are inserted, updated or deleted
+
+    Parameters
+    ----------
+        name_table : str
+            Name of the jobs table
+    """
+    fts_exists = sqlite_connection.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (f"{name_table}_fts",)).fetchone()
+
+    sqlite_connection.executescript(f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {name_table}_fts USING fts5(
+        description, content='{name_table}', content_rowid='rowid', tokenize='porter unicode61'
+    );
+    CREATE TRIGGER IF NOT EXISTS {name_table}_fts_insert AFTER INSERT ON {name_table} BEGIN
+        INSERT INTO {name_table}_fts (rowid, description) VALUES (new.rowid, new.description);
+    END;
+    CREATE TRIGGER IF NOT EXISTS {name_table}_fts_delete AFTER DELETE ON {name_table} BEGIN
+        INSERT INTO {name_table}_fts ({name_table}_fts, rowid, description) VALUES ('delete', old.rowid, old.description);
+    END;
+    CREATE TRIGGER IF NOT EXISTS {name_table}_fts_update AFTER UPDATE OF description ON {name_table} BEGIN
+        INSERT INTO {name_table}_fts ({name_table}_fts, rowid, description) VALUES ('delete', old.rowid, old.description);
+        INSERT INTO {name_table}_fts (rowid, description) VALUES (new.rowid, new.description);
+    END;
+    """)
+
+    # Index the jobs that were saved before the index existed
+    if not fts_exists:
+        sqlite_connection.execute(f"INSERT INTO {name_table}_fts ({name_table}_fts) VALUES ('rebuild')")
+
+def get_sqlite_row(job):
+    """Function that transforms a job instance into a tuple with the values of the JOB_COLUMNS,
+    with the types used in SQLite
+
+    Parameters
+    ----------
+        job : instance
+            Instance of a job class with the job information
+    Returns
+    -------
+        row : tuple
+            Values of the job in the same order as JOB_COLUMNS
+    """
+    row = []
+    for (column, column_type), value in zip(JOB_COLUMNS.items(), get_job_row(job)):
+        if value is not None and column_type.endswith("[]"):
+            value = json.dumps(value, ensure_ascii=False)
+        elif column == "posted_date":
+            value = parse_posted_date(value)
+            value = value.isoformat() if value else None
+        row.append(value)
+    return tuple(row)
+
+def save_to_sqlite_db(list_jobs_instances, dict_user_opts):
+    """Function used to save the data from the jobs to the SQLite database. All the jobs are written in one
+    transaction with the same prepared statement. Jobs that are already in the database are updated
+    (see get_upsert_set_clause in modules/save_to_postgresql_db.py) and every saved job adds a row to the
+    snapshots table. The new jobs are added to the skill demand aggregates (see modules/skill_demand_aggregates.py)
+
+    Parameters
+    ----------
+        list_job_instances : list
+            List of job instances that have to be saved to the database
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    Returns
+    -------
+        num_new_jobs : int
+            Number of jobs inserted in the database
+        num_updated_jobs : int
+            Number of jobs that were already in the database and were updated
+    """
+    logger.info("Saving to the SQLite DB")
+
+    if sqlite_connection is None:
+        raise RuntimeError("The SQLite database was not initialized. Call init_sqlite_db at startup")
+
+    name_table = dict_user_opts["name_postgre_table"]
+
+    # Repeated jobs in the batch are saved once
+    dict_rows = {}
+    for job in list_jobs_instances:
+        row = get_sqlite_row(job)
+        dict_rows.setdefault(row[0], (job, row))
+    rows = [row for job, row in dict_rows.values()]
+    list_columns = list(JOB_COLUMNS)
+
+    with sqlite_lock, sqlite_connection:
+        saved_ids = select_saved_job_ids(list(dict_rows), name_table)
+
+        sqlite_connection.executemany(f"""
+            INSERT INTO {name_table} ({", ".join(JOB_COLUMNS)}, {", ".join(TRACKING_COLUMNS)})
+            VALUES ({", ".join("?" * len(JOB_COLUMNS))}, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, 1, 0, 0)
+            ON CONFLICT (id) DO UPDATE SET {get_upsert_set_clause(name_table)}""", rows)
+
+        # History of the applicants and reposts
+        sqlite_connection.executemany(f"""
+            INSERT INTO {name_table}_snapshots (job_id, seen_at, applicants, posted_date, content_hash)
+            VALUES (?, CURRENT_TIMESTAMP, ?, ?, ?)""",
+            [tuple(row[list_columns.index(column)] for column in ["id", "applicants", "posted_date", "content_hash"])
+             for row in rows])
+
+        # Add the new jobs to the skill demand counters in the same transaction
+        update_aggregates(sqlite_connection, name_table, "?",
+                          [job.transform_to_dict() for unique_id, (job, row) in dict_rows.items() if unique_id not in saved_ids])
+
+    num_updated_jobs = len(saved_ids)
+    num_new_jobs = len(dict_rows) - num_updated_jobs
+    logger.info(f"Saved to the SQLite DB. New jobs: {num_new_jobs}, updated jobs: {num_updated_jobs}")
+
+    return num_new_jobs, num_updated_jobs
+
+def select_saved_job_ids(list_ids, name_table):
+    """Function that checks which jobs are already saved in the SQLite database, using the primary key.
+    The caller must hold sqlite_lock
+
+    Parameters
+    ----------
+        list_ids : list
+            List of job ids to check
+        name_table : str
+            Name of the jobs table
+    Returns
+    -------
+        saved_ids : set
+            Ids of the list that are already saved
+    """
+    saved_ids = set()
+
+    # Check the ids in groups, SQLite has a max number of parameters per query
+    for i in range(0, len(list_ids), 500):
+        list_ids_group = list_ids[i:i + 500]
+        rows = sqlite_connection.execute(
+            f"SELECT id FROM {name_table} WHERE id IN ({', '.join('?' * len(list_ids_group))})", list_ids_group)
+        saved_ids.update(row[0] for row in rows)
+
+    return saved_ids
+
+def close_sqlite_db():
+    """Function that closes the SQLite database"""
+    global sqlite_connection
+
+    if sqlite_connection is None:
+        return
+
+    with sqlite_lock:
+        sqlite_connection.close()
+        sqlite_connection = None
@@ -0,0 +1,100 @@
+import re, logging, threading
+from collections import OrderedDict
+
+logger = logging.getLogger('sentence_cache')
+
+def normalize_sentence(sentence_text):
+    """Function that normalizes the text of a sentence, so the same sentence with different spaces or
+    capital letters uses the same cache entry
+
+    Parameters
+    ----------
+        sentence_text : str
+            Text of the sentence
+    Returns
+    -------
+        normalized_sentence : str
+            Sentence in lowercase, without repeated spaces and without spaces at the start or end
+    """
+    return re.sub(r"\s+", " ", sentence_text).strip().lower()
+
+class SentenceCache():
+    """Bounded LRU cache of the outcomes of the checks of a sentence (experience verdict, language requirement,
+    programming language alternatives). Much of the text of the descriptions is repeated boilerplate (company
+    intros, benefits, equal opportunity statements), so the sentences seen before skip the matcher and
+    similarity work. When it is full the least recently used outcome is removed. The analyses run in threads,
+    so the outcomes are read and changed with a lock
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.outcomes = OrderedDict()
+        self.lock = threading.Lock()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, check, sentence_text, compute, extra=""):
+        """Function that returns the cached outcome of a check of a sentence or computes and caches it
+
+        Parameters
+        ----------
+            check : str
+                Name of the check. Example: "experience"
+            sentence_text : str
+                Text of the sentence
+            compute : function
+                Function without parameters that computes the outcome if it is not cached
+            extra : str
+                Other text the outcome depends on. Example: the language entity of the sentence
+        Returns
+        -------
+            outcome : object
+                Outcome of the check
+        """
+        if self.max_size <= 0:
+            return compute()
+
+        key = (check, normalize_sentence(sentence_text), extra)
+        with self.lock:
+            if key in self.outcomes:
+                self.hits += 1
+                self.outcomes.move_to_end(key)
+                return self.outcomes[key]
+            self.misses += 1
+
+        # Computed without the lock, so the other threads are not blocked by the matcher and similarity work
+        outcome = compute()
+        with self.lock:
+            self.outcomes[key] = outcome
+            if len(self.outcomes) > self.max_size:
+                self.outcomes.popitem(last=False)
+
+        return outcome
+
+    def get_hit_rate(self):
+        """Function that gets the fraction of lookups that were found in the cache
+
+        Returns
+        -------
+            hit_rate : float
+                Hits / lookups, 0 if there were no lookups
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get_metric_samples(self):
+        """Function that gets the hits, misses and hit rate of the cache for modules/metrics_export.py
+
+        Returns
+        -------
+            list_samples : list
+                Samples (name, labels, value)
+        """
+        return [("sentence_cache_hits_total", {}, self.hits), ("sentence_cache_misses_total", {}, self.misses),
+                ("sentence_cache_hit_ratio", {}, self.get_hit_rate())]
+
+    def log_metrics(self):
+        """Function that logs the hits, misses and hit rate of the cache"""
+        logger.info(f"Sentence cache: {self.hits} hits, {self.misses} misses, hit rate {self.get_hit_rate():.1%}, "
+                    f"{len(self.outcomes)}/{self.max_size} sentences")
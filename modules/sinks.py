@@ -0,0 +1,404 @@
+import os, json, time, queue, logging, threading
+from datetime import datetime
+from modules.helper_functions import log_exceptions
+from modules.instrumentation import record
+from modules.item import Job
+
+logger = logging.getLogger('sinks')
+
+# Registry of the sinks: name -> Sink class. The name is the one used in the [sinks] section of configfile.ini
+SINK_REGISTRY = {}
+# Dispatchers that were started and not closed. Their threads are daemon threads, so they are closed with
+# close_sink_dispatchers before the connections of the sinks are closed
+open_dispatchers = []
+open_dispatchers_lock = threading.Lock()
+# Lock of the dead letter file, written by the threads of all the sinks
+dead_letter_lock = threading.Lock()
+
+def register_sink(name):
+    """Decorator that adds a Sink class to the SINK_REGISTRY
+
+    Parameters
+    ----------
+        name : str
+            Name of the sink
+    """
+    def decorator(sink_class):
+        sink_class.name = name
+        SINK_REGISTRY[name] = sink_class
+        return sink_class
+    return decorator
+
+class Sink():
+    """Destination where the jobs are saved. Each sink is used from its own thread by the SinkDispatcher:
+    open is called once, write_batch for each batch, flush when the batch is written and close at the end"""
+    name = None
+    # True if saving a job that was already saved updates it, False if it appends the job again
+    updates_jobs = False
+
+    def __init__(self, dict_user_opts):
+        self.dict_user_opts = dict_user_opts
+
+    def open(self):
+        """Prepare the sink (connections, tables, files)"""
+
+    def write_batch(self, list_jobs_instances):
+        """Save a batch of jobs
+
+        Parameters
+        ----------
+            list_jobs_instances : list
+                List of job instances with the jobs information
+        """
+        raise NotImplementedError
+
+    def flush(self):
+        """Persist what the sink could have buffered"""
+
+    def close(self):
+        """Release the resources of the sink"""
+
+@register_sink("json")
+class JsonlSink(Sink):
+    """Appends the jobs to the JSON Lines file (see modules/jsonl_sink.py)"""
+    def write_batch(self, list_jobs_instances):
+        from modules.jsonl_sink import append_jobs_to_jsonl
+        append_jobs_to_jsonl(list_jobs_instances, self.dict_user_opts)
+
+@register_sink("parquet")
+class ParquetSink(Sink):
+    """Writes the jobs to the partitioned Parquet dataset (see modules/parquet_export.py)"""
+    def write_batch(self, list_jobs_instances):
+        from modules.parquet_export import append_jobs_to_parquet
+        append_jobs_to_parquet(list_jobs_instances, self.dict_user_opts)
+
+@register_sink("postgresql")
+class PostgresqlSink(Sink):
+    """Saves the jobs to the PostgreSQL table with the process-wide pool (see modules/save_to_postgresql_db.py)"""
+    updates_jobs = True
+
+    def open(self):
+        from modules.postgresql_pool import init_postgresql_pool
+        from modules.postgresql_migrations import run_postgresql_migrations
+        init_postgresql_pool(self.dict_user_opts)
+        run_postgresql_migrations(self.dict_user_opts)
+
+    def write_batch(self, list_jobs_instances):
+        from modules.save_to_postgresql_db import save_to_postgresql_db
+        save_to_postgresql_db(list_jobs_instances, self.dict_user_opts)
+
+@register_sink("sqlite")
+class SqliteSink(Sink):
+    """Saves the jobs to the embedded SQLite database (see modules/save_to_sqlite_db.py)"""
+    updates_jobs = True
+
+    def open(self):
+        from modules.save_to_sqlite_db import init_sqlite_db
+        init_sqlite_db(self.dict_user_opts)
+
+    def write_batch(self, list_jobs_instances):
+        from modules.save_to_sqlite_db import save_to_sqlite_db
+        save_to_sqlite_db(list_jobs_instances, self.dict_user_opts)
+
+def get_enabled_sink_names(dict_user_opts):
+    """Function that gets the names of the sinks enabled in the [options] section of configfile.ini
+
+    Parameters
+    ----------
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    Returns
+    -------
+        list_sink_names : list
+            Names of the enabled sinks
+    """
+    dict_options = {"json": "save_to_json_file", "parquet": "save_to_parquet",
+                    "postgresql": "save_to_postgresql_db", "sqlite": "save_to_sqlite_db"}
+    return [name for name, option in dict_options.items() if dict_user_opts[option]]
+
+def append_to_dead_letter(path, sink_name, list_jobs_instances, error):
+    """Function that saves the jobs that a sink could not save to the dead letter file (JSON Lines), so they
+    can be saved again with: python linkedin_job_tools.py replay-dead-letter
+
+    Parameters
+    ----------
+        path : str
+            Path to the dead letter file
+        sink_name : str
+            Name of the sink that could not save the jobs
+        list_jobs_instances : list
+            List of job instances
+        error : str
+            Error of the sink
+    """
+    failed_at = datetime.now().isoformat(timespec="seconds")
+    with dead_letter_lock, open(path, "a", encoding="utf-8") as dead_letter_file:
+        for job_inst in list_jobs_instances:
+            dead_letter_file.write(json.dumps({"sink": sink_name, "failed_at": failed_at, "error": error,
+                                               "job": job_inst.transform_to_dict()},
+                                              ensure_ascii=False, default=str) + "\n")
+    logger.error(f"Saved {len(list_jobs_instances)} jobs that the sink {sink_name} could not save to {path}")
+
+def replay_dead_letter(dict_user_opts):
+    """Function that saves again the jobs of the dead letter file to the sink that could not save them. The
+    jobs that fail again are left in the file
+
+    Parameters
+    ----------
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+    Returns
+    -------
+        dict_saved : dict
+            Number of jobs saved per sink name
+    """
+    path = dict_user_opts["sink_dead_letter_path"]
+    if not os.path.isfile(path):
+        return {}
+
+    # The file is moved, the jobs that fail again are added to a new one
+    replay_path = path + ".replaying"
+    os.replace(path, replay_path)
+
+    dict_jobs = {}
+    with open(replay_path, encoding="utf-8") as dead_letter_file:
+        for line in dead_letter_file:
+            if not line.strip():
+                continue
+            dict_line = json.loads(line)
+            job_inst = Job()
+            for attribute, value in dict_line["job"].items():
+                setattr(job_inst, attribute, value)
+            dict_jobs.setdefault(dict_line["sink"], []).append(job_inst)
+
+    dict_saved = {}
+    for sink_name, list_jobs_instances in dict_jobs.items():
+        sink = SINK_REGISTRY[sink_name](dict_user_opts)
+        try:
+            sink.open()
+            try:
+                sink.write_batch(list_jobs_instances)
+                sink.flush()
+            finally:
+                sink.close()
+            dict_saved[sink_name] = len(list_jobs_instances)
+        except Exception as e:
+            log_exceptions(e, logger)
+            append_to_dead_letter(path, sink_name, list_jobs_instances, repr(e))
+            dict_saved[sink_name] = 0
+
+    os.remove(replay_path)
+    return dict_saved
+
+class SinkWorker():
+    """Thread that writes the jobs of its queue to one sink, in batches of batch_size jobs or every
+    flush_seconds. Opening the sink and writing a batch are retried retries times, waiting retry_backoff_seconds
+    and then twice as long each time. The batches that still fail are saved to the dead letter file and the
+    worker continues"""
+    def __init__(self, sink, batch_size, flush_seconds, queue_size, retries, retry_backoff_seconds, dead_letter_path):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.retries = retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.dead_letter_path = dead_letter_path
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = threading.Thread(target=self.run_worker, name=f"sink-{sink.name}", daemon=True)
+        self.opened = False
+        self.open_error = None
+
+        # Metrics
+        self.metrics = {"jobs_written": 0, "batches_written": 0, "errors": 0, "retries": 0, "jobs_dropped": 0,
+                        "jobs_dead_letter": 0, "write_seconds_total": 0.0, "write_seconds_max": 0.0}
+
+    def run_with_retries(self, function, action):
+        """Function that calls a function of the sink, retrying it with exponential backoff when it fails
+
+        Parameters
+        ----------
+            function : function
+                Function without parameters. Example: self.sink.open
+            action : str
+                Description of the action for the logs. Example: "open"
+        Returns
+        -------
+            error : str or None
+                Last error, None if it succeeded
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                function()
+                return None
+            except Exception as e:
+                self.metrics["errors"] += 1
+                error = repr(e)
+                if attempt == self.retries:
+                    logger.error(f"Sink {self.sink.name} could not {action} after {attempt + 1} attempts: {error}")
+                    log_exceptions(e, logger)
+                    return error
+                wait_seconds = self.retry_backoff_seconds * 2 ** attempt
+                logger.warning(f"Sink {self.sink.name} could not {action}: {error}. Retrying in {wait_seconds:.1f} s")
+                self.metrics["retries"] += 1
+                time.sleep(wait_seconds)
+
+    def run_worker(self):
+        """Loop of the thread: open the sink, write the batches and close the sink when None is received"""
+        self.open_error = self.run_with_retries(self.sink.open, "open")
+        self.opened = self.open_error is None
+        if not self.opened:
+            logger.error(f"Sink {self.sink.name} is not available. Its jobs are saved to {self.dead_letter_path}")
+
+        batch = []
+        flush_deadline = None
+
+        while True:
+            timeout = None if not batch else max(0, flush_deadline - time.monotonic())
+            try:
+                job_inst = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                self.write_batch(batch)
+                batch = []
+                continue
+
+            if job_inst is None:
+                self.write_batch(batch)
+                break
+
+            if not batch:
+                flush_deadline = time.monotonic() + self.flush_seconds
+            batch.append(job_inst)
+
+            if len(batch) >= self.batch_size:
+                self.write_batch(batch)
+                batch = []
+
+        if self.opened:
+            try:
+                self.sink.close()
+            except Exception as e:
+                log_exceptions(e, logger)
+
+    def write_dead_letter(self, batch, error):
+        """Save a batch that could not be written to the dead letter file"""
+        try:
+            append_to_dead_letter(self.dead_letter_path, self.sink.name, batch, error)
+            self.metrics["jobs_dead_letter"] += len(batch)
+        except Exception as e:
+            logger.error(f"Sink {self.sink.name} lost {len(batch)} jobs: {[job.url for job in batch]}")
+            log_exceptions(e, logger)
+            self.metrics["jobs_dropped"] += len(batch)
+
+    def write_batch(self, batch):
+        """Write a batch to the sink and record its latency. A batch that can not be written is retried and then
+        saved to the dead letter file. Errors do not stop the worker
+
+        Parameters
+        ----------
+            batch : list
+                List of job instances
+        """
+        if not batch:
+            return
+        if not self.opened:
+            self.write_dead_letter(batch, self.open_error)
+            return
+
+        def write():
+            self.sink.write_batch(batch)
+            self.sink.flush()
+
+        start = time.perf_counter()
+        error = self.run_with_retries(write, f"save a batch of {len(batch)} jobs")
+        if error is None:
+            self.metrics["jobs_written"] += len(batch)
+            self.metrics["batches_written"] += 1
+        else:
+            self.write_dead_letter(batch, error)
+        elapsed = time.perf_counter() - start
+        self.metrics["write_seconds_total"] += elapsed
+        self.metrics["write_seconds_max"] = max(self.metrics["write_seconds_max"], elapsed)
+        record(f"save_{self.sink.name}", elapsed)
+
+class SinkDispatcher():
+    """Fan-out of the jobs to all the enabled sinks. Each sink has its own worker thread, queue, batch size and
+    flush interval, so the sinks write concurrently and a failing sink does not stall the others.
+    If the queue of a sink is full, put waits until there is space (backpressure). With put_timeout_seconds it
+    waits at most that time and then saves the jobs for that sink to the dead letter file"""
+    def __init__(self, dict_user_opts):
+        self.put_timeout = dict_user_opts["sink_put_timeout_seconds"]
+        self.workers = []
+
+        for name in get_enabled_sink_names(dict_user_opts):
+            sink_opts = dict_user_opts["sinks"][name]
+            sink = SINK_REGISTRY[name](dict_user_opts)
+            self.workers.append(SinkWorker(sink, sink_opts["batch_size"], sink_opts["flush_seconds"],
+                                           dict_user_opts["sink_queue_size"], dict_user_opts["sink_retries"],
+                                           dict_user_opts["sink_retry_backoff_seconds"],
+                                           dict_user_opts["sink_dead_letter_path"]))
+
+    def start(self):
+        """Start the worker threads"""
+        for worker in self.workers:
+            worker.thread.start()
+        with open_dispatchers_lock:
+            open_dispatchers.append(self)
+
+    def put(self, list_jobs_instances, updates_only=False):
+        """Add the jobs to the queue of each sink. It waits while a queue is full
+
+        Parameters
+        ----------
+            list_jobs_instances : list
+                List of job instances with the jobs information
+            updates_only : bool
+                True if the jobs were already saved, to add them only to the sinks that update them (the other
+                sinks would save them twice)
+        """
+        for worker in self.workers:
+            if updates_only and not worker.sink.updates_jobs:
+                continue
+            deadline = time.monotonic() + self.put_timeout if self.put_timeout else None
+            for i, job_inst in enumerate(list_jobs_instances):
+                try:
+                    worker.queue.put(job_inst, timeout=None if deadline is None else max(0, deadline - time.monotonic()))
+                except queue.Full:
+                    logger.error(f"Sink {worker.sink.name} is falling behind. Its queue was full for "
+                                 f"{self.put_timeout} s")
+                    worker.write_dead_letter(list_jobs_instances[i:], "queue full")
+                    break
+
+    def close(self):
+        """Write the pending jobs of all the sinks and close them. It does nothing if it is already closed"""
+        with open_dispatchers_lock:
+            if self not in open_dispatchers:
+                return
+            open_dispatchers.remove(self)
+
+        for worker in self.workers:
+            worker.queue.put(None)
+        for worker in self.workers:
+            worker.thread.join()
+
+        for name, metrics in self.get_metrics().items():
+            logger.info(f"Sink {name} metrics: {metrics}")
+
+    def get_metrics(self):
+        """Function that gets the metrics of each sink
+
+        Returns
+        -------
+            dict_metrics : dict
+                Metrics (jobs written, errors, latency, queue depth) per sink name
+        """
+        return {worker.sink.name: dict(worker.metrics, queue_depth=worker.queue.qsize()) for worker in self.workers}
+
+def close_sink_dispatchers():
+    """Function that writes the pending jobs and closes the dispatchers that are still open, for example
+    when the crawl stopped with an error before closing its writer. It must be called before closing the
+    PostgreSQL pool and the SQLite file"""
+    with open_dispatchers_lock:
+        list_dispatchers = list(open_dispatchers)
+
+    for dispatcher in list_dispatchers:
+        logger.info("Closing a sink dispatcher that was not closed")
+        dispatcher.close()
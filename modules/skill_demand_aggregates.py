@@ -0,0 +1,313 @@
+import json, logging
+from datetime import date, datetime
+from collections import Counter
+
+logger = logging.getLogger('skill_demand_aggregates')
+
+# Entity group of each tag (key of ./data/data.json), loaded the first time it is needed
+dict_tag_entity_group = None
+
+def get_tag_entity_group(tag):
+    """Function that gets the entity group of a tag from ./data/data.json. Example: "airflow" -> "Automation"
+
+    Parameters
+    ----------
+        tag : str
+            Tag of the job (lowercase entity)
+    Returns
+    -------
+        entity_group : str
+            Entity group of the tag or "Other" if it is not in the file
+    """
+    global dict_tag_entity_group
+
+    if dict_tag_entity_group is None:
+        with open('./data/data.json', 'r') as json_file:
+            json_data = json.load(json_file)
+        dict_tag_entity_group = {}
+        for key in json_data:
+            for entity in json_data[key]:
+                dict_tag_entity_group.setdefault(entity.lower(), key)
+
+    return dict_tag_entity_group.get(tag, "Other")
+
+def get_iso_week(posted_date):
+    """Function that gets the ISO week of the posted date. If the job has no posted date the current week is used
+
+    Parameters
+    ----------
+        posted_date : str or date
+            Posted date of the job ("%d-%m-%Y" as saved by the scraper, ISO text or date)
+    Returns
+    -------
+        iso_week : str
+            ISO week. Example: "2024-W05"
+    """
+    if isinstance(posted_date, str):
+        for date_format in ["%d-%m-%Y", "%Y-%m-%d"]:
+            try:
+                posted_date = datetime.strptime(posted_date, date_format).date()
+                break
+            except ValueError:
+                continue
+    if not isinstance(posted_date, date):
+        posted_date = date.today()
+
+    iso_year, iso_week, _ = posted_date.isocalendar()
+    return f"{iso_year}-W{iso_week:02d}"
+
+def count_job_aggregates(list_job_dicts):
+    """Function that counts the tags and the reasons not to apply of a list of jobs
+
+    Parameters
+    ----------
+        list_job_dicts : list
+            List of dicts (or job instances transformed to dicts) of the new jobs
+    Returns
+    -------
+        tag_counts : Counter
+            Number of jobs per (tag, entity_group, country, iso_week)
+        reason_counts : Counter
+            Number of jobs per (reason, country, iso_week)
+    """
+    tag_counts = Counter()
+    reason_counts = Counter()
+
+    for job_dict in list_job_dicts:
+        country = job_dict.get("search_country")
+        iso_week = get_iso_week(job_dict.get("posted_date"))
+        for tag in set(job_dict.get("list_tags") or []):
+            tag_counts[(tag, get_tag_entity_group(tag), country, iso_week)] += 1
+        for reason in set(job_dict.get("reason_not_apply") or []):
+            reason_counts[(reason, country, iso_week)] += 1
+
+    return tag_counts, reason_counts
+
+def get_aggregates_ddl(name_table):
+    """Function that gets the DDL of the aggregates tables. It is valid for PostgreSQL and SQLite
+
+    Parameters
+    ----------
+        name_table : str
+            Name of the jobs table
+    Returns
+    -------
+        ddl : str
+            SQL statements that create the aggregates tables
+    """
+    return f"""
+    CREATE TABLE IF NOT EXISTS {name_table}_tag_demand_weekly (
+        tag VARCHAR(255),
+        entity_group VARCHAR(255),
+        country VARCHAR(255),
+        iso_week VARCHAR(8),
+        count INTEGER,
+        PRIMARY KEY (tag, entity_group, country, iso_week)
+    );
+    CREATE INDEX IF NOT EXISTS {name_table}_tag_demand_weekly_week_idx ON {name_table}_tag_demand_weekly (iso_week);
+    CREATE TABLE IF NOT EXISTS {name_table}_reason_weekly (
+        reason VARCHAR(255),
+        country VARCHAR(255),
+        iso_week VARCHAR(8),
+        count INTEGER,
+        PRIMARY KEY (reason, country, iso_week)
+    );
+    CREATE INDEX IF NOT EXISTS {name_table}_reason_weekly_week_idx ON {name_table}_reason_weekly (iso_week);
+    """
+
+def get_aggregates_upserts(name_table, placeholder):
+    """Function that gets the upsert statements that add counts to the aggregates tables
+
+    Parameters
+    ----------
+        name_table : str
+            Name of the jobs table
+        placeholder : str
+            Placeholder of the parameters of the driver ("%s" for psycopg2, "?" for sqlite3)
+    Returns
+    -------
+        tag_upsert : str
+            Upsert statement of the tag demand table
+        reason_upsert : str
+            Upsert statement of the reasons table
+    """
+    p = placeholder
+    tag_upsert = f"""INSERT INTO {name_table}_tag_demand_weekly (tag, entity_group, country, iso_week, count)
+                     VALUES ({p}, {p}, {p}, {p}, {p})
+                     ON CONFLICT (tag, entity_group, country, iso_week) DO UPDATE
+                     SET count = {name_table}_tag_demand_weekly.count + excluded.count"""
+    reason_upsert = f"""INSERT INTO {name_table}_reason_weekly (reason, country, iso_week, count)
+                        VALUES ({p}, {p}, {p}, {p})
+                        ON CONFLICT (reason, country, iso_week) DO UPDATE
+                        SET count = {name_table}_reason_weekly.count + excluded.count"""
+    return tag_upsert, reason_upsert
+
+def update_aggregates(cur, name_table, placeholder, list_job_dicts):
+    """Function that adds the new jobs to the aggregates tables. It must run in the same transaction that
+    inserts the jobs, so the counters are always consistent with the jobs table
+
+    Parameters
+    ----------
+        cur : cursor or connection
+            Cursor (psycopg2) or connection (sqlite3) with an executemany method
+        name_table : str
+            Name of the jobs table
+        placeholder : str
+            Placeholder of the parameters of the driver ("%s" for psycopg2, "?" for sqlite3)
+        list_job_dicts : list
+            List of dicts of the jobs that were inserted (not the duplicated ones)
+    """
+    tag_counts, reason_counts = count_job_aggregates(list_job_dicts)
+    tag_upsert, reason_upsert = get_aggregates_upserts(name_table, placeholder)
+
+    # Sorted to always lock the rows in the same order
+    if tag_counts:
+        cur.executemany(tag_upsert, [key + (count,) for key, count in sorted(tag_counts.items())])
+    if reason_counts:
+        cur.executemany(reason_upsert, [key + (count,) for key, count in sorted(reason_counts.items())])
+
+def get_aggregates_report_queries(name_table, placeholder, country, from_week):
+    """Function that gets the queries of the reports of the aggregates
+
+    Parameters
+    ----------
+        name_table : str
+            Name of the jobs table
+        placeholder : str
+            Placeholder of the parameters of the driver ("%s" for psycopg2, "?" for sqlite3)
+        country : str or None
+            Only this country if it is not None
+        from_week : str or None
+            Only from this ISO week if it is not None
+    Returns
+    -------
+        dict_queries : dict
+            Dict with the query and its parameters of the "tags" and "reasons" reports
+    """
+    where = "WHERE 1 = 1"
+    params = []
+    if country:
+        where += f" AND country = {placeholder}"
+        params.append(country)
+    if from_week:
+        where += f" AND iso_week >= {placeholder}"
+        params.append(from_week)
+
+    return {
+        "tags": (f"""SELECT country, iso_week, entity_group, tag, SUM(count) AS jobs
+                     FROM {name_table}_tag_demand_weekly {where}
+                     GROUP BY country, iso_week, entity_group, tag
+                     ORDER BY iso_week DESC, country, jobs DESC""", params),
+        "reasons": (f"""SELECT country, iso_week, reason, SUM(count) AS jobs
+                        FROM {name_table}_reason_weekly {where}
+                        GROUP BY country, iso_week, reason
+                        ORDER BY iso_week DESC, country, jobs DESC""", params),
+    }
+
+def get_aggregates_report(report, backend, dict_user_opts, country=None, from_week=None):
+    """Function that reads a report directly from the aggregates tables. Its cost depends on the number of
+    tags, countries and weeks, not on the number of jobs saved
+
+    Parameters
+    ----------
+        report : str
+            "tags" (top tags per country and week) or "reasons" (reasons not to apply per country and week)
+        backend : str
+            "postgresql" or "sqlite"
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+        country : str or None
+            Only this country if it is not None
+        from_week : str or None
+            Only from this ISO week if it is not None. Example: "2024-W05"
+    Returns
+    -------
+        list_rows : list
+            List of dicts with the rows of the report
+    """
+    name_table = dict_user_opts["name_postgre_table"]
+
+    if backend == "postgresql":
+        from modules.postgresql_pool import get_postgresql_connection
+
+        sql, params = get_aggregates_report_queries(name_table, "%s", country, from_week)[report]
+        with get_postgresql_connection() as connection:
+            with connection.cursor() as cur:
+                cur.execute(sql, params)
+                columns = [column.name for column in cur.description]
+                rows = cur.fetchall()
+            connection.rollback()
+    else:
+        from modules import save_to_sqlite_db
+
+        sql, params = get_aggregates_report_queries(name_table, "?", country, from_week)[report]
+        with save_to_sqlite_db.sqlite_lock:
+            cur = save_to_sqlite_db.sqlite_connection.execute(sql, params)
+            columns = [column[0] for column in cur.description]
+            rows = cur.fetchall()
+
+    return [dict(zip(columns, row)) for row in rows]
+
+def rebuild_aggregates(backend, dict_user_opts, chunk_size=10000):
+    """Function that recomputes the aggregates tables from all the saved jobs. It is only needed once,
+    for the jobs saved before the aggregates existed
+
+    Parameters
+    ----------
+        backend : str
+            "postgresql" or "sqlite"
+        dict_user_opts : dict
+            Dictionary with the user options of search, save and apply
+        chunk_size : int
+            Number of jobs in memory at the same time
+    Returns
+    -------
+        num_jobs : int
+            Number of jobs counted
+    """
+    name_table = dict_user_opts["name_postgre_table"]
+    columns = ["search_country", "posted_date", "list_tags", "reason_not_apply"]
+    sql = f"SELECT {', '.join(columns)} FROM {name_table}"
+    num_jobs = 0
+
+    if backend == "postgresql":
+        from modules.postgresql_pool import get_postgresql_connection
+
+        # Read with a server-side cursor and write with a second cursor of the same connection and transaction,
+        # so it only needs one connection of the pool
+        with get_postgresql_connection() as connection:
+            with connection.cursor(name="rebuild_aggregates") as read_cur, connection.cursor() as cur:
+                cur.execute(f"DELETE FROM {name_table}_tag_demand_weekly")
+                cur.execute(f"DELETE FROM {name_table}_reason_weekly")
+                read_cur.itersize = chunk_size
+                read_cur.execute(sql)
+                while True:
+                    rows = read_cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    update_aggregates(cur, name_table, "%s", [dict(zip(columns, row)) for row in rows])
+                    num_jobs += len(rows)
+            connection.commit()
+    else:
+        from modules import save_to_sqlite_db
+
+        connection = save_to_sqlite_db.sqlite_connection
+        with save_to_sqlite_db.sqlite_lock, connection:
+            connection.execute(f"DELETE FROM {name_table}_tag_demand_weekly")
+            connection.execute(f"DELETE FROM {name_table}_reason_weekly")
+            read_cur = connection.execute(sql)
+            while True:
+                rows = read_cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                list_job_dicts = []
+                for row in rows:
+                    job_dict = dict(zip(columns, row))
+                    job_dict["list_tags"] = json.loads(job_dict["list_tags"] or "[]")
+                    job_dict["reason_not_apply"] = json.loads(job_dict["reason_not_apply"] or "[]")
+                    list_job_dicts.append(job_dict)
+                update_aggregates(connection, name_table, "?", list_job_dicts)
+                num_jobs += len(rows)
+
+    logger.info(f"Rebuilt the aggregates from {num_jobs} jobs")
+    return num_jobs
@@ -0,0 +1,72 @@
+"""Tests of the matching of the Easy Apply questions with the answers file shipped with the repo
+(data/easy_apply_questions_answers.json). A question must get no answer rather than the answer of a
+similar question that asks something else.
+
+Run them from the root folder of the repo:
+
+    python -m pytest tests
+"""
+import json, shutil
+import pytest
+from modules.answer_index import AnswerIndex
+
+ANSWERS_PATH = "./data/easy_apply_questions_answers.json"
+MIN_CONFIDENCE = 0.85
+
+@pytest.fixture
+def answer_index():
+    return AnswerIndex(ANSWERS_PATH, {"countries_no_visa": ["Denmark"]}, MIN_CONFIDENCE)
+
+@pytest.mark.parametrize("question, answer", [
+    ("How many years of work experience do you have with Azure SQL?", "0"),
+    ("how many years of work experience do you have with azure sql", "0"),
+    ("What is your level of proficiency in English?", "Professional"),
+    ("Email address", "email@email.com"),
+    ("Are you legally authorized to work in Denmark?", "Yes"),
+])
+def test_same_question(answer_index, question, answer):
+    assert answer_index.get_answer(question, "Denmark")[:2] == (answer, 1.0)
+
+@pytest.mark.parametrize("question", [
+    # Differ in the technology
+    "How many years of work experience do you have with SQL?",
+    "How many years of work experience do you have with Azure?",
+    "How many years of work experience do you have with Azure SQL Database?",
+    "How many years of work experience do you have with Azure Synapse?",
+    # Differ in the language
+    "What is your level of proficiency in German?",
+    "What is your level of proficiency in Danish?",
+    # Differ in what they ask
+    "Are you comfortable commuting to the office?",
+    "Are you comfortable working in a hybrid setting?",
+    "Are you comfortable working nights?",
+])
+def test_near_miss_question_has_no_answer(answer_index, question):
+    answer, confidence, matched_question = answer_index.get_answer(question, "Denmark")
+    assert answer is None
+    assert matched_question is None
+
+def test_similar_question_with_text_answer(answer_index):
+    # Only words that do not change the meaning are different
+    answer, confidence, matched_question = answer_index.get_answer("What is the level of your proficiency in English?", "Denmark")
+    assert (answer, matched_question) == ("Professional", "What is your level of proficiency in English?")
+    assert MIN_CONFIDENCE <= confidence < 1
+
+def test_similar_question_with_yes_no_or_numeric_answer(answer_index):
+    # The same kind of change is not enough for the answers that are a number or yes/no
+    assert answer_index.get_answer("Are you comfortable with working in an onsite setting?", "Denmark")[0] is None
+    assert answer_index.get_answer("How many years of work experience do you have in Azure SQL?", "Denmark")[0] is None
+
+def test_reload(tmp_path):
+    path = tmp_path / "answers.json"
+    shutil.copy(ANSWERS_PATH, path)
+    index = AnswerIndex(str(path), {"countries_no_visa": []}, MIN_CONFIDENCE)
+    assert index.get_answer("How many years of work experience do you have with SQL?", "Denmark")[0] is None
+
+    with open(path) as answers_file:
+        dict_answers = json.load(answers_file)
+    dict_answers["How many years of work experience do you have with SQL?"] = "3"
+    with open(path, "w") as answers_file:
+        json.dump(dict_answers, answers_file)
+    index.load()
+    assert index.get_answer("How many years of work experience do you have with SQL?", "Denmark")[0] == "3"
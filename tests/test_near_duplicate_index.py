@@ -0,0 +1,86 @@
+"""Tests of the near duplicate index (modules/near_duplicate_index.py). A job seen again is the same job, not
+a near duplicate of itself, while a job posted again with another id and small changes is a near duplicate.
+
+Run them from the root folder of the repo:
+
+    python -m pytest tests
+"""
+import pytest
+from modules.item import Job
+from modules.near_duplicate_index import NearDuplicateIndex, get_simhash
+
+SIMILARITY = 0.9
+DESCRIPTION = ("We are looking for a Data Engineer to join our data platform team in Copenhagen. You will build "
+               "and maintain batch and streaming pipelines with Python, SQL, Airflow and Spark, model the data of "
+               "the warehouse with dbt and work with the analysts and the data scientists of the company to deliver "
+               "reliable datasets. You have at least two years of experience as a data engineer, you know cloud "
+               "platforms like AWS or Azure and you speak English. We offer a hybrid setting, a pension scheme, "
+               "lunch at the office and a budget for conferences and courses.")
+# The same job posted again with small changes
+DESCRIPTION_REPOSTED = DESCRIPTION.replace("Copenhagen", "Aarhus").replace("two years", "three years")
+
+def create_job(linkedin_job_id, description, **values):
+    """Function that creates an analyzed job instance. values replaces some of its values"""
+    job = Job()
+    job.url = f"https://www.linkedin.com/jobs/view/{linkedin_job_id}/"
+    job.description = description
+    job.description_lang = "en"
+    job.apply = True
+    job.email = []
+    job.reason_not_apply = []
+    job.list_tech_no_knowledge = []
+    job.list_tags = ["python", "sql"]
+    job.applied = False
+    for column, value in values.items():
+        setattr(job, column, value)
+    return job
+
+@pytest.fixture
+def index(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "near_duplicates.db"), SIMILARITY)
+    yield index
+    index.close()
+
+def test_near_duplicate_with_other_id(index):
+    index.add("3700000001", get_simhash(DESCRIPTION), create_job(3700000001, DESCRIPTION))
+
+    match = index.find(get_simhash(DESCRIPTION_REPOSTED), "3700000002")
+    assert match["job_id"] == "3700000001"
+    assert match["url"] == "https://www.linkedin.com/jobs/view/3700000001/"
+    assert SIMILARITY <= match["similarity"] < 1
+    assert match["decision"]["apply"] is True
+
+def test_not_near_duplicate_of_itself(index):
+    index.add("3700000001", get_simhash(DESCRIPTION), create_job(3700000001, DESCRIPTION))
+
+    # Seen again, with the same description or with small changes
+    assert index.find(get_simhash(DESCRIPTION), "3700000001") is None
+    assert index.find(get_simhash(DESCRIPTION_REPOSTED), "3700000001") is None
+
+def test_seen_again_with_near_duplicate(index):
+    index.add("3700000001", get_simhash(DESCRIPTION), create_job(3700000001, DESCRIPTION))
+    index.add("3700000002", get_simhash(DESCRIPTION_REPOSTED), create_job(3700000002, DESCRIPTION_REPOSTED))
+
+    # The other job is found, not the job itself
+    assert index.find(get_simhash(DESCRIPTION), "3700000001")["job_id"] == "3700000002"
+    assert index.find(get_simhash(DESCRIPTION_REPOSTED), "3700000002")["job_id"] == "3700000001"
+
+def test_seen_again_replaces_decision(index, tmp_path):
+    index.add("3700000001", get_simhash(DESCRIPTION), create_job(3700000001, DESCRIPTION))
+    index.mark_applied("3700000001")
+
+    # Analyzed again with another description and decision
+    index.add("3700000001", get_simhash(DESCRIPTION_REPOSTED),
+              create_job(3700000001, DESCRIPTION_REPOSTED, apply=False, reason_not_apply=["Experience"]))
+    assert len(index.job_ids) == 1
+
+    match = index.find(get_simhash(DESCRIPTION_REPOSTED), "3700000002")
+    assert match["similarity"] == 1
+    assert match["decision"]["reason_not_apply"] == ["Experience"]
+    assert match["applied"] is True
+
+    # The new fingerprint is the one loaded from the file
+    index.commit()
+    reloaded_index = NearDuplicateIndex(str(tmp_path / "near_duplicates.db"), SIMILARITY)
+    assert reloaded_index.find(get_simhash(DESCRIPTION_REPOSTED), "3700000002")["similarity"] == 1
+    reloaded_index.close()
@@ -0,0 +1,201 @@
+"""Tests of the database sinks. The same assertions run against the SQLite and the PostgreSQL save functions,
+so both keep the same behavior of the upsert (new and updated jobs, tracking columns, reposts and list columns).
+
+Run them from the root folder of the repo:
+
+    python -m pytest tests
+
+The PostgreSQL tests need the .env file with the PostgreSQL variables and are skipped when it is not available.
+They use their own table, that is dropped at the end. The tests of a sink whose modules can not be imported
+(psycopg2 or python-dotenv not installed) are skipped too.
+"""
+import os, json
+from datetime import date
+import pytest
+from modules.item import Job
+
+TEST_TABLE = "linkedin_jobs_test_sinks"
+
+def get_columns(save_to_postgresql_db):
+    """Function that gets the columns of the jobs table (JOB_COLUMNS and TRACKING_COLUMNS)"""
+    return list(save_to_postgresql_db.JOB_COLUMNS) + list(save_to_postgresql_db.TRACKING_COLUMNS)
+
+def create_job(linkedin_job_id, **values):
+    """Function that creates a job instance with the values of a scraped job. values replaces some of them"""
+    job = Job()
+    job.search_position = "data engineer"
+    job.search_country = "Denmark"
+    job.url = f"https://www.linkedin.com/jobs/view/{linkedin_job_id}/"
+    job.position_name = "Data Engineer"
+    job.company = "Company"
+    job.city = "Copenhagen"
+    job.country = "Denmark"
+    job.applicants = 10
+    job.description = f"Description of the job {linkedin_job_id}. We use python and sql."
+    job.description_lang = "en"
+    # Format of the scraped posted date
+    job.posted_date = "01-10-2026"
+    job.reposted = False
+    job.apply = False
+    job.email = []
+    job.reason_not_apply = ["Experience"]
+    job.list_tech_no_knowledge = []
+    job.list_tags = ["python", "sql"]
+    job.easy_apply_questions = []
+    for column, value in values.items():
+        setattr(job, column, value)
+    return job
+
+class SQLiteSink():
+    """Saves and reads the jobs with modules/save_to_sqlite_db.py"""
+    def __init__(self, tmp_path):
+        save_to_sqlite_db = pytest.importorskip("modules.save_to_sqlite_db")
+        self.module = save_to_sqlite_db
+        self.dict_user_opts = {"name_postgre_table": TEST_TABLE, "sqlite_db_path": str(tmp_path / "jobs.db")}
+        save_to_sqlite_db.init_sqlite_db(self.dict_user_opts)
+
+    def save(self, list_jobs_instances):
+        return self.module.save_to_sqlite_db(list_jobs_instances, self.dict_user_opts)
+
+    def read(self, unique_id):
+        connection = self.module.sqlite_connection
+        columns = get_columns(self.module)
+        row = connection.execute(f"SELECT {', '.join(columns)} FROM {TEST_TABLE} WHERE id = ?", (unique_id,)).fetchone()
+        dict_row = dict(zip(columns, row))
+        # Lists are saved as json text, booleans as integers and dates as ISO text
+        for column, column_type in self.module.JOB_COLUMNS.items():
+            if dict_row[column] is not None and column_type.endswith("[]"):
+                dict_row[column] = json.loads(dict_row[column])
+            elif dict_row[column] is not None and column_type == "BOOL":
+                dict_row[column] = bool(dict_row[column])
+        dict_row["posted_date"] = date.fromisoformat(dict_row["posted_date"])
+        return dict_row
+
+    def close(self):
+        self.module.close_sqlite_db()
+
+class PostgreSQLSink():
+    """Saves and reads the jobs with modules/save_to_postgresql_db.py, in a table created by the migrations"""
+    def __init__(self):
+        psycopg2 = pytest.importorskip("psycopg2")
+        if not os.getenv("POSTGRESQL_HOSTNAME"):
+            pytest.skip("The PostgreSQL variables are not set")
+
+        postgresql_pool = pytest.importorskip("modules.postgresql_pool")
+        from modules.postgresql_migrations import run_postgresql_migrations
+        from modules import save_to_postgresql_db
+        self.pool = postgresql_pool
+        self.module = save_to_postgresql_db
+        self.dict_user_opts = {"name_postgre_table": TEST_TABLE, "postgresql_batch_page_size": 100,
+                               "postgresql_pool_min_connections": 1, "postgresql_pool_max_connections": 2}
+        try:
+            postgresql_pool.init_postgresql_pool(self.dict_user_opts)
+        except psycopg2.OperationalError as e:
+            pytest.skip(f"PostgreSQL is not available: {e}")
+
+        self.drop_tables()
+        run_postgresql_migrations(self.dict_user_opts)
+
+    def save(self, list_jobs_instances):
+        return self.module.save_to_postgresql_db(list_jobs_instances, self.dict_user_opts)
+
+    def read(self, unique_id):
+        columns = get_columns(self.module)
+        with self.pool.get_postgresql_connection() as connection:
+            with connection.cursor() as cur:
+                cur.execute(f"SELECT {', '.join(columns)} FROM {TEST_TABLE} WHERE id = %s", (unique_id,))
+                row = cur.fetchone()
+            connection.rollback()
+        dict_row = dict(zip(columns, row))
+        # The first migration created the id as CHAR(10)
+        dict_row["id"] = dict_row["id"].strip()
+        return dict_row
+
+    def drop_tables(self):
+        with self.pool.get_postgresql_connection() as connection:
+            with connection.cursor() as cur:
+                for suffix in ["", "_snapshots", "_tag_demand_weekly", "_reason_weekly"]:
+                    cur.execute(f"DROP TABLE IF EXISTS {TEST_TABLE}{suffix}")
+                cur.execute("""SELECT 1 FROM information_schema.tables WHERE table_name = 'schema_migrations'""")
+                if cur.fetchone():
+                    cur.execute("DELETE FROM schema_migrations WHERE table_name = %s", (TEST_TABLE,))
+            connection.commit()
+
+    def close(self):
+        self.drop_tables()
+        self.pool.close_postgresql_pool()
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def sink(request, tmp_path):
+    sink = SQLiteSink(tmp_path) if request.param == "sqlite" else PostgreSQLSink()
+    yield sink
+    sink.close()
+
+def test_insert(sink):
+    assert sink.save([create_job(3700000001), create_job(3700000002)]) == (2, 0)
+
+    dict_row = sink.read("3700000001")
+    assert dict_row["url"] == "https://www.linkedin.com/jobs/view/3700000001/"
+    assert dict_row["applicants"] == 10
+    assert dict_row["apply"] is False
+    assert dict_row["posted_date"] == date(2026, 10, 1)
+    assert len(dict_row["content_hash"]) == 40
+    assert (dict_row["times_seen"], dict_row["repost_count"], dict_row["edit_count"]) == (1, 0, 0)
+
+def test_insert_repeated_in_batch(sink):
+    assert sink.save([create_job(3700000001), create_job(3700000001, applicants=20)]) == (1, 0)
+    assert sink.read("3700000001")["applicants"] == 10
+
+def test_update(sink):
+    sink.save([create_job(3700000001)])
+    content_hash = sink.read("3700000001")["content_hash"]
+
+    # Seen again with more applicants and an edited description
+    assert sink.save([create_job(3700000001, applicants=30, description="Edited description.")]) == (0, 1)
+
+    dict_row = sink.read("3700000001")
+    assert dict_row["applicants"] == 30
+    assert dict_row["description"] == "Edited description."
+    assert dict_row["content_hash"] != content_hash
+    assert (dict_row["times_seen"], dict_row["repost_count"], dict_row["edit_count"]) == (2, 0, 1)
+    assert dict_row["last_seen"] >= dict_row["first_seen"]
+
+def test_update_keeps_easy_apply_result(sink):
+    sink.save([create_job(3700000001, applied=True, manual_apply=False)])
+    sink.save([create_job(3700000001)])
+
+    dict_row = sink.read("3700000001")
+    assert (dict_row["applied"], dict_row["manual_apply"]) == (True, False)
+
+def test_repost(sink):
+    sink.save([create_job(3700000001)])
+
+    # Reposted with a newer posted date
+    sink.save([create_job(3700000001, reposted=True, posted_date="10-10-2026")])
+    dict_row = sink.read("3700000001")
+    assert dict_row["posted_date"] == date(2026, 10, 10)
+    assert (dict_row["times_seen"], dict_row["repost_count"], dict_row["edit_count"]) == (2, 1, 0)
+
+    # The approximate posted date of a later sighting without repost does not change it
+    sink.save([create_job(3700000001, posted_date="12-10-2026")])
+    dict_row = sink.read("3700000001")
+    assert dict_row["posted_date"] == date(2026, 10, 10)
+    assert (dict_row["times_seen"], dict_row["repost_count"]) == (3, 1)
+
+def test_list_columns_round_trip(sink):
+    dict_lists = {
+        "email": ["jobs@company.com"],
+        "reason_not_apply": ["Experience", "Language Requirement", "Deadline Exceeded"],
+        "list_tech_no_knowledge": ["scala"],
+        "list_tags": ["python", "sql", "c++", "c#", "\"quoted\"", "comma, inside", "ñandú"],
+        "easy_apply_questions": ["How many years of experience do you have with {python}?"],
+    }
+    sink.save([create_job(3700000001, **dict_lists), create_job(3700000002, email=None, list_tags=[])])
+
+    dict_row = sink.read("3700000001")
+    for column, value in dict_lists.items():
+        assert dict_row[column] == value
+
+    dict_row = sink.read("3700000002")
+    assert dict_row["email"] is None
+    assert dict_row["list_tags"] == []